@@ -2,21 +2,14 @@ from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
-from dotenv import load_dotenv
-import os
 
 from alembic import context
 from app.database import Base
 from app import models
+from app.settings import Settings
 
-# Load environment variables
-load_dotenv()
-
-# Build database URL from environment variables
-database_url = (
-    f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
-    f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}"
-)
+# Same database as the app: DATABASE_URL, else the POSTGRES_* variables (from_env loads .env)
+database_url = Settings.from_env().database_url
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
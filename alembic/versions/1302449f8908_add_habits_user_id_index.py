@@ -0,0 +1,31 @@
+"""add habits user_id index
+
+Revision ID: 1302449f8908
+Revises: 300ca1506e91
+Create Date: 2026-10-17 11:40:05.518204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1302449f8908'
+down_revision: Union[str, Sequence[str], None] = '300ca1506e91'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Habit list and dashboard look habits up by owner
+    with op.get_context().autocommit_block():
+        op.create_index(op.f('ix_habits_user_id'), 'habits', ['user_id'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_habits_user_id'), table_name='habits', postgresql_concurrently=True)
@@ -0,0 +1,53 @@
+"""add habit_logs hot path indexes
+
+Revision ID: 300ca1506e91
+Revises: 43de80e9c878
+Create Date: 2026-10-17 09:12:41.201734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '300ca1506e91'
+down_revision: Union[str, Sequence[str], None] = '43de80e9c878'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so each
+    # statement runs in autocommit mode and the table stays writable meanwhile.
+    # If a build fails, Postgres leaves an INVALID index behind: drop it and rerun.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_habit_logs_habit_id_start_time',
+            'habit_logs',
+            ['habit_id', 'start_time'],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_habit_logs_habit_id_status_start_time',
+            'habit_logs',
+            ['habit_id', 'status', sa.text('start_time DESC')],
+            postgresql_concurrently=True,
+        )
+        op.create_index(
+            'ix_habit_logs_active',
+            'habit_logs',
+            ['habit_id'],
+            postgresql_where=sa.text('end_time IS NULL'),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_habit_logs_active', table_name='habit_logs', postgresql_concurrently=True)
+        op.drop_index('ix_habit_logs_habit_id_status_start_time', table_name='habit_logs', postgresql_concurrently=True)
+        op.drop_index('ix_habit_logs_habit_id_start_time', table_name='habit_logs', postgresql_concurrently=True)
@@ -0,0 +1,106 @@
+"""partition habit_logs by month on start_time
+
+Revision ID: 3d8a6f2c9e14
+Revises: 7b3f9e1c5a28
+Create Date: 2026-10-17 23:02:51.318470
+
+Postgres cannot partition an existing table in place, so the rows are copied
+into a new habit_logs partitioned by RANGE (start_time), in this one
+transaction: habit_logs can be neither read nor written until it commits, so
+run it in a maintenance window. The indexes are built after the copy.
+
+The primary key becomes (id, start_time), since the unique keys of a
+partitioned table must include the partition key; ids stay unique through
+their sequence. start_time becomes NOT NULL: rows without one take their
+end_time, or now.
+
+Partitions are created from the oldest logged month through MONTHS_AHEAD
+months from now, plus habit_logs_default; app/partitions.py creates the
+following ones. Downgrading copies the rows back into a plain table, except
+those of partitions already archived.
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3d8a6f2c9e14'
+down_revision: Union[str, Sequence[str], None] = '7b3f9e1c5a28'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 3
+
+FILL_START_TIMES = sa.text("""
+UPDATE habit_logs
+SET start_time = COALESCE(end_time, now()),
+    local_date = CAST(timezone(COALESCE(
+        (SELECT users.timezone FROM habits JOIN users ON users.id = habits.user_id WHERE habits.id = habit_logs.habit_id),
+        'UTC'
+    ), COALESCE(end_time, now())) AS date)
+WHERE start_time IS NULL
+""")
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def copy_into(create_statements: list[str]) -> None:
+    """Replace habit_logs by the table create_statements build from habit_logs_old, with the same rows."""
+    op.execute("ALTER TABLE habit_logs RENAME TO habit_logs_old")
+    for statement in create_statements:
+        op.execute(statement)
+    op.execute("INSERT INTO habit_logs SELECT * FROM habit_logs_old")
+    # The id sequence belongs to the old table's column and would be dropped with it
+    op.execute("ALTER SEQUENCE habit_logs_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE habit_logs_old")
+    op.execute("ALTER SEQUENCE habit_logs_id_seq OWNED BY habit_logs.id")
+
+
+def create_keys_and_indexes(primary_key: list[str]) -> None:
+    op.create_primary_key('habit_logs_pkey', 'habit_logs', primary_key)
+    op.create_foreign_key('habit_logs_habit_id_fkey', 'habit_logs', 'habits', ['habit_id'], ['id'])
+    op.create_index('ix_habit_logs_id', 'habit_logs', ['id'])
+    op.create_index('ix_habit_logs_habit_id_start_time_id', 'habit_logs', ['habit_id', 'start_time', 'id'])
+    op.create_index('ix_habit_logs_habit_id_local_date', 'habit_logs', ['habit_id', 'local_date'])
+    op.create_index('ix_habit_logs_habit_id_status_start_time', 'habit_logs', ['habit_id', 'status', sa.text('start_time DESC')])
+    op.create_index('ix_habit_logs_active', 'habit_logs', ['habit_id'], postgresql_where=sa.text('end_time IS NULL'))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    op.execute("LOCK TABLE habit_logs IN ACCESS EXCLUSIVE MODE")
+    bind.execute(FILL_START_TIMES)
+
+    oldest = bind.execute(sa.text("SELECT MIN(start_time) FROM habit_logs")).scalar()
+    month = (oldest.astimezone(timezone.utc) if oldest else datetime.now(timezone.utc)).date().replace(day=1)
+    last = add_months(datetime.now(timezone.utc).date().replace(day=1), MONTHS_AHEAD)
+    statements = [
+        "CREATE TABLE habit_logs (LIKE habit_logs_old INCLUDING DEFAULTS) PARTITION BY RANGE (start_time)",
+        "ALTER TABLE habit_logs ALTER COLUMN start_time SET NOT NULL",
+        "CREATE TABLE habit_logs_default PARTITION OF habit_logs DEFAULT",
+    ]
+    while month <= last:
+        statements.append(
+            f"CREATE TABLE habit_logs_y{month.year:04d}m{month.month:02d} PARTITION OF habit_logs "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+        )
+        month = add_months(month, 1)
+    copy_into(statements)
+    create_keys_and_indexes(['id', 'start_time'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("LOCK TABLE habit_logs IN ACCESS EXCLUSIVE MODE")
+    copy_into([
+        "CREATE TABLE habit_logs (LIKE habit_logs_old INCLUDING DEFAULTS)",
+        "ALTER TABLE habit_logs ALTER COLUMN start_time DROP NOT NULL",
+    ])
+    create_keys_and_indexes(['id'])
@@ -0,0 +1,77 @@
+"""add habits best_streak and current_streak_started_at
+
+Revision ID: 5c0e7f3a9b21
+Revises: 92255b388a11
+Create Date: 2026-10-17 16:05:12.903417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c0e7f3a9b21'
+down_revision: Union[str, Sequence[str], None] = '92255b388a11'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Streaks over completed/frozen UTC days, with the day rollover's rules: a
+# streak survives one skipped day and breaks after 2+ (the rollover has already
+# logged the days it covered with freezes, as frozen days). A new island starts
+# wherever 2+ days were skipped; its length counts completed days only (frozen
+# days bridge without counting) and it started with its first completed log.
+# The best streak is the longest island, the current streak the latest one.
+BACKFILL_STREAKS = """
+WITH days AS (
+    SELECT habit_id,
+           CAST(timezone('UTC', start_time) AS date) AS day,
+           MIN(start_time) FILTER (WHERE status = 'completed') AS first_completed
+    FROM habit_logs
+    WHERE status IN ('completed', 'frozen')
+    GROUP BY habit_id, CAST(timezone('UTC', start_time) AS date)
+),
+breaks AS (
+    SELECT habit_id, day, first_completed,
+           CASE WHEN day - LAG(day) OVER (PARTITION BY habit_id ORDER BY day) <= 2 THEN 0 ELSE 1 END AS new_island
+    FROM days
+),
+islands AS (
+    SELECT habit_id, day, first_completed,
+           SUM(new_island) OVER (PARTITION BY habit_id ORDER BY day) AS island
+    FROM breaks
+),
+runs AS (
+    SELECT habit_id, COUNT(first_completed) AS length, MIN(first_completed) AS started_at, MAX(day) AS last_day
+    FROM islands
+    GROUP BY habit_id, island
+),
+ranked AS (
+    SELECT habit_id, started_at,
+           MAX(length) OVER (PARTITION BY habit_id) AS best,
+           ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY last_day DESC) AS recency
+    FROM runs
+)
+UPDATE habits
+SET best_streak = GREATEST(ranked.best, COALESCE(habits.current_streak, 0)),
+    current_streak_started_at = CASE WHEN habits.current_streak > 0 THEN ranked.started_at END
+FROM ranked
+WHERE ranked.habit_id = habits.id AND ranked.recency = 1
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('habits', sa.Column('best_streak', sa.Integer(), server_default='0', nullable=True))
+    op.add_column('habits', sa.Column('current_streak_started_at', sa.DateTime(timezone=True), nullable=True))
+    # Habits without logs still get best_streak >= current_streak
+    op.execute("UPDATE habits SET best_streak = COALESCE(current_streak, 0)")
+    op.execute(BACKFILL_STREAKS)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('habits', 'current_streak_started_at')
+    op.drop_column('habits', 'best_streak')
@@ -0,0 +1,57 @@
+"""add users.timezone and habit_logs.local_date
+
+Revision ID: 7b3f9e1c5a28
+Revises: e5a9c2d7b413
+Create Date: 2026-10-17 22:14:08.650921
+
+local_date is backfilled in id batches, each committed on its own, so the
+upgrade never holds row locks on the whole of habit_logs. Only rows still
+without a local_date are updated: logs the new release writes meanwhile keep
+theirs, and an interrupted backfill can simply be rerun. The new index is
+built concurrently afterwards.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7b3f9e1c5a28'
+down_revision: Union[str, Sequence[str], None] = 'e5a9c2d7b413'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 50000
+
+# The day of start_time in the owner's timezone (UTC for every user at this point)
+BACKFILL_BATCH = sa.text("""
+UPDATE habit_logs
+SET local_date = CAST(timezone(COALESCE(
+    (SELECT users.timezone FROM habits JOIN users ON users.id = habits.user_id WHERE habits.id = habit_logs.habit_id),
+    'UTC'
+), start_time) AS date)
+WHERE id >= :low AND id < :high AND local_date IS NULL AND start_time IS NOT NULL
+""")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('users', sa.Column('timezone', sa.String(), server_default='UTC', nullable=False))
+    op.add_column('habit_logs', sa.Column('local_date', sa.Date(), nullable=True))
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        low, high = bind.execute(sa.text("SELECT MIN(id), MAX(id) FROM habit_logs")).one()
+        if low is not None:
+            for start in range(low, high + 1, BATCH_SIZE):
+                bind.execute(BACKFILL_BATCH, {"low": start, "high": start + BATCH_SIZE})
+        op.create_index('ix_habit_logs_habit_id_local_date', 'habit_logs', ['habit_id', 'local_date'], postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_habit_logs_habit_id_local_date', table_name='habit_logs', postgresql_concurrently=True)
+    op.drop_column('habit_logs', 'local_date')
+    op.drop_column('users', 'timezone')
@@ -0,0 +1,44 @@
+"""add habit_stats
+
+Revision ID: 92255b388a11
+Revises: 9df514b8ca3e
+Create Date: 2026-10-17 15:20:41.518203
+
+Existing habits get their row on their next log write. To fill them all at
+once, run `python reconcile_stats.py --fix` after upgrading.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '92255b388a11'
+down_revision: Union[str, Sequence[str], None] = '9df514b8ca3e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('habit_stats',
+    sa.Column('habit_id', sa.Integer(), nullable=False),
+    sa.Column('sessions_count', sa.Integer(), nullable=False),
+    sa.Column('total_minutes', sa.Integer(), nullable=False),
+    sa.Column('completions_count', sa.Integer(), nullable=False),
+    sa.Column('freezes_used', sa.Integer(), nullable=False),
+    sa.Column('best_day_minutes', sa.Integer(), nullable=False),
+    sa.Column('duration_histogram', sa.JSON(), nullable=True),
+    sa.Column('last_completed_date', sa.Date(), nullable=True),
+    sa.Column('completion_run', sa.Integer(), nullable=False),
+    sa.Column('best_completion_run', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('habit_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('habit_stats')
@@ -0,0 +1,40 @@
+"""add rollover_runs
+
+Revision ID: 9df514b8ca3e
+Revises: 1302449f8908
+Create Date: 2026-10-17 14:02:51.774310
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9df514b8ca3e'
+down_revision: Union[str, Sequence[str], None] = '1302449f8908'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('rollover_runs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('last_habit_id', sa.Integer(), nullable=False),
+    sa.Column('habits_frozen', sa.Integer(), nullable=True),
+    sa.Column('streaks_reset', sa.Integer(), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day')
+    )
+    op.create_index(op.f('ix_rollover_runs_id'), 'rollover_runs', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_rollover_runs_id'), table_name='rollover_runs')
+    op.drop_table('rollover_runs')
@@ -0,0 +1,33 @@
+"""replace habit_logs (habit_id, start_time) index with (habit_id, start_time, id)
+
+Revision ID: b7d41e0c2f68
+Revises: 5c0e7f3a9b21
+Create Date: 2026-10-17 16:48:30.127654
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d41e0c2f68'
+down_revision: Union[str, Sequence[str], None] = '5c0e7f3a9b21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keyset pagination orders by (start_time, id); the wider index still serves day ranges
+    with op.get_context().autocommit_block():
+        op.create_index('ix_habit_logs_habit_id_start_time_id', 'habit_logs', ['habit_id', 'start_time', 'id'], postgresql_concurrently=True)
+        op.drop_index('ix_habit_logs_habit_id_start_time', table_name='habit_logs', postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_habit_logs_habit_id_start_time', 'habit_logs', ['habit_id', 'start_time'], postgresql_concurrently=True)
+        op.drop_index('ix_habit_logs_habit_id_start_time_id', table_name='habit_logs', postgresql_concurrently=True)
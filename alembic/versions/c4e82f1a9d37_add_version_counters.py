@@ -0,0 +1,31 @@
+"""add habits and users version counters
+
+Revision ID: c4e82f1a9d37
+Revises: b7d41e0c2f68
+Create Date: 2026-10-17 18:42:10.215306
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e82f1a9d37'
+down_revision: Union[str, Sequence[str], None] = 'b7d41e0c2f68'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Constant server default: existing rows start at 0 without a table rewrite
+    op.add_column('habits', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('users', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('users', 'version')
+    op.drop_column('habits', 'version')
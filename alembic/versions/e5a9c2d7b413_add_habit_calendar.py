@@ -0,0 +1,37 @@
+"""add habit_calendar day bitmaps
+
+Revision ID: e5a9c2d7b413
+Revises: c4e82f1a9d37
+Create Date: 2026-10-17 21:06:37.480112
+
+Existing history needs no backfill: a year without a row is built from
+habit_logs on its first write, and computed on the fly when read before that.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a9c2d7b413'
+down_revision: Union[str, Sequence[str], None] = 'c4e82f1a9d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('habit_calendar',
+    sa.Column('habit_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('completed', sa.LargeBinary(), nullable=False),
+    sa.Column('frozen', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['habit_id'], ['habits.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('habit_id', 'year')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('habit_calendar')
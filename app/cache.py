@@ -0,0 +1,197 @@
+"""Result cache for GET /habits/{id}/stats and /habits/{id}/status.
+
+Stats are read far more often than logs are written, so
+crud.get_cached_habit_stats / get_cached_habit_status keep computed results
+in a cache backend: one entry per habit and kind, stored together with the
+ETag it was computed under (crud.stats_etag / status_etag, which carry the
+habit's version, the day and so on). A lookup only hits when the stored tag
+equals the current one, so a result from before a write on another worker,
+or from before midnight, is never served, whatever the backend.
+
+Writes also drop their habits' entries as soon as they commit: the versions
+hook records every habit it bumps, crud writes and Core writes through
+versions.bump (day rollover, bulk import) alike. The memory goes to live
+entries, and a shared backend is cleared for every worker at once.
+
+Backends (RESULT_CACHE_BACKEND):
+- "memory": an LRU per worker, bounded by RESULT_CACHE_SIZE entries and
+  RESULT_CACHE_TTL seconds (the default; size 0 disables caching).
+- "redis": one cache shared by all workers at RESULT_CACHE_REDIS_URL. It needs
+  the redis package, which is not in requirements.txt: without it the backend
+  fails when it is created, at import.
+Anything implementing CacheBackend can be set as `results.backend`.
+
+Cached results are shared between requests: callers must not mutate them.
+"""
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import logging
+import os
+import threading
+import time
+import orjson
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app import metrics, versions
+from app.responses import ORJSON_OPTIONS, encode_default
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_BACKEND = os.getenv("RESULT_CACHE_BACKEND", "memory").lower()  # memory | redis
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", 10000))  # Entries per worker (memory backend)
+RESULT_CACHE_TTL = int(os.getenv("RESULT_CACHE_TTL", 300))  # Seconds
+RESULT_CACHE_REDIS_URL = os.getenv("RESULT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+KINDS = ("stats", "status")
+
+
+class CacheBackend(ABC):
+    """A key-value store for (tag, result) pairs."""
+
+    @abstractmethod
+    def get(self, key: str):
+        """The stored value, or None."""
+
+    @abstractmethod
+    def set(self, key: str, value):
+        """Store value under key."""
+
+    @abstractmethod
+    def delete(self, keys: list[str]):
+        """Drop keys; missing ones are ignored."""
+
+    @abstractmethod
+    def clear(self):
+        """Drop every entry."""
+
+
+class MemoryBackend(CacheBackend):
+    """Size- and TTL-bounded LRU, private to this worker."""
+
+    def __init__(self, maxsize: int = RESULT_CACHE_SIZE, ttl: float = RESULT_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: str):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if now >= expires_at:
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        evicted = 0
+        with self.lock:
+            self.entries[key] = (expires_at, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                evicted += 1
+        if evicted:
+            metrics.RESULT_CACHE_EVICTIONS.inc(amount=evicted)
+
+    def delete(self, keys: list[str]):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class RedisBackend(CacheBackend):
+    """One cache for all workers. Redis errors count as misses rather than failing the request."""
+
+    PREFIX = "habit-tracker:results:"
+
+    def __init__(self, url: str = RESULT_CACHE_REDIS_URL, ttl: int = RESULT_CACHE_TTL):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESULT_CACHE_BACKEND=redis needs the redis package: pip install redis") from None
+
+        self.client = redis.Redis.from_url(url)
+        self.errors = redis.RedisError
+        self.ttl = ttl
+
+    def get(self, key: str):
+        try:
+            raw = self.client.get(self.PREFIX + key)
+        except self.errors:
+            logger.warning("result cache get failed", exc_info=True)
+            return None
+        return orjson.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value):
+        # JSON, as the results go out: datetimes become the same strings the response would hold
+        raw = orjson.dumps(value, default=encode_default, option=ORJSON_OPTIONS)
+        try:
+            self.client.set(self.PREFIX + key, raw, ex=self.ttl)
+        except self.errors:
+            logger.warning("result cache set failed", exc_info=True)
+
+    def delete(self, keys: list[str]):
+        try:
+            self.client.delete(*(self.PREFIX + key for key in keys))
+        except self.errors:
+            # The tag check still keeps stale entries from being served
+            logger.warning("result cache invalidation failed", exc_info=True)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.PREFIX + "*"):
+            self.client.delete(key)
+
+
+class ResultCache:
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+
+    def get_or_compute(self, kind: str, habit_id: int, tag: str, compute):
+        """The cached result for tag, else compute() (stored unless None)."""
+        key = f"{kind}:{habit_id}"
+        entry = self.backend.get(key)
+        if entry is not None and entry[0] == tag:
+            metrics.RESULT_CACHE_HITS.inc(kind)
+            return entry[1]
+        metrics.RESULT_CACHE_MISSES.inc(kind)
+        result = compute()
+        if result is not None:
+            self.backend.set(key, (tag, result))
+        return result
+
+    def invalidate(self, habit_ids):
+        keys = [f"{kind}:{habit_id}" for habit_id in habit_ids for kind in KINDS]
+        if keys:
+            self.backend.delete(keys)
+
+
+def create_backend() -> CacheBackend:
+    if RESULT_CACHE_BACKEND == "redis":
+        return RedisBackend()
+    return MemoryBackend()
+
+
+results = ResultCache(create_backend())
+
+
+@event.listens_for(Session, "after_commit")
+def invalidate_after_commit(session):
+    habit_ids = session.info.pop(versions.CHANGED_HABITS, None)
+    if habit_ids:
+        results.invalidate(habit_ids)
+
+@event.listens_for(Session, "after_rollback")
+def forget_changed_habits(session):
+    session.info.pop(versions.CHANGED_HABITS, None)
@@ -0,0 +1,271 @@
+"""Per-habit day bitmaps: which days were completed and which were frozen.
+
+`habit_calendar` holds one row per habit and year with two bitmaps of
+YEAR_BYTES bytes, one bit per day of the owner's calendar (habit_logs.local_date,
+see app/timezones.py): day n of the year (January 1st is 0) is bit n % 8 of
+byte n // 8. GET /habits/{id}/calendar serves a year from one row instead of
+the year's logs, and streaks are found with bit operations on the whole
+history (streak_runs) instead of rescanning habit_logs.
+
+The bits are kept current by a Session after_flush hook, next to the stats
+counters: a completed or frozen log sets its day's bit, and a day that loses
+a log (deleted, un-completed, moved) is rechecked against habit_logs. Core
+inserts bypass the hook and call add_days (rollover freezes, import_logs).
+A year without a row is built from habit_logs, on the first write into it or
+on the fly when read, so existing history needs no backfill.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+from sqlalchemy import bindparam, event, func, select, tuple_, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app import models, stats_counters, timezones
+
+YEAR_BYTES = 46  # 366 days
+KINDS = ("completed", "frozen")
+
+# A run of consecutive completed/frozen days; freezes keep it alive without counting for it
+StreakRun = namedtuple("StreakRun", "first_day last_day completed_days")
+
+calendar_table = models.HabitCalendar.__table__
+logs_table = models.HabitLog.__table__
+
+
+def day_index(day: date) -> int:
+    return day.timetuple().tm_yday - 1
+
+
+def set_bit(bits: bytearray, index: int, value: bool = True):
+    if value:
+        bits[index // 8] |= 1 << (index % 8)
+    else:
+        bits[index // 8] &= ~(1 << (index % 8))
+
+
+def days_in(bits: bytes, year: int) -> list[date]:
+    """The days whose bit is set, in order."""
+    first = date(year, 1, 1)
+    value = int.from_bytes(bits, "little")
+    days = []
+    while value:
+        lowest = value & -value
+        days.append(first + timedelta(days=lowest.bit_length() - 1))
+        value ^= lowest
+    return days
+
+
+def build_years(conn: Connection, keys) -> dict[tuple[int, int], dict[str, bytes]]:
+    """Bitmaps for (habit_id, year) keys, from habit_logs (one grouped scan of the local_date range)."""
+    keys = set(keys)
+    built = {key: {kind: bytearray(YEAR_BYTES) for kind in KINDS} for key in keys}
+    if not keys:
+        return {}
+    years = [year for _, year in keys]
+    window_start, window_end = timezones.start_time_window(date(min(years), 1, 1), date(max(years), 12, 31))
+    log = models.HabitLog
+    rows = conn.execute(
+        select(
+            log.habit_id,
+            log.local_date,
+            func.count().filter(log.status == "completed").label("completions"),
+            func.count().filter(log.status == "frozen").label("frozen"),
+        )
+        .where(
+            log.habit_id.in_({habit_id for habit_id, _ in keys}),
+            log.status.in_(KINDS),
+            log.local_date >= date(min(years), 1, 1),
+            log.local_date < date(max(years) + 1, 1, 1),
+            log.start_time >= window_start,
+            log.start_time < window_end,
+        )
+        .group_by(log.habit_id, log.local_date)
+    )
+    for row in rows:
+        bitmaps = built.get((row.habit_id, row.local_date.year))
+        if bitmaps is not None:
+            if row.completions:
+                set_bit(bitmaps["completed"], day_index(row.local_date))
+            if row.frozen:
+                set_bit(bitmaps["frozen"], day_index(row.local_date))
+    return {key: {kind: bytes(bits) for kind, bits in bitmaps.items()} for key, bitmaps in built.items()}
+
+
+def day_kinds(conn: Connection, days) -> dict[tuple[int, date], set[str]]:
+    """Which of completed/frozen each (habit_id, day) has in habit_logs (equality lookups on habit_id, local_date)."""
+    log = models.HabitLog
+    window_start, window_end = timezones.start_time_window(min(day for _, day in days), max(day for _, day in days))
+    rows = conn.execute(
+        select(log.habit_id, log.local_date, log.status)
+        .where(
+            tuple_(log.habit_id, log.local_date).in_(list(days)),
+            log.start_time >= window_start,
+            log.start_time < window_end,
+            log.status.in_(KINDS),
+        )
+        .distinct()
+    )
+    kinds: dict[tuple[int, date], set[str]] = {}
+    for row in rows:
+        kinds.setdefault((row.habit_id, row.local_date), set()).add(row.status)
+    return kinds
+
+
+def insert_ignore(conn: Connection, rows: list[dict]):
+    """Insert habit_calendar rows, skipping (habit, year) pairs that already have one."""
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    conn.execute(dialect_insert(calendar_table).on_conflict_do_nothing(index_elements=["habit_id", "year"]), rows)
+
+
+def read_rows(conn: Connection, keys, for_update: bool = False) -> dict[tuple[int, int], dict[str, bytes]]:
+    query = select(calendar_table).where(tuple_(calendar_table.c.habit_id, calendar_table.c.year).in_(list(keys)))
+    if for_update:
+        query = query.with_for_update()
+    return {(row.habit_id, row.year): {kind: bytes(row[kind]) for kind in KINDS} for row in conn.execute(query).mappings()}
+
+
+def lock_years(conn: Connection, keys: set[tuple[int, int]]) -> dict[tuple[int, int], dict[str, bytes]]:
+    """Rows for (habit_id, year) keys, locked for update; missing ones are built from habit_logs first."""
+    found = read_rows(conn, keys, for_update=True)
+    missing = keys - found.keys()
+    if missing:
+        built = build_years(conn, missing)
+        insert_ignore(conn, [{"habit_id": habit_id, "year": year, **built[habit_id, year]} for habit_id, year in missing])
+        # Another writer may have inserted first; its row is the one to update
+        found.update(read_rows(conn, missing, for_update=True))
+    return found
+
+
+def apply_days(conn: Connection, added: set[tuple[int, date, str]], rechecked: set[tuple[int, date]]):
+    """Set the bits of `added` (habit_id, day, kind) and recompute the `rechecked` (habit_id, day) from habit_logs."""
+    keys = {(habit_id, day.year) for habit_id, day, _ in added} | {(habit_id, day.year) for habit_id, day in rechecked}
+    if not keys:
+        return
+    stored = lock_years(conn, keys)
+    bitmaps = {key: {kind: bytearray(bits) for kind, bits in stored[key].items()} for key in keys}
+
+    for habit_id, day, kind in added:
+        set_bit(bitmaps[habit_id, day.year][kind], day_index(day))
+    if rechecked:
+        kinds = day_kinds(conn, rechecked)
+        for habit_id, day in rechecked:
+            for kind in KINDS:
+                set_bit(bitmaps[habit_id, day.year][kind], day_index(day), kind in kinds.get((habit_id, day), ()))
+
+    changed = [
+        {"key_habit_id": habit_id, "key_year": year, **{kind: bytes(bits) for kind, bits in year_bitmaps.items()}}
+        for (habit_id, year), year_bitmaps in bitmaps.items()
+        if any(bytes(bits) != stored[habit_id, year][kind] for kind, bits in year_bitmaps.items())
+    ]
+    if changed:
+        conn.execute(
+            update(calendar_table).where(
+                calendar_table.c.habit_id == bindparam("key_habit_id"),
+                calendar_table.c.year == bindparam("key_year"),
+            ),
+            changed,
+        )
+
+
+def add_days(db: Session, days: list[tuple[int, date, str]]):
+    """Set the bits of (habit_id, day, kind) for logs inserted with Core statements."""
+    if days:
+        apply_days(db.connection(), set(days), set())
+
+
+# -------------------------
+# Reads
+# -------------------------
+
+def get_year(db: Session, habit_id: int, year: int) -> dict[str, bytes]:
+    """{"completed": bits, "frozen": bits} for one year: a single-row read, or built from habit_logs without writing."""
+    key = (habit_id, year)
+    stored = read_rows(db.connection(), [key])
+    return stored[key] if stored else build_years(db.connection(), [key])[key]
+
+
+def get_history(db: Session, habit_id: int) -> dict[int, dict[str, bytes]]:
+    """Bitmaps for every year from the habit's first completed/frozen log to its last.
+
+    Stored years are read as they are; years without a row (history from
+    before the index, never written since) are built from habit_logs.
+    """
+    bounds = db.execute(
+        select(func.min(logs_table.c.local_date), func.max(logs_table.c.local_date)).where(
+            logs_table.c.habit_id == habit_id, logs_table.c.status.in_(KINDS)
+        )
+    ).one()
+    if bounds[0] is None:
+        return {}
+    years = set(range(bounds[0].year, bounds[1].year + 1))
+    keys = {(habit_id, year) for year in years}
+    stored = read_rows(db.connection(), keys)
+    stored.update(build_years(db.connection(), keys - stored.keys()))
+    return {year: bitmaps for (_, year), bitmaps in stored.items()}
+
+
+def streak_runs(history: dict[int, dict[str, bytes]]) -> list[StreakRun]:
+    """Runs of consecutive completed/frozen days, newest first, found with integer bit operations.
+
+    The years are laid end to end in two integers (bit n = n days after the
+    first January 1st): run starts are the set bits whose lower neighbour is
+    clear, run ends those whose upper neighbour is clear, and a run's
+    completed days are a popcount under its mask. The work is per run, not per day.
+    """
+    if not history:
+        return []
+    first = date(min(history), 1, 1)
+    completed = covered = 0
+    for year, bitmaps in history.items():
+        offset = (date(year, 1, 1) - first).days
+        completed_bits = int.from_bytes(bitmaps["completed"], "little")
+        completed |= completed_bits << offset
+        covered |= (completed_bits | int.from_bytes(bitmaps["frozen"], "little")) << offset
+
+    starts = covered & ~(covered << 1)
+    ends = covered & ~(covered >> 1)
+    runs = []
+    while starts:
+        start = (starts & -starts).bit_length() - 1
+        end = (ends & -ends).bit_length() - 1
+        starts &= starts - 1
+        ends &= ends - 1
+        mask = ((1 << (end - start + 1)) - 1) << start
+        runs.append(StreakRun(first + timedelta(days=start), first + timedelta(days=end), (completed & mask).bit_count()))
+    runs.reverse()
+    return runs
+
+
+# -------------------------
+# Write-time maintenance
+# -------------------------
+
+@event.listens_for(Session, "after_flush")
+def update_calendar_after_flush(session: Session, flush_context):
+    added = set()
+    rechecked = set()
+    # Their habit_calendar rows go with them (ON DELETE CASCADE)
+    deleted_habits = {obj.id for obj in session.deleted if isinstance(obj, models.Habit)}
+
+    def add(before, after):
+        if before == after:
+            return
+        if after is not None and after.day is not None and after.habit_id not in deleted_habits:
+            added.add((after.habit_id, after.day, "completed" if after.completed else "frozen"))
+        if before is not None and before.day is not None and before.habit_id not in deleted_habits:
+            rechecked.add((before.habit_id, before.day))
+
+    for obj in session.new:
+        if isinstance(obj, models.HabitLog):
+            add(None, stats_counters.current_contribution(obj))
+    for obj in session.dirty:
+        if isinstance(obj, models.HabitLog) and session.is_modified(obj):
+            add(stats_counters.previous_contribution(obj), stats_counters.current_contribution(obj))
+    for obj in session.deleted:
+        if isinstance(obj, models.HabitLog):
+            add(stats_counters.previous_contribution(obj), None)
+
+    if added or rechecked:
+        apply_days(session.connection(), added, rechecked)
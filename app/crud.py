@@ -1,25 +1,46 @@
-from sqlalchemy.orm import Session
-from app import models, schemas
-from datetime import datetime, timezone, timedelta
-from app.utils import hash_password
-from statistics import median, StatisticsError
+from sqlalchemy import and_, delete, event, func, insert, select, tuple_
+from sqlalchemy.orm import Session, joinedload
+from app import cache, completion_index, models, pubsub, schemas, stats_counters, timezones, versions
+from datetime import date, datetime, timezone, timedelta
+import base64
+from bisect import bisect_right
+import binascii
+from app.utils import ACCESS_TOKEN_EXPIRE_MINUTES, TOKENS_REVOKED, forget_user_tokens, hash_password, token_hash
+from statistics import median
 
 # -------------------------
 # Habit utilities
 # -------------------------
 
+# The owner's timezone comes with the habit, in the same query
+HABIT_OWNER_ZONE = joinedload(models.Habit.owner).load_only(models.User.timezone)
+
 def get_habit_by_id(db: Session, habit_id: int):
-    return db.query(models.Habit).filter(models.Habit.id == habit_id).first()
+    """Habit by primary key, with its owner's timezone; no query when the session has already loaded it."""
+    return db.get(models.Habit, habit_id, options=[HABIT_OWNER_ZONE])
+
+def get_habit_zone(db: Session, habit_id: int):
+    """Timezone of the habit's owner, where its days start (see app/timezones.py)."""
+    return timezones.zone_for(get_habit_by_id(db, habit_id))
 
 def get_all_habits(db: Session):
     return db.query(models.Habit).all()
 
-def create_habit(db: Session, habit: schemas.HabitCreate):
+def get_habits_for_user(db: Session, user_id: int):
+    return db.query(models.Habit).options(HABIT_OWNER_ZONE).filter(
+        models.Habit.user_id == user_id
+    ).order_by(models.Habit.id).all()
+
+def create_habit(db: Session, habit: schemas.HabitCreate, user_id: int | None = None):
     new_habit = models.Habit(
         name=habit.name,
         description=habit.description,
         is_timer=habit.is_timer,
-        allow_manual_override=habit.allow_manual_override
+        allow_manual_override=habit.allow_manual_override,
+        is_freezable=habit.is_freezable,
+        danger_start_pct=habit.danger_start_pct,
+        freezes_remaining=2,  # Initialize with 2 freezes per habit
+        user_id=user_id
     )
     db.add(new_habit)
     db.commit()
@@ -53,16 +74,31 @@ def create_log(db: Session, habit_id: int, is_manual: bool = False):
         is_manual=is_manual
     )
     db.add(new_log)
+    db.flush()  # Assigns the id for the event
+    habit = get_habit_by_id(db, habit_id)
+    pubsub.emit(db, habit.user_id if habit else None, "session_started",
+                habit_id=habit_id, log_id=new_log.id, start_time=new_log.start_time)
     db.commit()
     db.refresh(new_log)
     return new_log
 
 def get_log_by_id(db: Session, log_id: int, habit_id: int):
+    """A log by id alone: one primary-key probe per habit_logs partition on Postgres.
+
+    Writes to the loaded log then name its partition, via the (id, start_time) mapper key.
+    """
     return db.query(models.HabitLog).filter(
         models.HabitLog.id == log_id,
         models.HabitLog.habit_id == habit_id
     ).first()
 
+def increment_streak(habit: models.Habit, completed_at: datetime):
+    """Extend the streak by one day, tracking when it started and the best streak."""
+    if not habit.current_streak:
+        habit.current_streak_started_at = completed_at
+    habit.current_streak = (habit.current_streak or 0) + 1
+    habit.best_streak = max(habit.best_streak or 0, habit.current_streak)
+
 def stop_log(db: Session, log):
     end_time = datetime.now(timezone.utc)
     duration_min = int((end_time - log.start_time).total_seconds() / 60)
@@ -73,11 +109,13 @@ def stop_log(db: Session, log):
     habit = log.habit or get_habit_by_id(db, log.habit_id)
     user = get_user_by_id(db, habit.user_id) if habit else None
     if habit and user and not has_completed_today(db, habit.id, end_time, exclude_log_id=log.id):
-        habit.current_streak += 1
+        increment_streak(habit, log.start_time)
         if habit.is_freezable and habit.current_streak > 0 and habit.current_streak % 7 == 0:
             if user.freeze_balance < 2:
                 user.freeze_balance += 1
         user.freeze_used_in_row = 0
+    pubsub.emit(db, habit.user_id if habit else None, "session_stopped",
+                habit_id=log.habit_id, log_id=log.id, end_time=end_time, duration_min=duration_min)
     db.commit()
     db.refresh(log)
     return log
@@ -109,7 +147,7 @@ def create_manual_log(db: Session, habit_id: int, duration_min: int, notes: str
     
     # Update streak and freezes if this is the first completion today
     if habit and user and not has_completed_today(db, habit.id, now, exclude_log_id=new_log.id):
-        habit.current_streak += 1
+        increment_streak(habit, now)
         if habit.is_freezable and habit.current_streak > 0 and habit.current_streak % 7 == 0:
             if user.freeze_balance < 2:
                 user.freeze_balance += 1
@@ -122,65 +160,327 @@ def create_manual_log(db: Session, habit_id: int, duration_min: int, notes: str
 def get_logs_for_habit(db: Session, habit_id: int):
     return db.query(models.HabitLog).filter(models.HabitLog.habit_id == habit_id).all()
 
+def encode_log_cursor(log: models.HabitLog) -> str:
+    """Opaque cursor for a log's position in (start_time, id) order."""
+    raw = f"{log.start_time.astimezone(timezone.utc).isoformat()}|{log.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_log_cursor(cursor: str) -> tuple[datetime, int]:
+    """Inverse of encode_log_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        start_time, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(start_time), int(log_id)
+    except (binascii.Error, UnicodeDecodeError) as exc:
+        raise ValueError("Invalid cursor") from exc
+
+# Columns of the HabitLog response schema, in its field order
+LOG_ROW_COLUMNS = [getattr(models.HabitLog, field) for field in schemas.HabitLog.model_fields]
+
+def get_logs_page(
+    db: Session,
+    habit_id: int,
+    limit: int = 100,
+    before: str | None = None,
+    after: str | None = None,
+    start_from: datetime | None = None,
+    start_to: datetime | None = None,
+    status: str | None = None,
+    as_rows: bool = False
+) -> tuple[list[models.HabitLog], str | None]:
+    """One page of a habit's logs, newest first, by keyset on (start_time, id).
+
+    `before` returns the logs older than a cursor (scrolling back through
+    history), `after` the ones just newer than it. `start_from`/`start_to`
+    bound start_time (inclusive/exclusive). Returns the page and the cursor of
+    its last log when older logs remain, to pass back as `before`.
+
+    `as_rows` returns plain rows of the response schema's columns instead of
+    ORM objects: no identity map or attribute instrumentation, for pages that
+    only get serialized.
+    """
+    position = tuple_(models.HabitLog.start_time, models.HabitLog.id)
+    query = db.query(*LOG_ROW_COLUMNS) if as_rows else db.query(models.HabitLog)
+    query = query.filter(models.HabitLog.habit_id == habit_id)
+    if start_from:
+        query = query.filter(models.HabitLog.start_time >= start_from)
+    if start_to:
+        query = query.filter(models.HabitLog.start_time < start_to)
+    if status:
+        query = query.filter(models.HabitLog.status == status)
+    if before:
+        query = query.filter(position < tuple_(*decode_log_cursor(before)))
+
+    if after:
+        # Walk forward from the cursor, then flip back to newest first
+        query = query.filter(position > tuple_(*decode_log_cursor(after)))
+        logs = query.order_by(models.HabitLog.start_time, models.HabitLog.id).limit(limit).all()
+        logs.reverse()
+        # The cursor row itself is older, so a non-empty page always has a next one
+        return logs, encode_log_cursor(logs[-1]) if logs else None
+
+    # One extra row tells whether another page exists
+    logs = query.order_by(models.HabitLog.start_time.desc(), models.HabitLog.id.desc()).limit(limit + 1).all()
+    if len(logs) > limit:
+        logs = logs[:limit]
+        return logs, encode_log_cursor(logs[-1])
+    return logs, None
+
+def import_logs(db: Session, habit: models.Habit, entries: list[schemas.BulkLogEntry], now: datetime | None = None) -> dict:
+    """Insert backdated logs in bulk, then recompute the habit's streak once.
+
+    Raises ValueError listing the invalid entries; nothing is written then.
+    Entries whose start_time is already logged for the habit are skipped, so a
+    retried upload does not duplicate history.
+    """
+    now = now or datetime.now(timezone.utc)
+    zone = timezones.zone_for(habit)
+    rows = []
+    invalid = []
+    for index, entry in enumerate(entries):
+        start_time = entry.start_time if entry.start_time.tzinfo else entry.start_time.replace(tzinfo=timezone.utc)
+        end_time = start_time + timedelta(minutes=entry.duration_min)
+        if end_time > now:
+            invalid.append(index)
+            continue
+        rows.append({
+            "habit_id": habit.id,
+            "start_time": start_time,
+            "end_time": end_time,
+            "duration_min": entry.duration_min,
+            "is_manual": True,
+            "notes": entry.notes or "",
+            "status": entry.status,
+            "local_date": timezones.local_date(start_time, zone)
+        })
+    if invalid:
+        raise ValueError(f"Entries end in the future: {invalid}")
+
+    # One range scan finds what is already there
+    starts = [row["start_time"] for row in rows]
+    existing = {
+        start_time.astimezone(timezone.utc) for (start_time,) in db.query(models.HabitLog.start_time).filter(
+            models.HabitLog.habit_id == habit.id,
+            models.HabitLog.start_time >= min(starts),
+            models.HabitLog.start_time <= max(starts)
+        )
+    }
+    new_rows = []
+    for row in rows:
+        if row["start_time"] not in existing:
+            existing.add(row["start_time"])
+            new_rows.append(row)
+
+    if new_rows:
+        # Multi-row INSERT statements, batched by the driver dialect
+        db.execute(insert(models.HabitLog), new_rows)
+        # Core inserts skip the local_date, counters, calendar and versions hooks: rebuild this habit's counters from its logs
+        stats_counters.reconcile(db, [habit.id], fix=True)
+        completion_index.add_days(db, [(habit.id, row["local_date"], row["status"]) for row in new_rows])
+        versions.bump(db, [habit.id])
+        recompute_streak(db, habit, timezones.local_date(now, zone))
+    db.commit()
+    db.refresh(habit)
+    return {
+        "imported": len(new_rows),
+        "skipped": len(rows) - len(new_rows),
+        "current_streak": habit.current_streak,
+        "best_streak": habit.best_streak or 0,
+        "freezes_remaining": habit.freezes_remaining
+    }
+
+def replay_streak(runs: list[completion_index.StreakRun], today: date, freezes: int) -> tuple[int, date | None, int, list[date]]:
+    """Replay the day rollover's rules over a habit's runs of completed/frozen days (newest first).
+
+    A streak survives one skipped day and resets after 2+. Freezes are only
+    spent where the rollover would spend them now: on the day before
+    yesterday, when it is the only day skipped since the last run (every day
+    before yesterday has been through the rollover; yesterday is left to the
+    next one). Older gaps are history, judged without freezes.
+    Returns (current streak, first day of its first run, best streak, days to freeze).
+    """
+    streak = best = 0
+    started = None
+    last_day = None
+    for run in reversed(runs):
+        if last_day is not None and (run.first_day - last_day).days - 1 >= 2:
+            streak = 0
+        if run.completed_days and not streak:
+            started = run.first_day
+        streak += run.completed_days
+        best = max(best, streak)
+        last_day = run.last_day
+
+    frozen_days = []
+    if last_day is not None:
+        skipped = max(0, (today - last_day).days - 2)
+        if skipped == 1 and freezes > 0:
+            frozen_days.append(last_day + timedelta(days=1))
+        elif skipped >= 1:
+            # With yesterday, 2+ days without a completion
+            streak = 0
+    return streak, started if streak else None, best, frozen_days
+
+def recompute_streak(db: Session, habit: models.Habit, today: date):
+    """Recompute current/best streak and freezes from the habit's whole history, as the rollover would have.
+
+    A day the replay freezes (the day before yesterday at most) gets its frozen
+    log and uses up one of the habit's freezes, so a later recompute finds it
+    covered; older gaps never touch the current freezes. Freezes are
+    earned for the 7/14 day marks the current streak passes, as if each day
+    had been completed.
+    """
+    runs = completion_index.streak_runs(completion_index.get_history(db, habit.id))
+    if not runs:
+        return
+    previous_streak = habit.current_streak or 0
+    current_streak, started, best_streak, frozen_days = replay_streak(runs, today, habit.freezes_remaining or 0)
+    if frozen_days:
+        zone = timezones.zone_for(habit)
+        add_freeze_logs(db, [(habit.id, day, timezones.day_bounds(day, zone)[0]) for day in frozen_days])
+        habit.freezes_remaining -= len(frozen_days)
+
+    habit.current_streak = current_streak
+    habit.current_streak_started_at = get_first_log_time(db, habit.id, started) if current_streak else None
+    habit.best_streak = max(habit.best_streak or 0, best_streak)
+    if habit.is_freezable and current_streak > previous_streak:
+        earned = (current_streak // 7 - previous_streak // 7) + (current_streak // 14 - previous_streak // 14)
+        habit.freezes_remaining = min(2, (habit.freezes_remaining or 0) + earned)
+
+def add_freeze_logs(db: Session, freezes: list[tuple[int, date, datetime]]):
+    """Insert automatic frozen logs, (habit_id, local day, start_time) each, with one Core statement.
+
+    Core inserts skip the ORM flush hooks: the counters and the calendar are updated here.
+    """
+    db.execute(insert(models.HabitLog), [
+        {
+            "habit_id": habit_id,
+            "start_time": start_time,
+            "end_time": start_time,
+            "duration_min": 0,
+            "is_manual": False,  # Automatic
+            "status": "frozen",
+            "local_date": day
+        }
+        for habit_id, day, start_time in freezes
+    ])
+    stats_counters.add_freezes(db, [habit_id for habit_id, _, _ in freezes])
+    completion_index.add_days(db, [(habit_id, day, "frozen") for habit_id, day, _ in freezes])
+
+def get_first_log_time(db: Session, habit_id: int, day: date) -> datetime | None:
+    """Start of the first completed log on or after `day`."""
+    window_start, _ = timezones.start_time_window(day)
+    return db.query(func.min(models.HabitLog.start_time)).filter(
+        models.HabitLog.habit_id == habit_id,
+        models.HabitLog.status == "completed",
+        models.HabitLog.local_date >= day,
+        models.HabitLog.start_time >= window_start
+    ).scalar()
+
 def get_active_log(db: Session, habit_id: int):
     return db.query(models.HabitLog).filter(
         models.HabitLog.habit_id == habit_id,
         models.HabitLog.end_time == None
     ).first()
 
-def get_day_bounds(target_dt: datetime | None = None) -> tuple[datetime, datetime]:
+def count_active_logs(db: Session) -> int:
+    """Running timer sessions across all habits (served by the partial ix_habit_logs_active index)."""
+    return db.query(func.count(models.HabitLog.id)).filter(models.HabitLog.end_time == None).scalar()
+
+def get_day_bounds(target_dt: datetime | None = None, zone=timezone.utc) -> tuple[datetime, datetime]:
+    """UTC instants of the midnights around target_dt in the given timezone."""
     now = target_dt or datetime.now(timezone.utc)
-    day_start = datetime.combine(now.date(), datetime.min.time()).replace(tzinfo=timezone.utc)
-    day_end = day_start + timedelta(days=1)
-    return day_start, day_end
+    return timezones.day_bounds(timezones.local_date(now, zone), zone)
+
+# Session.info key for the per-session memo of get_today_logs
+TODAY_LOGS_MEMO = "today_logs"
+
+@event.listens_for(Session, "after_flush")
+@event.listens_for(Session, "after_transaction_end")
+def forget_today_logs(session, *args):
+    """Writes and transaction boundaries invalidate the memoized day logs."""
+    session.info.pop(TODAY_LOGS_MEMO, None)
 
 def get_today_logs(db: Session, habit_id: int, target_dt: datetime | None = None):
-    day_start, day_end = get_day_bounds(target_dt)
-    return db.query(models.HabitLog).filter(
-        models.HabitLog.habit_id == habit_id,
-        models.HabitLog.start_time >= day_start,
-        models.HabitLog.start_time < day_end
-    ).order_by(models.HabitLog.start_time.asc()).all()
+    """A habit's logs for the owner's day of target_dt, queried once per session until the next write."""
+    today = timezones.local_date(target_dt or datetime.now(timezone.utc), get_habit_zone(db, habit_id))
+    memo = db.info.setdefault(TODAY_LOGS_MEMO, {})
+    key = (habit_id, today)
+    if key not in memo:
+        window_start, window_end = timezones.start_time_window(today)
+        memo[key] = db.query(models.HabitLog).filter(
+            models.HabitLog.habit_id == habit_id,
+            models.HabitLog.local_date == today,
+            models.HabitLog.start_time >= window_start,
+            models.HabitLog.start_time < window_end
+        ).order_by(models.HabitLog.start_time.asc()).all()
+    return memo[key]
 
 def has_completed_today(db: Session, habit_id: int, target_dt: datetime | None = None, exclude_log_id: int | None = None) -> bool:
-    day_start, day_end = get_day_bounds(target_dt)
-    query = db.query(models.HabitLog).filter(
-        models.HabitLog.habit_id == habit_id,
-        models.HabitLog.start_time >= day_start,
-        models.HabitLog.start_time < day_end,
-        models.HabitLog.status.in_(["completed", "frozen"])
+    return any(
+        log.status in ("completed", "frozen") and log.id != exclude_log_id
+        for log in get_today_logs(db, habit_id, target_dt)
     )
-    if exclude_log_id is not None:
-        query = query.filter(models.HabitLog.id != exclude_log_id)
-    return db.query(query.exists()).scalar()
 
-def get_today_status(db: Session, habit_id: int, target_dt: datetime | None = None) -> str:
-    logs = get_today_logs(db, habit_id, target_dt)
-    statuses = {log.status for log in logs}
+def summarize_day_status(statuses: set[str]) -> str:
     if "completed" in statuses:
         return "completed"
     if "frozen" in statuses:
         return "frozen"
     return "pending"
 
+def get_today_status(db: Session, habit_id: int, target_dt: datetime | None = None) -> str:
+    logs = get_today_logs(db, habit_id, target_dt)
+    return summarize_day_status({log.status for log in logs})
+
+def get_today_statuses(db: Session, habit_ids: list[int], target_dt: datetime | None = None) -> dict[int, str]:
+    """Today's status for many habits in a single query, each on its owner's day."""
+    now = target_dt or datetime.now(timezone.utc)
+    zones = timezones.habit_zones(db, habit_ids)
+    days = [(habit_id, timezones.local_date(now, zones[habit_id])) for habit_id in habit_ids]
+    window_start, window_end = timezones.start_time_window(min(day for _, day in days), max(day for _, day in days))
+    rows = db.query(models.HabitLog.habit_id, models.HabitLog.status).filter(
+        tuple_(models.HabitLog.habit_id, models.HabitLog.local_date).in_(days),
+        models.HabitLog.start_time >= window_start,
+        models.HabitLog.start_time < window_end
+    ).distinct().all()
+    statuses: dict[int, set[str]] = {habit_id: set() for habit_id in habit_ids}
+    for habit_id, status in rows:
+        statuses[habit_id].add(status)
+    return {habit_id: summarize_day_status(day) for habit_id, day in statuses.items()}
+
+def get_last_completion_days(db: Session, habit_ids: list[int], before: date | None = None) -> dict[int, date]:
+    """Latest (local) day with a completed/frozen log per habit, in a single query."""
+    query = db.query(models.HabitLog.habit_id, func.max(models.HabitLog.local_date)).filter(
+        models.HabitLog.habit_id.in_(habit_ids),
+        models.HabitLog.status.in_(["completed", "frozen"])
+    )
+    if before is not None:
+        _, window_end = timezones.start_time_window(before - timedelta(days=1))
+        query = query.filter(models.HabitLog.local_date < before, models.HabitLog.start_time < window_end)
+    rows = query.group_by(models.HabitLog.habit_id).all()
+    return {habit_id: last_day for habit_id, last_day in rows}
+
 # -------------------------
 # User utilities    
 # -------------------------
 
 def get_user_by_id(db: Session, user_id: int):
-    return db.query(models.User).filter(models.User.id == user_id).first()
+    """User by primary key; no query when the session has already loaded it."""
+    return db.get(models.User, user_id)
 
 def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
-def create_user(db: Session, user: schemas.UserCreate):
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str | None = None):
+    """Create a user. Pass hashed_password when the password was already hashed off the event loop."""
     existing_user = get_user_by_email(db, user.email)
     if existing_user:
         return None
-    hashed_pw = hash_password(user.password)
+    hashed_pw = hashed_password or hash_password(user.password)
     new_user = models.User(
         email=user.email,
-        hashed_password=hashed_pw
+        hashed_password=hashed_pw,
+        timezone=user.timezone
     )
     db.add(new_user)
     db.commit()
@@ -191,21 +491,59 @@ def delete_user(db: Session, user_id: int):
     user = get_user_by_id(db, user_id)
     if user:
         db.delete(user)
+        add_token_revocation(db, user_id)
         db.commit()
+        forget_user_tokens(user_id)
     return user
 
-def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate):
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    """Store a rehash of the same password (e.g. made at a new BCRYPT_ROUNDS on login)."""
+    user = get_user_by_id(db, user_id)
+    if user:
+        user.hashed_password = hashed_password
+        db.commit()
+    return user
+
+def update_user(db: Session, user_id: int, user_update: schemas.UserUpdate, hashed_password: str | None = None):
     user = get_user_by_id(db, user_id)
     if user:
         update_data = user_update.model_dump(exclude_unset=True)
         if "password" in update_data:
-            update_data["hashed_password"] = hash_password(update_data.pop("password"))
+            password = update_data.pop("password")
+            update_data["hashed_password"] = hashed_password or hash_password(password)
         for field, value in update_data.items():
             setattr(user, field, value)
+        if "hashed_password" in update_data:
+            # Sessions opened with the old password end here
+            add_token_revocation(db, user_id)
         db.commit()
+        forget_user_tokens(user_id)
         db.refresh(user)
     return user
 
+def add_token_revocation(db: Session, user_id: int, token: str | None = None, expires_at: datetime | None = None):
+    """Revoke one token of the user, or without one every token issued so far, when db commits.
+
+    The revocation is stored for every worker (see utils.is_revoked), and the
+    tokens_revoked event drops the user's cached tokens in the other workers.
+    """
+    now = datetime.now(timezone.utc)
+    db.execute(delete(models.RevokedToken).where(models.RevokedToken.expires_at <= now))
+    db.add(models.RevokedToken(
+        user_id=user_id,
+        token_hash=token_hash(token) if token else None,
+        revoked_at=now,
+        expires_at=expires_at or now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    ))
+    pubsub.emit(db, user_id, TOKENS_REVOKED)
+
+def revoke_token(db: Session, token: str, claims: dict):
+    """Log a single token out."""
+    user_id = int(claims["sub"])
+    add_token_revocation(db, user_id, token, datetime.fromtimestamp(float(claims["exp"]), timezone.utc))
+    db.commit()
+    forget_user_tokens(user_id)
+
 # -------------------------
 # Streak and Freeze utilities
 # -------------------------
@@ -233,7 +571,7 @@ def complete_habit(db: Session, habit_id: int, user_id: int) -> dict:
     db.add(completion_log)
     
     # Increment streak
-    habit.current_streak += 1
+    increment_streak(habit, now)
     
     # Check if earned a freeze (at 7 and 14 day streaks - per habit)
     if habit.is_freezable and habit.current_streak > 0:
@@ -245,10 +583,10 @@ def complete_habit(db: Session, habit_id: int, user_id: int) -> dict:
                 habit.freezes_remaining += 1
     
     user.freeze_used_in_row = 0  # Reset consecutive freeze counter on completion
+    pubsub.emit(db, user_id, "habit_completed", habit_id=habit_id, streak=habit.current_streak)
     
     db.commit()
     db.refresh(habit)
-    db.refresh(user)
     
     return {
         "success": True,
@@ -295,6 +633,7 @@ def use_freeze(db: Session, habit_id: int, user_id: int) -> dict:
     
     # Decrement per-habit freezes remaining
     habit.freezes_remaining -= 1
+    pubsub.emit(db, user_id, "freeze_used", habit_id=habit_id, freezes_remaining=habit.freezes_remaining)
     
     db.commit()
     db.refresh(habit)
@@ -306,11 +645,10 @@ def use_freeze(db: Session, habit_id: int, user_id: int) -> dict:
         "freeze_used_in_row": user.freeze_used_in_row
     }
 
-def get_percent_of_day_elapsed() -> float:
-    """Get percentage of day elapsed (0.0 to 1.0)."""
-    now = datetime.now(timezone.utc)
-    midnight = datetime.combine(now.date(), datetime.min.time()).replace(tzinfo=timezone.utc)
-    next_midnight = midnight.replace(day=midnight.day+1) if midnight.day < 28 else midnight.replace(month=midnight.month+1, day=1)
+def get_percent_of_day_elapsed(now: datetime | None = None, zone=timezone.utc) -> float:
+    """Get percentage of day elapsed in the timezone (0.0 to 1.0)."""
+    now = now or datetime.now(timezone.utc)
+    midnight, next_midnight = get_day_bounds(now, zone)
     elapsed = (now - midnight).total_seconds()
     total = (next_midnight - midnight).total_seconds()
     return elapsed / total
@@ -321,66 +659,29 @@ def is_habit_in_danger(db: Session, habit: models.Habit) -> bool:
     # Only show danger if NOT completed
     if today_status == "completed":
         return False
-    pct_elapsed = get_percent_of_day_elapsed()
+    pct_elapsed = get_percent_of_day_elapsed(zone=timezones.zone_for(habit))
     return pct_elapsed >= habit.danger_start_pct
 
-def get_color_for_habit(db: Session, habit: models.Habit) -> str:
-    """Get color based on time of day and completion status (4 colors: green, yellow, orange, red)."""
-    pct_elapsed = get_percent_of_day_elapsed()
-    
-    today_status = get_today_status(db, habit.id)
+# Shares of the day at which a pending habit turns orange, then red
+COLOR_THRESHOLDS = (0.5, 0.85)
+PENDING_COLORS = ("yellow", "orange", "red")
+
+def color_band(pct_elapsed: float) -> int:
+    """Index into PENDING_COLORS; changes only when the day crosses a color threshold."""
+    return bisect_right(COLOR_THRESHOLDS, pct_elapsed)
+
+def color_for_status(today_status: str, pct_elapsed: float) -> str:
+    """Map today's status and the elapsed share of the day to a color."""
     if today_status == "completed":
         return "green"
     # Frozen counts as pending for color purposes (freeze was used, but still need to complete tomorrow)
-    
-    if pct_elapsed < 0.5:
-        return "yellow"
-    elif pct_elapsed < 0.85:
-        return "orange"
-    else:
-        return "red"
+    return PENDING_COLORS[color_band(pct_elapsed)]
 
-def apply_automatic_freezes(db: Session, habit_id: int) -> None:
-    """Apply automatic freeze consumption if user has skipped 1-2 days, or kill streak if 3+ days."""
-    habit = get_habit_by_id(db, habit_id)
-    if not habit:
-        return
-    
-    # Get last completion date
-    last_completion = db.query(models.HabitLog).filter(
-        models.HabitLog.habit_id == habit_id,
-        models.HabitLog.status.in_(["completed", "frozen"])
-    ).order_by(models.HabitLog.start_time.desc()).first()
-    
-    if not last_completion:
-        # No completions yet, nothing to do
-        return
-    
-    # Calculate days since last completion
-    now = datetime.now(timezone.utc)
-    last_completion_date = last_completion.start_time.date()
-    today = now.date()
-    days_since = (today - last_completion_date).days
-    
-    if days_since >= 3:
-        # HARD RULE: Streak dies on day 3, no mercy
-        habit.current_streak = 0
-        db.commit()
-    elif days_since >= 1 and days_since <= 2:
-        # Days 1-2 of skipping: try to use a freeze
-        if habit.freezes_remaining > 0 and not has_completed_today(db, habit_id, now):
-            # Use the freeze automatically by creating a frozen log
-            habit.freezes_remaining -= 1
-            freeze_log = models.HabitLog(
-                habit_id=habit_id,
-                start_time=now,
-                end_time=now,
-                duration_min=0,
-                is_manual=False,  # Automatic
-                status="frozen"
-            )
-            db.add(freeze_log)
-            db.commit()
+def get_color_for_habit(db: Session, habit: models.Habit) -> str:
+    """Get color based on time of day and completion status (4 colors: green, yellow, orange, red)."""
+    pct_elapsed = get_percent_of_day_elapsed(zone=timezones.zone_for(habit))
+    today_status = get_today_status(db, habit.id)
+    return color_for_status(today_status, pct_elapsed)
 
 def get_habit_status(db: Session, habit_id: int, user_id: int) -> dict:
     """Get daily status of a habit."""
@@ -388,9 +689,7 @@ def get_habit_status(db: Session, habit_id: int, user_id: int) -> dict:
     if not habit or habit.user_id != user_id:
         return None
     
-    # Apply automatic freezes first (handles skipped days)
-    apply_automatic_freezes(db, habit_id)
-    
+    # Pure read: skipped days are handled by the nightly rollover (app/rollover.py)
     status = get_today_status(db, habit_id)
     color = get_color_for_habit(db, habit)
     # Note: in_danger removed - freeze count is the main indicator of danger
@@ -402,12 +701,178 @@ def get_habit_status(db: Session, habit_id: int, user_id: int) -> dict:
         "color": color
     }
 
+# -------------------------
+# ETags (see app/versions.py)
+# -------------------------
+
+def get_user_version(db: Session, user_id: int) -> int | None:
+    return db.execute(select(models.User.version).where(models.User.id == user_id)).scalar()
+
+def habits_etag(user_id: int, version: int) -> str:
+    """GET /habits/ lists the user's habits, which all bump the user's version."""
+    return f'"habits-{user_id}-{version}"'
+
+def status_etag(habit: models.Habit, now: datetime | None = None) -> str:
+    """The status also depends on the owner's day and, until it is completed, the color band."""
+    now = now or datetime.now(timezone.utc)
+    zone = timezones.zone_for(habit)
+    pct_elapsed = get_percent_of_day_elapsed(now, zone)
+    return f'"status-{habit.id}-{habit.version}-{timezones.local_date(now, zone).isoformat()}-{color_band(pct_elapsed)}"'
+
+def stats_etag(habit: models.Habit, now: datetime | None = None) -> str:
+    """The stats also depend on the owner's day (week/month windows) and days_since_created."""
+    now = now or datetime.now(timezone.utc)
+    days_since_created = (now - habit.created_at).days
+    today = timezones.local_date(now, timezones.zone_for(habit))
+    return f'"stats-{habit.id}-{habit.version}-{today.isoformat()}-{days_since_created}"'
+
+def calendar_etag(habit: models.Habit, year: int, format: str) -> str:
+    """A year's calendar only changes with the habit's logs."""
+    return f'"calendar-{habit.id}-{habit.version}-{year}-{format}"'
+
+def get_cached_habit_status(db: Session, habit: models.Habit, tag: str) -> dict:
+    """get_habit_status through the result cache (app/cache.py); tag is the current status_etag."""
+    return cache.results.get_or_compute("status", habit.id, tag, lambda: get_habit_status(db, habit.id, habit.user_id))
+
+def get_cached_habit_stats(db: Session, habit: models.Habit, tag: str) -> dict:
+    """get_habit_stats through the result cache (app/cache.py); tag is the current stats_etag."""
+    return cache.results.get_or_compute("stats", habit.id, tag, lambda: get_habit_stats(db, habit.id, habit.user_id))
+
+def get_habit_calendar(db: Session, habit: models.Habit, year: int, format: str = "days") -> dict:
+    """Completed and frozen days of one year from the habit's day bitmaps (one row read)."""
+    bitmaps = completion_index.get_year(db, habit.id, year)
+    if format == "bits":
+        days = {kind: base64.b64encode(bits).decode() for kind, bits in bitmaps.items()}
+    else:
+        days = {kind: completion_index.days_in(bits, year) for kind, bits in bitmaps.items()}
+    return {"habit_id": habit.id, "year": year, "format": format, **days}
+
+def get_dashboard(db: Session, user_id: int) -> list[dict]:
+    """Daily status of every habit a user owns, using a fixed number of queries."""
+    habits = get_habits_for_user(db, user_id)
+    if not habits:
+        return []
+
+    statuses = get_today_statuses(db, [habit.id for habit in habits])
+    # All of them are the user's, on the user's day
+    pct_elapsed = get_percent_of_day_elapsed(zone=timezones.zone_for(habits[0]))
+
+    return [
+        {
+            "habit_id": habit.id,
+            "name": habit.name,
+            "status": statuses[habit.id],
+            "color": color_for_status(statuses[habit.id], pct_elapsed),
+            "current_streak": habit.current_streak,
+            "freezes_remaining": habit.freezes_remaining
+        }
+        for habit in habits
+    ]
+
 # -------------------------
 # Statistics and Reporting
 # -------------------------
 
-def get_timer_habit_stats(db: Session, habit: models.Habit) -> dict:
-    """Calculate stats for a timer habit."""
+EMPTY_TIMER_STATS = {
+    "total_time_minutes": 0,
+    "avg_session_minutes": 0.0,
+    "sessions_count": 0,
+    "best_day_minutes": 0,
+    "this_week_minutes": 0,
+    "this_month_minutes": 0,
+    "median_session_minutes": 0.0
+}
+
+def get_stats_windows(now: datetime, zone=timezone.utc) -> tuple[date, date]:
+    """First local days of the week/month totals: 7 and 30 days back, so the totals
+    (and the stats ETag) only move on a write or at the owner's day boundary."""
+    today = timezones.local_date(now, zone)
+    return today - timedelta(days=7), today - timedelta(days=30)
+
+def get_timer_habit_stats(db: Session, habit: models.Habit, counters: dict | None = None, now: datetime | None = None) -> dict:
+    """Stats for a timer habit from its habit_stats counters.
+
+    Only the rolling week/month totals touch habit_logs, as one range scan
+    over the last 30 days. compute_timer_habit_stats gives the same result
+    from a full recompute.
+    """
+    now = now or datetime.now(timezone.utc)
+    counters = counters or stats_counters.get_counters(db, habit.id)
+    if counters["sessions_count"] == 0:
+        return dict(EMPTY_TIMER_STATS)
+
+    week_start, month_start = get_stats_windows(now, timezones.zone_for(habit))
+    duration = func.coalesce(models.HabitLog.duration_min, 0)
+    window = db.execute(select(
+        func.sum(duration).filter(models.HabitLog.local_date >= week_start).label("week"),
+        func.sum(duration).label("month")
+    ).where(
+        models.HabitLog.habit_id == habit.id,
+        models.HabitLog.local_date >= month_start,
+        models.HabitLog.start_time >= timezones.start_time_window(month_start)[0],
+        models.HabitLog.status == "completed",
+        models.HabitLog.end_time != None
+    )).one()
+
+    return {
+        "total_time_minutes": counters["total_minutes"],
+        "avg_session_minutes": round(counters["total_minutes"] / counters["sessions_count"], 2),
+        "sessions_count": counters["sessions_count"],
+        "best_day_minutes": counters["best_day_minutes"],
+        "this_week_minutes": window.week or 0,
+        "this_month_minutes": window.month or 0,
+        "median_session_minutes": round(stats_counters.median_from_histogram(counters["duration_histogram"] or {}), 2)
+    }
+
+def compute_timer_habit_stats(db: Session, habit: models.Habit, now: datetime | None = None) -> dict:
+    """Recompute timer stats from all of the habit's logs.
+
+    On Postgres the aggregates run in the database; other databases (SQLite in
+    tests) fall back to computing them in Python. Both return the same result.
+    """
+    now = now or datetime.now(timezone.utc)
+    if db.get_bind().dialect.name == "postgresql":
+        return get_timer_habit_stats_sql(db, habit, now)
+    return get_timer_habit_stats_python(db, habit, now)
+
+def get_timer_habit_stats_sql(db: Session, habit: models.Habit, now: datetime) -> dict:
+    """Timer stats in a single aggregate query (Postgres only: percentile_cont)."""
+    completed = and_(
+        models.HabitLog.habit_id == habit.id,
+        models.HabitLog.status == "completed",
+        models.HabitLog.end_time != None
+    )
+    duration = func.coalesce(models.HabitLog.duration_min, 0)
+    week_start, month_start = get_stats_windows(now, timezones.zone_for(habit))
+
+    # Best day: per-day totals (the owner's days), then the max of those
+    day_totals = select(func.sum(duration).label("minutes")).where(completed).group_by(models.HabitLog.local_date).subquery()
+    best_day = select(func.max(day_totals.c.minutes)).scalar_subquery()
+
+    row = db.execute(select(
+        func.count().label("sessions_count"),
+        func.sum(duration).label("total"),
+        func.percentile_cont(0.5).within_group(models.HabitLog.duration_min).label("median"),
+        func.sum(duration).filter(models.HabitLog.local_date >= week_start).label("week"),
+        func.sum(duration).filter(models.HabitLog.local_date >= month_start).label("month"),
+        best_day.label("best_day")
+    ).where(completed)).one()
+
+    if row.sessions_count == 0:
+        return dict(EMPTY_TIMER_STATS)
+
+    return {
+        "total_time_minutes": row.total,
+        "avg_session_minutes": round(row.total / row.sessions_count, 2),
+        "sessions_count": row.sessions_count,
+        "best_day_minutes": row.best_day or 0,
+        "this_week_minutes": row.week or 0,
+        "this_month_minutes": row.month or 0,
+        "median_session_minutes": round(row.median or 0.0, 2)
+    }
+
+def get_timer_habit_stats_python(db: Session, habit: models.Habit, now: datetime) -> dict:
+    """Timer stats computed in Python over all completed logs (fallback for non-Postgres databases)."""
     all_logs = db.query(models.HabitLog).filter(
         models.HabitLog.habit_id == habit.id,
         models.HabitLog.status == "completed",
@@ -417,15 +882,7 @@ def get_timer_habit_stats(db: Session, habit: models.Habit) -> dict:
     sessions_count = len(all_logs)
     
     if sessions_count == 0:
-        return {
-            "total_time_minutes": 0,
-            "avg_session_minutes": 0.0,
-            "sessions_count": 0,
-            "best_day_minutes": 0,
-            "this_week_minutes": 0,
-            "this_month_minutes": 0,
-            "median_session_minutes": 0.0
-        }
+        return dict(EMPTY_TIMER_STATS)
     
     # Total time
     total_time_minutes = sum(log.duration_min or 0 for log in all_logs)
@@ -435,25 +892,21 @@ def get_timer_habit_stats(db: Session, habit: models.Habit) -> dict:
     durations = [log.duration_min or 0 for log in all_logs if log.duration_min is not None]
     median_session_minutes = median(durations) if durations else 0.0
     
-    # Best day
+    # Best day (the owner's days, like the SQL path)
     day_totals = {}
     for log in all_logs:
-        date_key = log.start_time.date()
-        day_totals[date_key] = day_totals.get(date_key, 0) + (log.duration_min or 0)
+        day_totals[log.local_date] = day_totals.get(log.local_date, 0) + (log.duration_min or 0)
     best_day_minutes = max(day_totals.values()) if day_totals else 0
     
-    # This week (last 7 days)
-    week_ago = datetime.now(timezone.utc) - timedelta(days=7)
+    # This week / month (since the owner's midnight 7 / 30 days ago)
+    week_start, month_start = get_stats_windows(now, timezones.zone_for(habit))
     this_week_minutes = sum(
         log.duration_min or 0 for log in all_logs 
-        if log.start_time >= week_ago
+        if log.local_date >= week_start
     )
-    
-    # This month (last 30 days)
-    month_ago = datetime.now(timezone.utc) - timedelta(days=30)
     this_month_minutes = sum(
         log.duration_min or 0 for log in all_logs 
-        if log.start_time >= month_ago
+        if log.local_date >= month_start
     )
     
     return {
@@ -466,14 +919,10 @@ def get_timer_habit_stats(db: Session, habit: models.Habit) -> dict:
         "median_session_minutes": round(median_session_minutes, 2)
     }
 
-def get_manual_habit_stats(db: Session, habit: models.Habit) -> dict:
-    """Calculate stats for a manual habit."""
-    # Total completions
-    completed_logs = db.query(models.HabitLog).filter(
-        models.HabitLog.habit_id == habit.id,
-        models.HabitLog.status == "completed"
-    ).all()
-    total_completions = len(completed_logs)
+def get_manual_habit_stats(db: Session, habit: models.Habit, counters: dict | None = None) -> dict:
+    """Stats for a manual habit from its habit_stats counters."""
+    counters = counters or stats_counters.get_counters(db, habit.id)
+    total_completions = counters["completions_count"]
     
     # Days since created
     days_since_created = (datetime.now(timezone.utc) - habit.created_at).days
@@ -483,23 +932,10 @@ def get_manual_habit_stats(db: Session, habit: models.Habit) -> dict:
     if days_since_created > 0:
         completion_rate_percent = (total_completions / days_since_created) * 100
     
-    # Best streak - track from completion gaps
-    all_complete_dates = sorted(set(log.start_time.date() for log in completed_logs))
-    best_streak = 1 if all_complete_dates else 0
-    
-    if len(all_complete_dates) > 1:
-        current_streak_calc = 1
-        for i in range(1, len(all_complete_dates)):
-            if (all_complete_dates[i] - all_complete_dates[i-1]).days == 1:
-                current_streak_calc += 1
-                best_streak = max(best_streak, current_streak_calc)
-            else:
-                current_streak_calc = 1
-    
     return {
         "total_completions": total_completions,
         "completion_rate_percent": round(completion_rate_percent, 2),
-        "best_streak": best_streak,
+        "best_streak": counters["best_completion_run"],  # Longest run of consecutive completion days
         "days_since_created": days_since_created
     }
 
@@ -509,51 +945,23 @@ def get_habit_stats(db: Session, habit_id: int, user_id: int) -> dict | None:
     if not habit or habit.user_id != user_id:
         return None
     
-    user = get_user_by_id(db, user_id)
-    
     # Calculate days since created
     days_since_created = (datetime.now(timezone.utc) - habit.created_at).days
     
+    # Running totals, maintained on write (one row read)
+    counters = stats_counters.get_counters(db, habit.id)
+    
     # Get type-specific stats
     if habit.is_timer:
-        stats = get_timer_habit_stats(db, habit)
+        stats = get_timer_habit_stats(db, habit, counters)
         habit_type = "timer"
     else:
-        stats = get_manual_habit_stats(db, habit)
+        stats = get_manual_habit_stats(db, habit, counters)
         habit_type = "manual"
     
-    # Calculate best streak from logs (for now, assume it equals current_streak)
-    # In future, we could track best_streak in habit table
-    best_streak = habit.current_streak
-    
-    # Count freezes used
-    freeze_logs = db.query(models.HabitLog).filter(
-        models.HabitLog.habit_id == habit.id,
-        models.HabitLog.status == "frozen"
-    ).count()
-    
-    # Get streak start date (when did current streak begin?)
-    streak_start_date = None
-    if habit.current_streak > 0:
-        all_completed = db.query(models.HabitLog).filter(
-            models.HabitLog.habit_id == habit.id,
-            models.HabitLog.status.in_(["completed", "frozen"])
-        ).order_by(models.HabitLog.start_time.desc()).all()
-        
-        if all_completed:
-            streak_count = 0
-            for i, log in enumerate(all_completed):
-                if i == 0:
-                    streak_count = 1
-                    continue
-                prev_date = all_completed[i-1].start_time.date()
-                curr_date = log.start_time.date()
-                if (prev_date - curr_date).days == 1:
-                    streak_count += 1
-                else:
-                    break
-            if streak_count == habit.current_streak and len(all_completed) > 0:
-                streak_start_date = all_completed[streak_count - 1].start_time
+    # Streak bookkeeping is kept on the habit row by the streak code paths
+    best_streak = max(habit.best_streak or 0, habit.current_streak or 0)
+    streak_start_date = habit.current_streak_started_at if habit.current_streak else None
     
     return {
         "habit_id": habit_id,
@@ -565,7 +973,7 @@ def get_habit_stats(db: Session, habit_id: int, user_id: int) -> dict | None:
             "best": best_streak
         },
         "freezes": {
-            "used": freeze_logs,
+            "used": counters["freezes_used"],
             "remaining": habit.freezes_remaining  # Per-habit freezes remaining
         },
         "days_since_created": days_since_created,
@@ -1,18 +1,290 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from dotenv import load_dotenv
+from contextvars import ContextVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from starlette.concurrency import run_in_threadpool
+from app.settings import Settings, env_bool, env_int
+import logging
 import os
+import threading
+import time
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-# Build connection string from environment variables
-SQLALCHEMY_DATABASE_URL = (
-    f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
-    f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}"
-)
+# Set by configure() (create_app passes its Settings); scripts that never call
+# it are configured from Settings.from_env() when the engine is first built
+SQLALCHEMY_DATABASE_URL: str | None = None
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# "sync": routes run crud on a blocking Session in the threadpool (default)
+# "async": routes run crud on an AsyncSession (asyncpg / aiosqlite) on the event loop
+DB_MODE = "sync"
+
+
+# -------------------------
+# Connection pool
+# -------------------------
+
+def pool_settings() -> dict:
+    """Pool configuration from the environment.
+
+    Size the pool per worker process: workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    must stay under Postgres' max_connections. Behind PgBouncer in transaction
+    mode set DB_POOL_MODE=pgbouncer: connections are not pooled in-process
+    (NullPool), server-side prepared statements are disabled and the statement
+    timeout is set per transaction.
+    """
+    return {
+        "mode": os.getenv("DB_POOL_MODE", "queue").lower(),  # queue | pgbouncer
+        "pool_size": env_int("DB_POOL_SIZE", 5),
+        "max_overflow": env_int("DB_MAX_OVERFLOW", 10),
+        "pool_timeout": env_int("DB_POOL_TIMEOUT", 30),  # Seconds to wait for a free connection
+        "pool_pre_ping": env_bool("DB_POOL_PRE_PING", True),  # Drop connections the server closed
+        "pool_recycle": env_int("DB_POOL_RECYCLE", 1800),  # Seconds; -1 keeps connections forever
+        "statement_timeout_ms": env_int("DB_STATEMENT_TIMEOUT_MS", 0),  # 0 = no timeout
+        "slow_checkout_ms": env_int("DB_POOL_SLOW_CHECKOUT_MS", 100),  # Log checkouts waiting longer
+    }
+
+
+class PoolMetrics:
+    """Pool checkout counters: how often and how long requests queued for a connection."""
+
+    def __init__(self, slow_checkout_ms: int = 100):
+        self.slow_checkout_ms = slow_checkout_ms
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.checkouts = 0
+            self.timeouts = 0
+            self.total_wait_ms = 0.0
+            self.max_wait_ms = 0.0
+
+    def record(self, wait_ms: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_ms += wait_ms
+            self.max_wait_ms = max(self.max_wait_ms, wait_ms)
+        if wait_ms > self.slow_checkout_ms:
+            logger.warning("Waited %.0f ms for a database connection%s", wait_ms, " (timed out)" if timed_out else "")
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": self.total_wait_ms / self.checkouts if self.checkouts else 0.0,
+                "max_wait_ms": self.max_wait_ms,
+                "total_wait_ms": self.total_wait_ms,
+            }
+
+
+POOL_SETTINGS = pool_settings()
+pool_metrics = PoolMetrics(POOL_SETTINGS["slow_checkout_ms"])
+
+
+class WaitTimingMixin:
+    """Times every checkout from the pool's queue into pool_metrics."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record((time.perf_counter() - start) * 1000, timed_out=True)
+            raise
+        pool_metrics.record((time.perf_counter() - start) * 1000)
+        return connection
+
+
+class InstrumentedQueuePool(WaitTimingMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(WaitTimingMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def apply_statement_timeout(target_engine, timeout_ms: int, per_transaction: bool):
+    """Make Postgres cancel statements running longer than timeout_ms."""
+    if per_transaction:
+        # Transaction-mode poolers hand out a different server connection per transaction
+        @event.listens_for(target_engine, "begin")
+        def set_local_timeout(conn):
+            conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+    else:
+        @event.listens_for(target_engine, "connect")
+        def set_timeout(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            cursor.execute(f"SET statement_timeout = {int(timeout_ms)}")
+            cursor.close()
+
+
+def engine_options(url: str, settings: dict, is_async: bool = False) -> dict:
+    """create_engine/create_async_engine keyword arguments for the pool settings."""
+    if not url.startswith("postgresql"):
+        # SQLite picks its own pool class; sizing does not apply
+        return {}
+    if settings["mode"] == "pgbouncer":
+        options = {"poolclass": NullPool}
+        if is_async:
+            # asyncpg prepares every statement; PgBouncer cannot route prepared statements
+            options["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return options
+
+    return {
+        "poolclass": InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        "pool_size": settings["pool_size"],
+        "max_overflow": settings["max_overflow"],
+        "pool_timeout": settings["pool_timeout"],
+        "pool_pre_ping": settings["pool_pre_ping"],
+        "pool_recycle": settings["pool_recycle"],
+    }
+
+
+def create_db_engine(url: str | None = None, settings: dict | None = None):
+    """Sync engine with the configured pool and statement timeout."""
+    url = url or get_database_url()
+    settings = settings or POOL_SETTINGS
+    new_engine = create_engine(url, **engine_options(url, settings))
+    if settings["statement_timeout_ms"] and url.startswith("postgresql"):
+        apply_statement_timeout(new_engine, settings["statement_timeout_ms"], settings["mode"] == "pgbouncer")
+    return new_engine
+
+
+def get_pool_stats() -> dict:
+    """Checkout wait metrics plus the current state of the sync and async pools."""
+    stats = pool_metrics.snapshot()
+    stats["pool"] = get_engine().pool.status()
+    if async_engine is not None:
+        stats["async_pool"] = async_engine.pool.status()
+    return stats
+
+
+# -------------------------
+# Per-request query stats
+# -------------------------
+
+# Statements kept per request for the slow-request log
+MAX_RECORDED_STATEMENTS = 50
+
+
+class QueryStats:
+    """Count, total time and slowest SQL statement of one request."""
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.slowest_ms = 0.0
+        self.slowest_statement = None
+        self.statements: list[tuple[float, str]] = []
+
+    def record(self, statement: str, elapsed_ms: float):
+        self.count += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms >= self.slowest_ms:
+            self.slowest_ms = elapsed_ms
+            self.slowest_statement = statement
+        if len(self.statements) < MAX_RECORDED_STATEMENTS:
+            self.statements.append((elapsed_ms, statement))
+
+    def server_timing(self, total_ms: float) -> str:
+        """Server-Timing header value: DB time with the query count, slowest query, whole request."""
+        return (
+            f'db;desc="{self.count} queries";dur={self.total_ms:.1f}, '
+            f"db-slowest;dur={self.slowest_ms:.1f}, "
+            f"total;dur={total_ms:.1f}"
+        )
+
+
+# Set by the request middleware; copied into threadpool workers and run_sync greenlets
+current_query_stats: ContextVar[QueryStats | None] = ContextVar("current_query_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info["query_start"].pop()) * 1000
+    stats = current_query_stats.get()
+    if stats is not None:
+        stats.record(statement, elapsed_ms)
+
+
+@event.listens_for(Engine, "handle_error")
+def drop_query_timer(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and not exception_context.is_disconnect and conn.info.get("query_start"):
+        conn.info["query_start"].pop()
+
+
+# -------------------------
+# Engine and sessions
+# -------------------------
+
+engine = None
+engine_lock = threading.Lock()
+
+
+def get_database_url() -> str:
+    if SQLALCHEMY_DATABASE_URL is None:
+        configure(Settings.from_env())
+    return SQLALCHEMY_DATABASE_URL
+
+
+def configure(settings: Settings):
+    """Point the app at settings.database_url in settings.db_mode.
+
+    Engines already built for another URL, sync and async, are disposed and
+    rebuilt on next use. The pool settings are read again, .env included.
+    """
+    global SQLALCHEMY_DATABASE_URL, DB_MODE, engine, async_engine, AsyncSessionLocal
+    with engine_lock:
+        if settings.database_url != SQLALCHEMY_DATABASE_URL:
+            if engine is not None:
+                engine.dispose()
+                engine = None
+            if async_engine is not None:
+                # Closing pooled async connections needs their event loop: leave them to the garbage collector
+                async_engine.sync_engine.dispose(close=False)
+                async_engine = None
+            AsyncSessionLocal = None
+        SQLALCHEMY_DATABASE_URL = settings.database_url
+        DB_MODE = settings.db_mode
+        POOL_SETTINGS.update(pool_settings())
+        pool_metrics.slow_checkout_ms = POOL_SETTINGS["slow_checkout_ms"]
+
+
+def get_engine():
+    """The sync engine, built on first use so importing the app never loads a driver or connects."""
+    global engine
+    if engine is None:
+        url = get_database_url()
+        with engine_lock:
+            if engine is None:
+                engine = create_db_engine(url)
+    return engine
+
+
+class LazySessionmaker(sessionmaker):
+    """sessionmaker bound to get_engine() at each call rather than at import."""
+
+    def __call__(self, **local_kw):
+        local_kw.setdefault("bind", get_engine())
+        return super().__call__(**local_kw)
+
+
+SessionLocal = LazySessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
@@ -23,3 +295,66 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# -------------------------
+# Async mode
+# -------------------------
+
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+async_engine = None
+AsyncSessionLocal = None
+
+# What get_session yields, depending on DB_MODE
+AnySession = Session | AsyncSession
+
+
+def async_database_url(url: str) -> str:
+    """Same database, async driver: postgresql:// -> postgresql+asyncpg://, sqlite:// -> sqlite+aiosqlite://."""
+    scheme, rest = url.split("://", 1)
+    backend = scheme.split("+")[0]
+    return f"{ASYNC_DRIVERS.get(backend, scheme)}://{rest}"
+
+
+def get_async_sessionmaker():
+    """Async session factory, created on first use so sync mode never needs the async drivers."""
+    global async_engine, AsyncSessionLocal
+    if AsyncSessionLocal is None:
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        url = async_database_url(get_database_url())
+        async_engine = create_async_engine(url, **engine_options(url, POOL_SETTINGS, is_async=True))
+        if POOL_SETTINGS["statement_timeout_ms"] and url.startswith("postgresql"):
+            apply_statement_timeout(
+                async_engine.sync_engine, POOL_SETTINGS["statement_timeout_ms"], POOL_SETTINGS["mode"] == "pgbouncer"
+            )
+        # Objects are read after commit by the response serializer, outside the session's greenlet
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    return AsyncSessionLocal
+
+
+async def get_session():
+    """Route dependency: an AsyncSession in async mode, a Session otherwise. Use with run_db."""
+    if DB_MODE == "async":
+        async with get_async_sessionmaker()() as db:
+            yield db
+    else:
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+
+
+async def run_db(db, fn, *args, **kwargs):
+    """Await a sync crud function on either kind of session.
+
+    AsyncSession: runs it through run_sync, so its queries go through the async
+    driver without blocking the event loop. Session: runs it in the threadpool.
+    """
+    if isinstance(db, Session):
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    return await db.run_sync(lambda session: fn(session, *args, **kwargs))
@@ -0,0 +1,280 @@
+"""Request, database and timer metrics in Prometheus text format.
+
+Counters, gauges and histograms live in memory and are updated under a
+per-metric lock, so recording costs a dict update. With several uvicorn or
+gunicorn workers, set METRICS_DIR to a directory shared by the workers and
+empty it before the server starts: each worker writes its values to
+METRICS_DIR/<pid>.json every METRICS_FLUSH_INTERVAL seconds and GET /metrics sums
+the files of all workers. Counters and histograms of workers that exited
+are kept so totals never go backwards; their gauges are dropped. Without
+METRICS_DIR only the scraped process is reported.
+"""
+from bisect import bisect_left
+import json
+import os
+import threading
+
+from app import database
+
+# Seconds; request latencies from a cached read to a slow stats page
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.series: dict[tuple, float | list] = {}
+        self.lock = threading.Lock()
+        REGISTRY[name] = self
+
+    def export(self) -> list:
+        with self.lock:
+            return [[list(key), value] for key, value in self.series.items()]
+
+    @staticmethod
+    def merge(total, value):
+        """Combine one series across workers."""
+        return total + value
+
+    def samples(self, series: dict) -> list[tuple[str, tuple, tuple, float]]:
+        """(suffix, label names, label values, value) lines for the text format."""
+        return [("", self.labels, key, value) for key, value in sorted(series.items())]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *label_values, amount: float = 1):
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def set(self, value: float, *label_values):
+        """For totals counted elsewhere (e.g. the pool's checkout counters)."""
+        with self.lock:
+            self.series[label_values] = value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *label_values):
+        with self.lock:
+            self.series[label_values] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value: float, *label_values):
+        # Per-bucket (not cumulative) counts, then +Inf, then the sum
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def export(self) -> list:
+        with self.lock:
+            return [[list(key), list(value)] for key, value in self.series.items()]
+
+    @staticmethod
+    def merge(total, value):
+        return [a + b for a, b in zip(total, value)]
+
+    def samples(self, series: dict) -> list[tuple[str, tuple, tuple, float]]:
+        lines = []
+        bucket_labels = self.labels + ("le",)
+        for key, counts in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else format_value(bound)
+                lines.append(("_bucket", bucket_labels, key + (le,), cumulative))
+            lines.append(("_sum", self.labels, key, counts[-1]))
+            lines.append(("_count", self.labels, key, cumulative))
+        return lines
+
+
+REGISTRY: dict[str, Metric] = {}
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+REQUEST_EXCEPTIONS = Counter("http_request_exceptions_total", "Requests that raised an unhandled exception.", ("method", "route", "exception"))
+DB_QUERIES = Counter("db_queries_total", "SQL statements run while handling requests.", ("route",))
+DB_QUERY_SECONDS = Counter("db_query_seconds_total", "Time spent in SQL statements while handling requests.", ("route",))
+TIMER_SESSIONS_STARTED = Counter("timer_sessions_started_total", "Timer sessions started.")
+TIMER_SESSIONS_STOPPED = Counter("timer_sessions_stopped_total", "Timer sessions stopped.")
+RESULT_CACHE_HITS = Counter("result_cache_hits_total", "Stats/status results served from the result cache.", ("kind",))
+RESULT_CACHE_MISSES = Counter("result_cache_misses_total", "Stats/status results computed because the cache had no current entry.", ("kind",))
+RESULT_CACHE_EVICTIONS = Counter("result_cache_evictions_total", "Entries the in-memory result cache dropped to stay within its size.")
+SINGLE_FLIGHT_COALESCED = Counter("single_flight_coalesced_total", "Stats/status requests served by another request's in-flight computation.", ("kind",))
+SINGLE_FLIGHT_TIMEOUTS = Counter("single_flight_timeouts_total", "Requests that stopped waiting on an in-flight computation and ran their own.", ("kind",))
+EVENT_STREAMS_OPEN = Gauge("event_streams_open", "Server-Sent Event streams connected.")
+POOL_IN_USE = Gauge("db_pool_connections_in_use", "Connections checked out of the pool.")
+POOL_SIZE = Gauge("db_pool_size", "Configured pool size.")
+POOL_OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond the pool size.")
+POOL_CHECKOUTS = Counter("db_pool_checkouts_total", "Connections handed out by the pool.")
+POOL_TIMEOUTS = Counter("db_pool_checkout_timeouts_total", "Checkouts that gave up waiting for a connection.")
+POOL_WAIT_SECONDS = Counter("db_pool_checkout_wait_seconds_total", "Time spent waiting for a pooled connection.")
+
+
+def route_template(scope: dict) -> str:
+    """/habits/{id}/status rather than /habits/42/status, so label values stay bounded."""
+    route = scope.get("route")
+    return getattr(route, "path", "unmatched")
+
+
+def observe_request(method: str, route: str, status: int, seconds: float, query_stats: database.QueryStats | None = None):
+    REQUESTS.inc(method, route, str(status))
+    REQUEST_DURATION.observe(seconds, method, route)
+    if query_stats is not None and query_stats.count:
+        DB_QUERIES.inc(route, amount=query_stats.count)
+        DB_QUERY_SECONDS.inc(route, amount=query_stats.total_ms / 1000)
+
+
+def collect_pool_stats():
+    """Copy this process's pool state into the pool metrics."""
+    pool = database.get_engine().pool
+    # NullPool (pgbouncer mode) and SQLite's pools do not size themselves
+    if hasattr(pool, "checkedout"):
+        POOL_IN_USE.set(pool.checkedout())
+        POOL_SIZE.set(pool.size())
+        POOL_OVERFLOW.set(max(pool.overflow(), 0))
+    stats = database.pool_metrics.snapshot()
+    POOL_CHECKOUTS.set(stats["checkouts"])
+    POOL_TIMEOUTS.set(stats["timeouts"])
+    POOL_WAIT_SECONDS.set(stats["total_wait_ms"] / 1000)
+
+
+def snapshot() -> dict:
+    collect_pool_stats()
+    return {name: metric.export() for name, metric in REGISTRY.items()}
+
+
+# -------------------------
+# Multi-process aggregation
+# -------------------------
+
+def flush(directory: str | None):
+    """Write this process's values to <directory>/<pid>.json (atomically)."""
+    if not directory:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def load_snapshots(directory: str | None) -> list[tuple[int, dict]]:
+    """(pid, values) of every worker, this process's always fresh."""
+    if not directory:
+        return [(os.getpid(), snapshot())]
+    flush(directory)
+    snapshots = []
+    for filename in os.listdir(directory):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, filename)) as f:
+                snapshots.append((int(filename[:-5]), json.load(f)))
+        except (OSError, ValueError):
+            continue  # Being replaced or not ours
+    return snapshots
+
+
+def merge(snapshots: list[tuple[int, dict]]) -> dict[str, dict[tuple, float | list]]:
+    merged: dict[str, dict[tuple, float | list]] = {name: {} for name in REGISTRY}
+    for pid, values in snapshots:
+        alive = None
+        for name, series in values.items():
+            metric = REGISTRY.get(name)
+            if metric is None:
+                continue
+            if metric.kind == "gauge":
+                if alive is None:
+                    alive = is_alive(pid)
+                if not alive:
+                    continue
+            target = merged[name]
+            for labels, value in series:
+                key = tuple(labels)
+                target[key] = metric.merge(target[key], value) if key in target else value
+    return merged
+
+
+# -------------------------
+# Text format
+# -------------------------
+
+def format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def render_metric(name: str, kind: str, help: str, lines: list[tuple[str, tuple, tuple, float]]) -> list[str]:
+    out = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    out.extend(f"{name}{suffix}{format_labels(names, values)} {format_value(value)}" for suffix, names, values, value in lines)
+    return out
+
+
+def render(directory: str | None = None, gauges: dict[str, tuple[str, float]] | None = None) -> str:
+    """All workers' metrics, plus process-independent gauges given as {name: (help, value)}."""
+    merged = merge(load_snapshots(directory))
+    out = []
+    for name, metric in REGISTRY.items():
+        out.extend(render_metric(name, metric.kind, metric.help, metric.samples(merged[name])))
+    for name, (help, value) in (gauges or {}).items():
+        out.extend(render_metric(name, "gauge", help, [("", (), (), value)]))
+    return "\n".join(out) + "\n"
+
+
+class Flusher(threading.Thread):
+    """Writes this worker's metrics to METRICS_DIR every METRICS_FLUSH_INTERVAL seconds."""
+
+    def __init__(self, directory: str, interval: float = 1.0):
+        super().__init__(daemon=True, name="metrics-flusher")
+        self.directory = directory
+        self.interval = interval
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            flush(self.directory)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        flush(self.directory)
@@ -1,17 +1,39 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Float
+from sqlalchemy import Column, Integer, String, ForeignKey, Date, DateTime, Boolean, Float, Index, JSON, LargeBinary
 from sqlalchemy.orm import relationship
+from sqlalchemy.types import TypeDecorator
 from datetime import datetime, timezone
 from .database import Base
 
+class UTCDateTime(TypeDecorator):
+    """DateTime(timezone=True) that stores UTC and always reads back aware UTC datetimes.
+
+    SQLite keeps no offset: it would store aware values as their local wall time
+    and return naive ones, which cannot be compared with datetime.now(timezone.utc).
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone(timezone.utc)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            return value.replace(tzinfo=timezone.utc)
+        return value
+
 class User(Base):
     __tablename__ = "users"
 
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String, unique=True, index=True)
     hashed_password = Column(String, nullable=False)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
     freeze_balance = Column(Integer, default=0)  # Number of streak freezes available
     freeze_used_in_row = Column(Integer, default=0)  # Consecutive freezes used
+    version = Column(Integer, default=0, server_default="0", nullable=False)  # Bumped on any change to the user or their habits (see app/versions.py)
+    timezone = Column(String, default="UTC", server_default="UTC", nullable=False)  # IANA name; where the user's days start (see app/timezones.py)
 
     habits = relationship("Habit", back_populates="owner")
 
@@ -26,24 +48,99 @@ class Habit(Base):
     is_freezable = Column(Boolean, default=True)  # Whether streak freezes can be used
     danger_start_pct = Column(Float, default=0.7)  # Percentage of day when habit becomes "in danger"
     current_streak = Column(Integer, default=0)  # Current active streak count
+    best_streak = Column(Integer, default=0)  # Longest streak ever reached
+    current_streak_started_at = Column(UTCDateTime, nullable=True)  # First completion of the current streak
     freezes_remaining = Column(Integer, default=2)  # Freezes available for this habit (per-habit)
-    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    created_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
+    version = Column(Integer, default=0, server_default="0", nullable=False)  # Bumped on any change to the habit or its logs
 
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     owner = relationship("User", back_populates="habits")
 
     logs = relationship("HabitLog", back_populates="habit")
 
 class HabitLog(Base):
+    # On Postgres the table is partitioned by month of start_time, with (id, start_time) as its
+    # primary key (see app/partitions.py). The mapper uses the same key, so the UPDATE and
+    # DELETE of a flush name the row's partition; by-id lookups take the pair too.
     __tablename__ = "habit_logs"
 
     id = Column(Integer, primary_key=True, index=True)
-    start_time = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
-    end_time = Column(DateTime(timezone=True), nullable=True)
+    start_time = Column(UTCDateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    end_time = Column(UTCDateTime, nullable=True)
     duration_min = Column(Integer, nullable=True)
     notes = Column(String, nullable=True)
     is_manual = Column(Boolean, default=False)
     status = Column(String, default='pending')  # pending, completed, missed, frozen
+    local_date = Column(Date, nullable=True)  # Day of start_time in the owner's timezone, set on write
 
     habit_id = Column(Integer, ForeignKey("habits.id"))
     habit = relationship("Habit", back_populates="logs")
+
+    __table_args__ = (
+        # Time-bounded lookups and keyset pagination
+        Index("ix_habit_logs_habit_id_start_time_id", habit_id, start_time, id),
+        # Day lookups (today's logs, this week/month windows, per-day stats and calendar)
+        Index("ix_habit_logs_habit_id_local_date", habit_id, local_date),
+        # Status-filtered lookups, newest first (last completion, stats)
+        Index("ix_habit_logs_habit_id_status_start_time", habit_id, status, start_time.desc()),
+        # Running timer sessions only
+        Index(
+            "ix_habit_logs_active",
+            habit_id,
+            postgresql_where=end_time.is_(None),
+            sqlite_where=end_time.is_(None),
+        ),
+    )
+    __mapper_args__ = {"primary_key": [id, start_time]}
+
+class HabitStats(Base):
+    """Running stats counters for a habit, maintained on write (see app/stats_counters.py)."""
+    __tablename__ = "habit_stats"
+
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True)
+    sessions_count = Column(Integer, default=0, nullable=False)  # Completed logs with an end_time
+    total_minutes = Column(Integer, default=0, nullable=False)
+    completions_count = Column(Integer, default=0, nullable=False)  # All completed logs
+    freezes_used = Column(Integer, default=0, nullable=False)
+    best_day_minutes = Column(Integer, default=0, nullable=False)
+    duration_histogram = Column(JSON, default=dict)  # {"<minutes>": sessions}, for the median
+    last_completed_date = Column(Date, nullable=True)
+    completion_run = Column(Integer, default=0, nullable=False)  # Consecutive completion days ending at last_completed_date
+    best_completion_run = Column(Integer, default=0, nullable=False)
+    updated_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
+
+class HabitCalendar(Base):
+    """One year of a habit's completed and frozen days, one bit per day (see app/completion_index.py)."""
+    __tablename__ = "habit_calendar"
+
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    completed = Column(LargeBinary, nullable=False)  # Day n of the year (Jan 1 = 0) is bit n % 8 of byte n // 8
+    frozen = Column(LargeBinary, nullable=False)
+
+class RolloverRun(Base):
+    """Progress of the day rollover job for one day (see app/rollover.py)."""
+    __tablename__ = "rollover_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, unique=True, nullable=False)
+    last_habit_id = Column(Integer, default=0, nullable=False)  # Habits are processed in id order
+    habits_frozen = Column(Integer, default=0)
+    streaks_reset = Column(Integer, default=0)
+    started_at = Column(UTCDateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = Column(UTCDateTime, nullable=True)
+
+class RevokedToken(Base):
+    """A logged-out token, or with no token_hash every token of the user issued before revoked_at (see app/utils.py)."""
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)  # No foreign key: a deleted user's tokens stay revoked
+    token_hash = Column(String(64), nullable=True)  # SHA-256 of the token
+    revoked_at = Column(UTCDateTime, nullable=False)
+    expires_at = Column(UTCDateTime, nullable=False, index=True)  # The row is useless once the tokens have expired
+
+    __table_args__ = (
+        Index("ix_revoked_tokens_user_id", user_id),
+    )
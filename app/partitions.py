@@ -0,0 +1,138 @@
+"""Monthly range partitions of habit_logs (Postgres).
+
+Once migrated (alembic revision 3d8a6f2c9e14), habit_logs is partitioned by
+RANGE (start_time): one partition per UTC calendar month, named
+habit_logs_yYYYYmMM, plus habit_logs_default for rows outside every month
+(backdated imports older than the first partition). A query that bounds
+start_time only reads the partitions it needs. The day lookups add such a
+bound next to their local_date condition (timezones.start_time_window).
+
+Writes need the partition of their month, so partitions are created
+MONTHS_AHEAD months ahead: daily by the in-process scheduler
+(app/rollover.py), or by `python partitions.py ensure` from cron. A month
+whose rows already landed in the default partition gets them moved into its
+new partition.
+
+Old months are archived by detaching their partitions into the
+ARCHIVE_SCHEMA schema (`python partitions.py archive --before 2024-01-01`).
+They stay queryable there and can be dumped and dropped at leisure. Detached
+logs no longer count for anything rebuilt from habit_logs: reconcile_stats.py
+--fix and calendar years that were never written.
+
+Everything here is a no-op on other databases and on an unpartitioned table.
+"""
+import re
+from datetime import date, datetime, timezone
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+PARENT = "habit_logs"
+DEFAULT_PARTITION = f"{PARENT}_default"
+ARCHIVE_SCHEMA = "archive"
+MONTHS_AHEAD = 3
+
+PARTITION_NAME = re.compile(rf"^{PARENT}_y(\d{{4}})m(\d{{2}})$")
+SCHEMA_NAME = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARENT}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_bounds(month: date) -> str:
+    """FOR VALUES clause of a month's partition, in UTC."""
+    return f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+
+
+def is_partitioned(conn: Connection) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:parent))"),
+        {"parent": PARENT},
+    ).scalar()
+
+
+def lock_partitions(conn: Connection):
+    """Serialize partition maintenance (several workers may run the scheduler) until the transaction ends."""
+    conn.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"{PARENT} partitions"})
+
+
+def attached_months(conn: Connection) -> list[date]:
+    """Months that have a partition attached to habit_logs, oldest first."""
+    names = conn.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(:parent)"
+        ),
+        {"parent": PARENT},
+    ).scalars()
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append(date(int(match[1]), int(match[2]), 1))
+    return sorted(months)
+
+
+def create_partition(conn: Connection, month: date):
+    """Create and attach a month's partition, moving in any of its rows held by the default partition."""
+    name = partition_name(month)
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    conn.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE start_time >= :start AND start_time < :end RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        ),
+        {
+            "start": datetime.combine(month, datetime.min.time(), tzinfo=timezone.utc),
+            "end": datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=timezone.utc),
+        },
+    )
+    # Builds the partition's share of the parent's indexes
+    conn.execute(text(f"ALTER TABLE {PARENT} ATTACH PARTITION {name} {partition_bounds(month)}"))
+
+
+def ensure_partitions(conn: Connection, today: date | None = None, months_ahead: int = MONTHS_AHEAD) -> list[str]:
+    """Create the missing partitions from this month through `months_ahead` months after it. Returns their names."""
+    if not is_partitioned(conn):
+        return []
+    lock_partitions(conn)
+    current = month_start(today or datetime.now(timezone.utc).date())
+    existing = set(attached_months(conn))
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            create_partition(conn, month)
+            created.append(partition_name(month))
+    return created
+
+
+def archive_partitions(conn: Connection, before: date, schema: str = ARCHIVE_SCHEMA) -> list[str]:
+    """Detach the partitions of the months that end by `before` and move them to `schema`. Returns their names."""
+    if not SCHEMA_NAME.match(schema):
+        raise ValueError(f"Invalid schema name: {schema}")
+    if not is_partitioned(conn):
+        return []
+    lock_partitions(conn)
+    conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+    archived = []
+    for month in attached_months(conn):
+        if add_months(month, 1) > before:
+            break
+        name = partition_name(month)
+        conn.execute(text(f"ALTER TABLE {PARENT} DETACH PARTITION {name}"))
+        conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {schema}"))
+        archived.append(name)
+    return archived
@@ -0,0 +1,75 @@
+"""Password hashing off the request threadpool.
+
+bcrypt costs a few hundred milliseconds of CPU per call. Run in Starlette's
+shared threadpool, a burst of logins takes every thread and stalls all other
+routes. Hashing and verification go to a dedicated executor instead, by
+default a process pool so they cannot compete for the GIL either. The
+executor's queue is bounded: past PASSWORD_HASH_QUEUE pending calls
+PasswordHashingBusy is raised, which main.py turns into a 503 with
+Retry-After.
+"""
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+
+from app import utils
+
+PASSWORD_HASH_POOL = os.getenv("PASSWORD_HASH_POOL", "process").lower()  # process | thread
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", PASSWORD_HASH_WORKERS * 8))  # Running + waiting calls
+
+
+class PasswordHashingBusy(Exception):
+    """Too many hashes queued; retry_after is the estimated wait in seconds."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Password hashing is busy, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+executor: Executor | None = None
+pending = 0
+avg_seconds = 0.25  # Moving average of a call's latency including its wait in the queue, for Retry-After
+
+
+def get_executor() -> Executor:
+    """Created on first use; processes are spawned so they don't inherit the app's threads."""
+    global executor
+    if executor is None:
+        if PASSWORD_HASH_POOL == "thread":
+            executor = ThreadPoolExecutor(PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+        else:
+            executor = ProcessPoolExecutor(PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return executor
+
+
+def shutdown():
+    global executor
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
+
+
+async def run_hashing(fn, *args):
+    global pending, avg_seconds
+    if pending >= PASSWORD_HASH_QUEUE:
+        raise PasswordHashingBusy(max(1, math.ceil(avg_seconds)))
+    pending += 1
+    start = time.perf_counter()
+    try:
+        return await asyncio.wrap_future(get_executor().submit(fn, *args))
+    finally:
+        pending -= 1
+        avg_seconds = 0.9 * avg_seconds + 0.1 * (time.perf_counter() - start)
+
+
+async def hash_password(password: str) -> str:
+    return await run_hashing(utils.hash_password, password)
+
+
+async def verify_and_update(password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """(valid, new hash or None). A new hash means the stored one was made with other BCRYPT_ROUNDS."""
+    return await run_hashing(utils.verify_and_update_password, password, hashed_password)
@@ -0,0 +1,266 @@
+"""Live events for the Server-Sent Events stream (GET /events).
+
+crud emits an event (emit) in the transaction that causes it, and the event is
+published only if that transaction commits, so a stream never shows a timer
+that was rolled back. Events go to one user's open streams.
+
+Each worker keeps its own streams in a LocalBroker. With several workers a
+user's stream may be held by another worker than the request that changed the
+habit, so EVENTS_BROKER=postgres sends events with NOTIFY inside the writing
+transaction, and every worker LISTENs on one connection and hands them to its
+own streams. The local broker is what tests and single-worker setups use.
+
+Worker events (on_worker_event) ride the same brokers but go to a callback
+in every worker instead of a user's streams, e.g. to drop a revoked user's
+cached tokens everywhere.
+
+An idle stream costs a Subscription (a deque and an asyncio.Event) and no
+database connection or thread, so a worker can hold tens of thousands.
+"""
+from collections import deque
+from typing import Callable
+import asyncio
+import logging
+import os
+import threading
+import orjson
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+from app import database, metrics
+from app.responses import ORJSON_OPTIONS, encode_default
+
+logger = logging.getLogger(__name__)
+
+EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", 100))  # Unsent events per stream before it is cut off
+EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", 15))  # Keeps proxies from closing idle streams
+EVENTS_RETRY_MS = 3000  # How long EventSource waits before reconnecting
+EVENTS_CHANNEL = "habit_events"
+
+# Session.info key for events waiting on the transaction's commit
+PENDING_EVENTS = "pending_events"
+
+# event_type -> callback(user_id, data), run in every worker instead of delivering to streams
+WORKER_EVENTS: dict[str, Callable[[int, str], None]] = {}
+
+
+def on_worker_event(event_type: str, callback: Callable[[int, str], None]):
+    """Run callback in each worker for every event_type event; emit sends them like stream events."""
+    WORKER_EVENTS[event_type] = callback
+
+
+class Subscription:
+    """One open stream: its undelivered events and a flag that wakes it."""
+
+    __slots__ = ("user_id", "loop", "events", "ready", "overflowed")
+
+    def __init__(self, user_id: int, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.events = deque()
+        self.ready = asyncio.Event()
+        self.overflowed = False
+
+    def push(self, item: tuple[str, str]):
+        """Runs on the stream's event loop. A client that stops reading is cut off rather than buffered forever."""
+        if len(self.events) >= EVENTS_QUEUE_SIZE:
+            self.overflowed = True
+            self.events.clear()
+        else:
+            self.events.append(item)
+        self.ready.set()
+
+
+class LocalBroker:
+    """Delivers events to this worker's streams only."""
+
+    reaches_all_workers = False
+
+    def __init__(self):
+        self.subscribers: dict[int, set[Subscription]] = {}
+        self.open = 0
+        # Streams come and go on the event loop; commits deliver from threadpool threads
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, asyncio.get_running_loop())
+        with self.lock:
+            self.subscribers.setdefault(user_id, set()).add(subscription)
+            self.open += 1
+            metrics.EVENT_STREAMS_OPEN.set(self.open)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            subscriptions = self.subscribers.get(subscription.user_id)
+            if subscriptions is not None and subscription in subscriptions:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscribers[subscription.user_id]
+                self.open -= 1
+                metrics.EVENT_STREAMS_OPEN.set(self.open)
+
+    def deliver(self, user_id: int, event_type: str, data: str):
+        """Hand an event to user_id's streams on this worker; safe from any thread."""
+        callback = WORKER_EVENTS.get(event_type)
+        if callback is not None:
+            callback(user_id, data)
+            return
+        with self.lock:
+            subscriptions = list(self.subscribers.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.loop.call_soon_threadsafe(subscription.push, (event_type, data))
+
+    def before_commit(self, session: Session, events: list[tuple[int, str, str]]):
+        pass
+
+    def after_commit(self, events: list[tuple[int, str, str]]):
+        for user_id, event_type, data in events:
+            self.deliver(user_id, event_type, data)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+def asyncpg_url(url: str) -> str:
+    """asyncpg takes a plain postgresql:// URL, without SQLAlchemy's +driver."""
+    scheme, rest = url.split("://", 1)
+    return f"{scheme.split('+')[0]}://{rest}"
+
+
+class PostgresBroker(LocalBroker):
+    """Delivers events to every worker's streams through Postgres LISTEN/NOTIFY."""
+
+    def __init__(self, url: str | None = None):
+        super().__init__()
+        # Only while LISTENing: events sent in between are lost
+        self.reaches_all_workers = False
+        # Default: the app's database, looked up when the broker starts
+        self.url = asyncpg_url(url) if url else None
+        self.listener: asyncio.Task | None = None
+
+    def before_commit(self, session: Session, events: list[tuple[int, str, str]]):
+        # Postgres sends these when, and only if, the transaction commits
+        for user_id, event_type, data in events:
+            session.execute(select(func.pg_notify(EVENTS_CHANNEL, f"{user_id} {event_type} {data}")))
+
+    def after_commit(self, events: list[tuple[int, str, str]]):
+        pass  # Our own events come back through LISTEN like everyone else's
+
+    def on_notify(self, connection, pid, channel, payload: str):
+        user_id, event_type, data = payload.split(" ", 2)
+        self.deliver(int(user_id), event_type, data)
+
+    async def listen(self):
+        import asyncpg
+
+        while True:
+            try:
+                connection = await asyncpg.connect(self.url or asyncpg_url(database.get_database_url()))
+                closed = asyncio.get_running_loop().create_future()
+                connection.add_termination_listener(lambda _: closed.done() or closed.set_result(None))
+                await connection.add_listener(EVENTS_CHANNEL, self.on_notify)
+                self.reaches_all_workers = True
+                try:
+                    await closed
+                finally:
+                    self.reaches_all_workers = False
+                    await connection.close()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("LISTEN connection failed")
+            # Events sent while disconnected are lost; clients refetch state when they reconnect
+            logger.warning("LISTEN connection lost, reconnecting")
+            await asyncio.sleep(1)
+
+    async def start(self):
+        self.listener = asyncio.create_task(self.listen())
+
+    async def stop(self):
+        if self.listener is not None:
+            self.listener.cancel()
+            try:
+                await self.listener
+            except asyncio.CancelledError:
+                pass
+            self.listener = None
+
+
+BROKERS = {
+    "local": LocalBroker,
+    "postgres": PostgresBroker,
+}
+
+# Replaced by configure() (create_app passes its Settings.events_broker)
+broker: LocalBroker = LocalBroker()
+
+
+def configure(kind: str):
+    """Use the EVENTS_BROKER kind of broker: local | postgres. Call before the app starts."""
+    global broker
+    if type(broker) is not BROKERS[kind]:
+        broker = BROKERS[kind]()
+
+
+# -------------------------
+# Publishing from crud
+# -------------------------
+
+def emit(db: Session, user_id: int | None, event_type: str, **data):
+    """Queue an event for user_id's streams, sent when db's transaction commits."""
+    if user_id is None:
+        return
+    payload = orjson.dumps(data, default=encode_default, option=ORJSON_OPTIONS).decode()
+    db.info.setdefault(PENDING_EVENTS, []).append((user_id, event_type, payload))
+
+@event.listens_for(Session, "before_commit")
+def notify_pending_events(session):
+    events = session.info.get(PENDING_EVENTS)
+    if events:
+        broker.before_commit(session, events)
+
+@event.listens_for(Session, "after_commit")
+def publish_pending_events(session):
+    events = session.info.pop(PENDING_EVENTS, None)
+    if events:
+        broker.after_commit(events)
+
+@event.listens_for(Session, "after_rollback")
+def drop_pending_events(session):
+    session.info.pop(PENDING_EVENTS, None)
+
+
+# -------------------------
+# The stream
+# -------------------------
+
+def format_event(event_type: str, data: str) -> str:
+    return f"event: {event_type}\ndata: {data}\n\n"
+
+async def stream(user_id: int, heartbeat_seconds: float = EVENTS_HEARTBEAT_SECONDS):
+    """Server-Sent Events for user_id until the client goes away or falls too far behind."""
+    subscription = broker.subscribe(user_id)
+    loop = subscription.loop
+    try:
+        yield f"retry: {EVENTS_RETRY_MS}\n\n"
+        while True:
+            # A timer handle per wait, not a task: idle streams stay cheap
+            heartbeat = loop.call_later(heartbeat_seconds, subscription.ready.set)
+            await subscription.ready.wait()
+            heartbeat.cancel()
+            subscription.ready.clear()
+            if subscription.overflowed:
+                yield format_event("overflow", "{}")
+                return
+            if not subscription.events:
+                yield ": keep-alive\n\n"
+                continue
+            chunks = []
+            while subscription.events:
+                chunks.append(format_event(*subscription.events.popleft()))
+            yield "".join(chunks)
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,58 @@
+"""JSON responses rendered with orjson.
+
+FastAPI validates whatever a route returns against its response_model before
+serializing it. For large payloads built by our own queries that check is
+pure overhead, so the heavy routes return a FastJSONResponse directly (the
+response_model stays on the route for the OpenAPI schema).
+"""
+from decimal import Decimal
+import orjson
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from sqlalchemy.engine import Row
+
+# Datetimes come out exactly as Pydantic writes them ("...Z" for UTC)
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def encode_default(value):
+    # Postgres sum()/avg() over bigint columns come back as Decimal
+    if isinstance(value, Decimal):
+        return int(value) if value == value.to_integral_value() else float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=encode_default, option=ORJSON_OPTIONS)
+
+
+def row_dicts(rows, schema: type[BaseModel]) -> list[dict]:
+    """The schema's fields of each ORM object, without validating them.
+
+    Rows (from a query of just the schema's columns) are zipped with their
+    column names instead, which is several times faster than attribute access.
+    """
+    if rows and isinstance(rows[0], Row):
+        keys = rows[0]._fields
+        return [dict(zip(keys, row)) for row in rows]
+    fields = tuple(schema.model_fields)
+    return [{field: getattr(row, field) for field in fields} for row in rows]
+
+
+def etag_headers(etag: str) -> dict:
+    # Per-user data: only the browser may keep it, and must revalidate before reuse
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """If-None-Match check; weak comparison (W/ ignored), as RFC 9110 specifies for it."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=etag_headers(etag))
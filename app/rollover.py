@@ -0,0 +1,191 @@
+"""Day rollover: automatic freezes and streak resets, once per day boundary.
+
+Status reads used to apply skipped-day rules lazily, which made every GET a
+potential write. Instead, once a day has ended in every timezone (12:00 UTC
+the next day, midnight at UTC-12), every habit is checked against that day,
+in its owner's calendar (habit_logs.local_date, see app/timezones.py):
+
+- yesterday was completed or frozen: nothing to do
+- yesterday was skipped and the habit has freezes left: a frozen log is added
+  for yesterday and one freeze is consumed
+- yesterday was skipped and no freezes are left: the streak survives for now
+- 2+ days skipped: the streak dies (HARD RULE, no mercy)
+
+Habits are processed in id order, in chunks, each chunk in its own transaction
+together with the progress marker in `rollover_runs`, so an interrupted run
+resumes where it stopped and a finished day is never processed twice.
+"""
+import logging
+import threading
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app import models, crud, database, partitions, timezones, versions
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 1000
+
+
+def rollover_habits(db: Session, habit_ids: list[int], day: date) -> tuple[int, int]:
+    """Apply the skipped-day rules for `day` (yesterday = the day before it) to a batch of habits.
+
+    Uses one lookup query and at most three set-based writes, whatever the batch size.
+    Changes are not committed. Returns (habits_frozen, streaks_reset).
+    """
+    yesterday = day - timedelta(days=1)
+
+    habits = db.query(
+        models.Habit.id, models.Habit.current_streak, models.Habit.freezes_remaining, models.User.timezone
+    ).outerjoin(models.User, models.User.id == models.Habit.user_id).filter(models.Habit.id.in_(habit_ids)).all()
+    last_completions = crud.get_last_completion_days(db, habit_ids, before=day)
+
+    freeze_starts = {}
+    reset_ids = []
+    for habit_id, current_streak, freezes_remaining, zone_name in habits:
+        last_completion = last_completions.get(habit_id)
+        if last_completion is None:
+            # No completions yet, nothing to do
+            continue
+        days_since = (day - last_completion).days
+        if days_since == 2 and (freezes_remaining or 0) > 0:
+            # The freeze covers the skipped day, from its midnight in the owner's zone
+            freeze_starts[habit_id], _ = timezones.day_bounds(yesterday, timezones.get_zone(zone_name))
+        elif days_since >= 3 and current_streak:
+            reset_ids.append(habit_id)
+    freeze_ids = list(freeze_starts)
+
+    if freeze_ids:
+        db.execute(
+            update(models.Habit)
+            .where(models.Habit.id.in_(freeze_ids))
+            .values(freezes_remaining=models.Habit.freezes_remaining - 1)
+            .execution_options(synchronize_session=False)
+        )
+        crud.add_freeze_logs(db, [(habit_id, yesterday, start_time) for habit_id, start_time in freeze_starts.items()])
+    if reset_ids:
+        db.execute(
+            update(models.Habit)
+            .where(models.Habit.id.in_(reset_ids))
+            .values(current_streak=0, current_streak_started_at=None)
+            .execution_options(synchronize_session=False)
+        )
+    if freeze_ids or reset_ids:
+        versions.bump(db, freeze_ids + reset_ids)
+    return len(freeze_ids), len(reset_ids)
+
+
+def get_or_create_run(db: Session, day: date) -> models.RolloverRun:
+    run = db.query(models.RolloverRun).filter(models.RolloverRun.day == day).first()
+    if run:
+        return run
+    try:
+        run = models.RolloverRun(day=day, last_habit_id=0, habits_frozen=0, streaks_reset=0)
+        db.add(run)
+        db.commit()
+    except IntegrityError:
+        # Another worker created it first
+        db.rollback()
+        run = db.query(models.RolloverRun).filter(models.RolloverRun.day == day).one()
+    return run
+
+
+def process_next_chunk(db: Session, day: date, chunk_size: int = DEFAULT_CHUNK_SIZE) -> bool:
+    """Process the next chunk of habits for `day`. Returns False once the day is finished."""
+    # Lock the progress row so concurrent runners take turns instead of redoing chunks
+    run = db.query(models.RolloverRun).filter(
+        models.RolloverRun.day == day
+    ).with_for_update().one()
+    if run.finished_at is not None:
+        db.rollback()
+        return False
+
+    habit_ids = [
+        habit_id for (habit_id,) in db.query(models.Habit.id).filter(
+            models.Habit.id > run.last_habit_id
+        ).order_by(models.Habit.id).limit(chunk_size)
+    ]
+    if not habit_ids:
+        run.finished_at = datetime.now(timezone.utc)
+        db.commit()
+        return False
+
+    frozen, reset = rollover_habits(db, habit_ids, day)
+    run.last_habit_id = habit_ids[-1]
+    run.habits_frozen += frozen
+    run.streaks_reset += reset
+    db.commit()
+    return True
+
+
+def run_rollover(db: Session, day: date | None = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> models.RolloverRun:
+    """Run (or resume) the rollover for `day`, defaulting to the latest day whose yesterday has ended everywhere."""
+    day = day or rollover_day(datetime.now(timezone.utc))
+    run = get_or_create_run(db, day)
+    if run.finished_at is None:
+        logger.info("Rollover for %s starting after habit %s", day, run.last_habit_id)
+        while process_next_chunk(db, day, chunk_size):
+            pass
+        db.refresh(run)
+        logger.info(
+            "Rollover for %s finished: %s habits frozen, %s streaks reset",
+            day, run.habits_frozen, run.streaks_reset
+        )
+    return run
+
+
+def rollover_day(now: datetime) -> date:
+    """The latest day whose previous day is over in every timezone."""
+    return (now - timezones.LAST_MIDNIGHT_OFFSET).date()
+
+
+def seconds_until_next_run(now: datetime, delay_seconds: int) -> float:
+    next_day = datetime.combine(rollover_day(now) + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return (next_day + timezones.LAST_MIDNIGHT_OFFSET - now).total_seconds() + delay_seconds
+
+
+class RolloverScheduler:
+    """Runs the rollover in a background thread shortly after each day has ended everywhere (12:00 UTC).
+
+    On start it also catches up on the current day, so a worker booting mid-day finishes
+    a run that was missed or interrupted. Several workers may run the scheduler:
+    the progress row lock makes them share the work instead of repeating it.
+    Each run also creates the coming months' habit_logs partitions (app/partitions.py).
+    """
+
+    def __init__(self, session_factory=None, chunk_size: int = DEFAULT_CHUNK_SIZE, delay_seconds: int = 60):
+        self.session_factory = session_factory or database.SessionLocal
+        self.chunk_size = chunk_size
+        self.delay_seconds = delay_seconds
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="rollover-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def run_once(self):
+        try:
+            with self.session_factory() as db:
+                run_rollover(db, chunk_size=self.chunk_size)
+        except Exception:
+            logger.exception("Rollover failed, will retry at the next day boundary")
+        try:
+            with self.session_factory() as db:
+                created = partitions.ensure_partitions(db.connection())
+                db.commit()
+            if created:
+                logger.info("Created habit_logs partitions: %s", ", ".join(created))
+        except Exception:
+            logger.exception("Creating habit_logs partitions failed, will retry at the next day boundary")
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(seconds_until_next_run(datetime.now(timezone.utc), self.delay_seconds))
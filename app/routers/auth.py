@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from app import models, schemas, utils, crud
-from app.database import get_db
+from starlette.concurrency import run_in_threadpool
+from app import models, schemas, utils, crud, passwords
+from app.database import AnySession, get_session, run_db
 
 router = APIRouter(
     prefix="/auth",
@@ -10,13 +10,13 @@ router = APIRouter(
 )
 
 @router.post("/login", response_model=schemas.Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(), 
-    db: Session = Depends(get_db)
+    db: AnySession = Depends(get_session)
     ):
     # 1. Find user by email
     # form_data.username is used even if the field is technically an email
-    user = crud.get_user_by_email(db, form_data.username)
+    user = await run_db(db, crud.get_user_by_email, form_data.username)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -25,13 +25,17 @@ def login(
             headers={"WWW-Authenticate": "Bearer"}
         )
 
-    # 2. Verify password
-    if not utils.verify_password(form_data.password, user.hashed_password):
+    # 2. Verify password (bcrypt is CPU-bound, it runs in the password hashing pool)
+    valid, new_hash = await passwords.verify_and_update(form_data.password, user.hashed_password)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
             headers={"WWW-Authenticate": "Bearer"}
         )
+    if new_hash:
+        # Stored hash predates the current BCRYPT_ROUNDS
+        await run_db(db, crud.update_password_hash, user.id, new_hash)
 
     # 3. Create token
     access_token = utils.create_access_token(
@@ -41,4 +45,15 @@ def login(
     # 4. Return token
     return {"access_token": access_token, "token_type": "bearer"}
 
-
+@router.post("/logout", status_code=204)
+async def logout(token: str = Depends(utils.oauth2_scheme), db: AnySession = Depends(get_session)):
+    """Revoke the bearer token in every worker (it also leaves the verification caches)."""
+    # A cache miss checks revoked_tokens
+    claims = await run_in_threadpool(utils.verify_token, token)
+    if claims is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired token",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    await run_db(db, crud.revoke_token, token, claims)
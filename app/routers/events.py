@@ -0,0 +1,24 @@
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from app import pubsub, utils
+
+router = APIRouter(
+    prefix="/events",
+    tags=["events"]
+)
+
+
+@router.get("/", response_class=StreamingResponse)
+async def stream_events(user_id: int = Depends(utils.get_stream_user_id)):
+    """Server-Sent Events for the user's habits, instead of polling /logs/active.
+
+    Events: session_started, session_stopped, habit_completed, freeze_used.
+    An "overflow" event means the client fell behind and was disconnected;
+    refetch state after reconnecting.
+    """
+    return StreamingResponse(
+        pubsub.stream(user_id),
+        media_type="text/event-stream",
+        # No caching, and no buffering by nginx, which would hold events back
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app import models, schemas, database, crud
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app import models, schemas, database, crud, utils, metrics
+from app.responses import FastJSONResponse, row_dicts
+from app.database import AnySession, run_db
 from datetime import datetime, timezone
 
 router = APIRouter(
@@ -9,37 +10,77 @@ router = APIRouter(
 )
 
 @router.post("/{habit_id}/logs/start", response_model=schemas.HabitLog, status_code=201)
-def start_logging_session(habit_id: int, db: Session = Depends(database.get_db)):
-    habit = crud.get_habit_by_id(db, habit_id)
+async def start_logging_session(habit_id: int, db: AnySession = Depends(database.get_session)):
+    habit = await run_db(db, crud.get_habit_by_id, habit_id)
     if habit is None:
         raise HTTPException(status_code=404, detail="Habit not found")
-    return crud.create_log(db, habit_id)
+    log = await run_db(db, crud.create_log, habit_id)
+    metrics.TIMER_SESSIONS_STARTED.inc()
+    return log
 
 @router.patch("/{habit_id}/logs/{log_id}/stop", response_model=schemas.HabitLog)
-def stop_logging_session(habit_id: int, log_id: int, db: Session = Depends(database.get_db)):
-    log = crud.get_log_by_id(db, log_id, habit_id)
+async def stop_logging_session(habit_id: int, log_id: int, db: AnySession = Depends(database.get_session)):
+    log = await run_db(db, crud.get_log_by_id, log_id, habit_id)
     if log is None:
         raise HTTPException(status_code=404, detail="Habit log not found")
     if log.end_time is not None:
         raise HTTPException(status_code=400, detail="This session is already stopped")
-    return crud.stop_log(db, log)
+    log = await run_db(db, crud.stop_log, log)
+    metrics.TIMER_SESSIONS_STOPPED.inc()
+    return log
 
 @router.get("/{habit_id}/logs", response_model=list[schemas.HabitLog])
-def get_habit_logs(habit_id: int, db: Session = Depends(database.get_db)):
-    habit = crud.get_habit_by_id(db, habit_id)
+async def get_habit_logs(
+    habit_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    before: str | None = None,
+    after: str | None = None,
+    start_from: datetime | None = Query(None, alias="from"),
+    start_to: datetime | None = Query(None, alias="to"),
+    status: str | None = None,
+    db: AnySession = Depends(database.get_session)
+):
+    """Logs newest first, one page at a time. The next page's cursor is in the X-Next-Cursor header."""
+    habit = await run_db(db, crud.get_habit_by_id, habit_id)
     if habit is None:
         raise HTTPException(status_code=404, detail="Habit not found")
-    return crud.get_logs_for_habit(db, habit_id)
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+    try:
+        logs, next_cursor = await run_db(
+            db, crud.get_logs_page, habit_id, limit, before, after, start_from, start_to, status, as_rows=True
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Rows come straight from our own query, so skip response_model validation
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return FastJSONResponse(row_dicts(logs, schemas.HabitLog), headers=headers)
+
+@router.post("/{habit_id}/logs/bulk", response_model=schemas.BulkLogImportResult, status_code=201)
+async def import_habit_logs(
+    habit_id: int,
+    payload: schemas.BulkLogImport,
+    db: AnySession = Depends(database.get_session),
+    user_id: int = Depends(utils.get_current_user_id)
+):
+    """Import backdated history (e.g. from another tracker) in one batch."""
+    habit = await run_db(db, crud.get_habit_by_id, habit_id)
+    if habit is None or habit.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Habit not found")
+    try:
+        return await run_db(db, crud.import_logs, habit, payload.entries)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
 @router.get("/{habit_id}/logs/active", response_model=schemas.HabitLog | None)
-def get_active_session(habit_id: int, db: Session = Depends(database.get_db)):
-    habit = crud.get_habit_by_id(db, habit_id)
+async def get_active_session(habit_id: int, db: AnySession = Depends(database.get_session)):
+    habit = await run_db(db, crud.get_habit_by_id, habit_id)
     if habit is None:
         raise HTTPException(status_code=404, detail="Habit not found")
-    return crud.get_active_log(db, habit_id)
+    return await run_db(db, crud.get_active_log, habit_id)
 @router.post("/{habit_id}/logs", response_model=schemas.HabitLog, status_code=201)
-def create_manual_log(habit_id: int, log_data: schemas.ManualLogCreate, db: Session = Depends(database.get_db)):
-    habit = crud.get_habit_by_id(db, habit_id)
+async def create_manual_log(habit_id: int, log_data: schemas.ManualLogCreate, db: AnySession = Depends(database.get_session)):
+    habit = await run_db(db, crud.get_habit_by_id, habit_id)
     if habit is None:
         raise HTTPException(status_code=404, detail="Habit not found")
-    return crud.create_manual_log(db, habit_id, log_data.duration_min, log_data.notes)
\ No newline at end of file
+    return await run_db(db, crud.create_manual_log, habit_id, log_data.duration_min, log_data.notes)
\ No newline at end of file
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app import models, schemas, database, utils, crud
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from app import models, schemas, database, utils, crud, timezones
+from app.singleflight import flights
+from app.database import AnySession, run_db
+from app.responses import FastJSONResponse, etag_headers, etag_matches, not_modified, row_dicts
 from datetime import datetime, timezone
 
 router = APIRouter(
@@ -10,49 +12,48 @@ router = APIRouter(
 
 
 @router.get("/", response_model=list[schemas.Habit])
-def read_habits(db: Session = Depends(database.get_db), user_id: int = Depends(utils.get_current_user_id)):
-    habits = db.query(models.Habit).filter(models.Habit.user_id == user_id).all()
-    return habits
+async def read_habits(
+    if_none_match: str | None = Header(None),
+    db: AnySession = Depends(database.get_session),
+    user_id: int = Depends(utils.get_current_user_id)
+):
+    """The user's habits; a matching If-None-Match gets a 304 after one version lookup."""
+    etag = crud.habits_etag(user_id, await run_db(db, crud.get_user_version, user_id))
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    habits = await run_db(db, crud.get_habits_for_user, user_id)
+    return FastJSONResponse(row_dicts(habits, schemas.Habit), headers=etag_headers(etag))
 
 @router.post("/", response_model=schemas.Habit, status_code=201)
-def create_habit(habit: schemas.HabitCreate, db: Session = Depends(database.get_db), user_id: int = Depends(utils.get_current_user_id)):
-    new_habit = models.Habit(
-        name=habit.name,
-        description=habit.description,
-        is_timer=habit.is_timer,
-        allow_manual_override=habit.allow_manual_override,
-        is_freezable=habit.is_freezable,
-        danger_start_pct=habit.danger_start_pct,
-        freezes_remaining=2,  # Initialize with 2 freezes per habit
-        user_id=user_id
-    )
-    db.add(new_habit)
-    db.commit()
-    db.refresh(new_habit)
-    return new_habit
+async def create_habit(habit: schemas.HabitCreate, db: AnySession = Depends(database.get_session), user_id: int = Depends(utils.get_current_user_id)):
+    return await run_db(db, crud.create_habit, habit, user_id)
+
+@router.get("/dashboard", response_model=list[schemas.HabitDashboardItem])
+async def read_dashboard(db: AnySession = Depends(database.get_session), user_id: int = Depends(utils.get_current_user_id)):
+    """Get today's status, color, streak and freezes for all of the user's habits."""
+    return await run_db(db, crud.get_dashboard, user_id)
 
 @router.get("/{id}", response_model=schemas.Habit)
-def read_habit(id: int, db: Session = Depends(database.get_db), user_id: int = Depends(utils.get_current_user_id)):
-    habit = crud.get_habit_by_id(db, id)
+async def read_habit(id: int, db: AnySession = Depends(database.get_session), user_id: int = Depends(utils.get_current_user_id)):
+    habit = await run_db(db, crud.get_habit_by_id, id)
     if habit is None or habit.user_id != user_id:
         raise HTTPException(status_code=404, detail="Habit not found")
     return habit
 
 @router.delete("/{id}")
-def delete_habit(id: int, db: Session = Depends(database.get_db), user_id: int = Depends(utils.get_current_user_id)):
-    habit = crud.get_habit_by_id(db, id)
+async def delete_habit(id: int, db: AnySession = Depends(database.get_session), user_id: int = Depends(utils.get_current_user_id)):
+    habit = await run_db(db, crud.get_habit_by_id, id)
     if habit is None or habit.user_id != user_id:
         raise HTTPException(status_code=404, detail="Habit not found")
-    db.delete(habit)
-    db.commit()
+    await run_db(db, crud.delete_habit, id)
     return {"message": "Habit deleted"}
 
 @router.patch("/{id}", response_model=schemas.Habit)
-def patch_habit(id: int, habit_update: schemas.HabitUpdate, db: Session = Depends(database.get_db), user_id: int = Depends(utils.get_current_user_id)):
-    habit = crud.get_habit_by_id(db, id)
+async def patch_habit(id: int, habit_update: schemas.HabitUpdate, db: AnySession = Depends(database.get_session), user_id: int = Depends(utils.get_current_user_id)):
+    habit = await run_db(db, crud.get_habit_by_id, id)
     if habit is None or habit.user_id != user_id:
         raise HTTPException(status_code=404, detail="Habit not found")
-    habit = crud.update_habit(db, id, habit_update)
+    habit = await run_db(db, crud.update_habit, id, habit_update)
     return habit
 
 # -------------------------
@@ -60,41 +61,87 @@ def patch_habit(id: int, habit_update: schemas.HabitUpdate, db: Session = Depend
 # -------------------------
 
 @router.post("/{id}/complete", response_model=dict)
-def complete_habit_endpoint(id: int, db: Session = Depends(database.get_db), user_id: int = Depends(utils.get_current_user_id)):
+async def complete_habit_endpoint(id: int, db: AnySession = Depends(database.get_session), user_id: int = Depends(utils.get_current_user_id)):
     """Mark a habit as completed for today."""
-    habit = crud.get_habit_by_id(db, id)
+    habit = await run_db(db, crud.get_habit_by_id, id)
     if habit is None or habit.user_id != user_id:
         raise HTTPException(status_code=404, detail="Habit not found")
     
-    result = crud.complete_habit(db, id, user_id)
+    result = await run_db(db, crud.complete_habit, id, user_id)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result.get("error", "Failed to complete habit"))
     return result
 
 @router.post("/{id}/freeze", response_model=dict)
-def use_freeze_endpoint(id: int, db: Session = Depends(database.get_db), user_id: int = Depends(utils.get_current_user_id)):
+async def use_freeze_endpoint(id: int, db: AnySession = Depends(database.get_session), user_id: int = Depends(utils.get_current_user_id)):
     """Apply a streak freeze to a habit."""
-    habit = crud.get_habit_by_id(db, id)
+    habit = await run_db(db, crud.get_habit_by_id, id)
     if habit is None or habit.user_id != user_id:
         raise HTTPException(status_code=404, detail="Habit not found")
     
-    result = crud.use_freeze(db, id, user_id)
+    result = await run_db(db, crud.use_freeze, id, user_id)
     if not result["success"]:
         raise HTTPException(status_code=400, detail=result.get("error", "Failed to use freeze"))
     return result
 
 @router.get("/{id}/status", response_model=schemas.HabitStatus)
-def get_habit_status_endpoint(id: int, db: Session = Depends(database.get_db), user_id: int = Depends(utils.get_current_user_id)):
-    """Get daily status of a habit."""
-    habit_status = crud.get_habit_status(db, id, user_id)
-    if habit_status is None:
+async def get_habit_status_endpoint(
+    id: int,
+    response: Response,
+    if_none_match: str | None = Header(None),
+    db: AnySession = Depends(database.get_session),
+    user_id: int = Depends(utils.get_current_user_id)
+):
+    """Get daily status of a habit (304 for a matching If-None-Match)."""
+    habit = await run_db(db, crud.get_habit_by_id, id)
+    if habit is None or habit.user_id != user_id:
         raise HTTPException(status_code=404, detail="Habit not found")
+    # Taken before the status is computed: a write in between only makes the tag stale, never the body
+    etag = crud.status_etag(habit)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    habit_status = await flights.do(
+        ("status", habit.id, etag), lambda: run_db(db, crud.get_cached_habit_status, habit, etag)
+    )
+    response.headers.update(etag_headers(etag))
     return habit_status
 
 @router.get("/{id}/stats", response_model=schemas.HabitStats)
-def get_habit_stats_endpoint(id: int, db: Session = Depends(database.get_db), user_id: int = Depends(utils.get_current_user_id)):
-    """Get comprehensive stats and analytics for a habit."""
-    habit_stats = crud.get_habit_stats(db, id, user_id)
-    if habit_stats is None:
+async def get_habit_stats_endpoint(
+    id: int,
+    if_none_match: str | None = Header(None),
+    db: AnySession = Depends(database.get_session),
+    user_id: int = Depends(utils.get_current_user_id)
+):
+    """Get comprehensive stats and analytics for a habit (304 for a matching If-None-Match)."""
+    habit = await run_db(db, crud.get_habit_by_id, id)
+    if habit is None or habit.user_id != user_id:
+        raise HTTPException(status_code=404, detail="Habit not found")
+    etag = crud.stats_etag(habit)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    habit_stats = await flights.do(
+        ("stats", habit.id, etag), lambda: run_db(db, crud.get_cached_habit_stats, habit, etag)
+    )
+    # Built by crud to the HabitStats shape; validating it through the union is pure overhead
+    return FastJSONResponse(habit_stats, headers=etag_headers(etag))
+
+@router.get("/{id}/calendar", response_model=schemas.HabitCalendar)
+async def get_habit_calendar_endpoint(
+    id: int,
+    year: int | None = Query(None, ge=1970, le=9999),
+    format: str = Query("days", pattern="^(days|bits)$"),
+    if_none_match: str | None = Header(None),
+    db: AnySession = Depends(database.get_session),
+    user_id: int = Depends(utils.get_current_user_id)
+):
+    """Completed and frozen days of a year (default: the owner's current year), as day lists or packed bits."""
+    habit = await run_db(db, crud.get_habit_by_id, id)
+    if habit is None or habit.user_id != user_id:
         raise HTTPException(status_code=404, detail="Habit not found")
-    return habit_stats
+    year = year or timezones.local_date(datetime.now(timezone.utc), timezones.zone_for(habit)).year
+    etag = crud.calendar_etag(habit, year, format)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag)
+    calendar = await run_db(db, crud.get_habit_calendar, habit, year, format)
+    return FastJSONResponse(calendar, headers=etag_headers(etag))
@@ -0,0 +1,18 @@
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import Response
+from app import crud, database, metrics
+from app.database import AnySession, run_db
+
+router = APIRouter(
+    tags=["monitoring"]
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def read_metrics(request: Request, db: AnySession = Depends(database.get_session)):
+    """Prometheus scrape endpoint, summed over all workers (see app/metrics.py)."""
+    active_sessions = await run_db(db, crud.count_active_logs)
+    body = metrics.render(request.app.state.settings.metrics_dir, gauges={
+        "timer_sessions_active": ("Timer sessions currently running.", active_sessions),
+    })
+    return Response(content=body, media_type=metrics.CONTENT_TYPE)
@@ -1,8 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from app import models, schemas, crud
-from app.database import get_db
-from app.utils import hash_password
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app import models, schemas, crud, export, passwords
+from app.database import AnySession, get_session, run_db
+from app.utils import get_current_user_id
 
 router = APIRouter(
     prefix="/users",
@@ -10,29 +10,47 @@ router = APIRouter(
 )
 
 @router.post("/", response_model=schemas.User, status_code=201)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    new_user = crud.create_user(db, user)
+async def create_user(user: schemas.UserCreate, db: AnySession = Depends(get_session)):
+    # Duplicates are turned away before paying for a hash; create_user checks again for concurrent signups
+    if await run_db(db, crud.get_user_by_email, user.email) is not None:
+        raise HTTPException(status_code=400, detail="Email already registered")
+    # bcrypt is CPU-bound, it runs in the password hashing pool
+    hashed_password = await passwords.hash_password(user.password)
+    new_user = await run_db(db, crud.create_user, user, hashed_password)
     if new_user is None:
         raise HTTPException(status_code=400, detail="Email already registered")
     return new_user
 
+@router.get("/me/export")
+async def export_my_data(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    user_id: int = Depends(get_current_user_id)
+):
+    """Stream all of the current user's habits and logs (GDPR export / backup)."""
+    return StreamingResponse(
+        export.stream_export(user_id, format),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="habit-tracker-export.{format}"'}
+    )
+
 @router.get("/{user_id}", response_model=schemas.User)
-def read_user(user_id: int, db: Session = Depends(get_db)):
-    user = crud.get_user_by_id(db, user_id)
+async def read_user(user_id: int, db: AnySession = Depends(get_session)):
+    user = await run_db(db, crud.get_user_by_id, user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
 @router.delete("/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    user = crud.delete_user(db, user_id)
+async def delete_user(user_id: int, db: AnySession = Depends(get_session)):
+    user = await run_db(db, crud.delete_user, user_id)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return {"message": "User deleted"}
 
 @router.patch("/{user_id}", response_model=schemas.User)
-def update_user(user_id: int, user_update: schemas.UserUpdate, db: Session = Depends(get_db)):
-    user = crud.update_user(db, user_id, user_update)
+async def update_user(user_id: int, user_update: schemas.UserUpdate, db: AnySession = Depends(get_session)):
+    hashed_password = await passwords.hash_password(user_update.password) if user_update.password else None
+    user = await run_db(db, crud.update_user, user_id, user_update, hashed_password)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
\ No newline at end of file
@@ -1,6 +1,7 @@
-from pydantic import BaseModel, EmailStr, ConfigDict
-from datetime import datetime
-from typing import Optional, Union
+from pydantic import AfterValidator, BaseModel, EmailStr, ConfigDict, Field
+from datetime import date, datetime
+from typing import Annotated, Literal, Optional, Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 # -------------------------
 # Habit Schemas
@@ -54,6 +55,22 @@ class ManualLogCreate(HabitLogBase):
     notes: Optional[str] = None
     is_manual: bool = True
 
+class BulkLogEntry(HabitLogBase):
+    """One backdated entry of a bulk import"""
+    start_time: datetime  # Naive times are taken as UTC
+    duration_min: int = Field(0, ge=0)
+    status: Literal["completed", "frozen"] = "completed"
+
+class BulkLogImport(BaseModel):
+    entries: list[BulkLogEntry] = Field(min_length=1, max_length=10000)
+
+class BulkLogImportResult(BaseModel):
+    imported: int
+    skipped: int  # Entries already present (same start_time), e.g. a retried upload
+    current_streak: int
+    best_streak: int
+    freezes_remaining: int
+
 class HabitLogStop(BaseModel):
     end_time: datetime
 
@@ -75,6 +92,15 @@ class HabitStatus(BaseModel):
     current_streak: int
     color: str  # yellow, orange, red, green
 
+class HabitDashboardItem(BaseModel):
+    """Daily status of one habit on the home screen dashboard"""
+    habit_id: int
+    name: str
+    status: str  # pending, completed, frozen
+    color: str  # yellow, orange, red, green
+    current_streak: int
+    freezes_remaining: int
+
 # -------------------------
 # Habit Stats Schemas
 # -------------------------
@@ -119,10 +145,21 @@ class HabitStats(BaseModel):
 # User Schemas
 # -------------------------
 
+def check_timezone(name: str) -> str:
+    try:
+        ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+    return name
+
+# An IANA timezone name, e.g. "Europe/Paris"
+Timezone = Annotated[str, AfterValidator(check_timezone)]
+
 # For creating a user (signup request)
 class UserCreate(BaseModel):
     email: EmailStr
     password: str
+    timezone: Timezone = "UTC"
 
 # For returning user info (excluding password)
 class User(BaseModel):
@@ -131,18 +168,27 @@ class User(BaseModel):
     created_at: datetime
     freeze_balance: int
     freeze_used_in_row: int
+    timezone: str
 
     model_config = ConfigDict(from_attributes=True)
 
 class UserUpdate(BaseModel):
     email: Optional[EmailStr] = None
     password: Optional[str] = None
+    timezone: Optional[Timezone] = None  # Logs already written keep their day
 
 class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
+class HabitCalendar(BaseModel):
+    """Completed and frozen days of one year.
 
-
-
-
+    format=days: ISO dates. format=bits: base64 of one bit per day, day n of
+    the year (January 1st is 0) in bit n % 8 of byte n // 8.
+    """
+    habit_id: int
+    year: int
+    format: Literal["days", "bits"]
+    completed: Union[list[date], str]
+    frozen: Union[list[date], str]
@@ -0,0 +1,67 @@
+"""Application settings for main.create_app.
+
+Settings.from_env() loads the .env file, then reads the environment; nothing
+happens at import. create_app hands the result to database.configure, and
+nothing connects to the database until a request (or create_schema) needs it.
+"""
+from dataclasses import dataclass, field
+import os
+from dotenv import load_dotenv
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value not in (None, "") else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    return value.lower() in ("1", "true", "yes") if value not in (None, "") else default
+
+
+def env_list(name: str, default: list[str]) -> list[str]:
+    value = os.getenv(name)
+    return [item.strip() for item in value.split(",") if item.strip()] if value not in (None, "") else default
+
+
+def database_url_from_env() -> str:
+    """DATABASE_URL, else a Postgres URL built from the POSTGRES_* variables."""
+    return os.getenv("DATABASE_URL") or (
+        f"postgresql://{os.getenv('POSTGRES_USER')}:{os.getenv('POSTGRES_PASSWORD')}"
+        f"@{os.getenv('POSTGRES_HOST')}:{os.getenv('POSTGRES_PORT')}/{os.getenv('POSTGRES_DB')}"
+    )
+
+
+@dataclass
+class Settings:
+    database_url: str
+    environment: str = "production"  # APP_ENV: production | development
+    # Create missing tables at startup. Development only: production schemas are managed by `alembic upgrade head`
+    create_schema: bool = False
+    cors_origins: list[str] = field(default_factory=lambda: ["http://localhost:3000"])  # React dev server
+    # Nightly freezes/streak resets in the API workers, instead of rollover.py from cron
+    rollover_scheduler_enabled: bool = False
+    # "sync": routes run crud on a blocking Session; "async": on an AsyncSession (asyncpg / aiosqlite)
+    db_mode: str = "sync"
+    # Multi-worker /metrics: a directory shared by the workers, written every metrics_flush_interval seconds
+    metrics_dir: str | None = None
+    metrics_flush_interval: float = 1.0
+    # Live events and token revocations: "local" reaches this worker only, "postgres" every worker
+    events_broker: str = "local"
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """Settings from the environment, after loading .env (variables already set win)."""
+        load_dotenv()
+        environment = os.getenv("APP_ENV", "production").lower()
+        return cls(
+            database_url=database_url_from_env(),
+            environment=environment,
+            create_schema=env_bool("DB_CREATE_SCHEMA", environment == "development"),
+            cors_origins=env_list("CORS_ORIGINS", ["http://localhost:3000"]),
+            rollover_scheduler_enabled=env_bool("ROLLOVER_SCHEDULER_ENABLED", False),
+            db_mode=os.getenv("DB_MODE", "sync").lower(),
+            metrics_dir=os.getenv("METRICS_DIR") or None,
+            metrics_flush_interval=float(os.getenv("METRICS_FLUSH_INTERVAL") or 1.0),
+            events_broker=os.getenv("EVENTS_BROKER", "local").lower(),
+        )
@@ -0,0 +1,68 @@
+"""Single-flight coalescing for GET /habits/{id}/stats and /status.
+
+Several devices opening the app at once, or a client retrying, send bursts
+of identical requests. With flights.do, the first request for a key computes
+the result and the others arriving while it runs await that computation and
+share its result (or its error) instead of each running the same queries.
+The routes key a flight by (kind, habit id, ETag): the tag carries the day,
+and the habit's version, so a request that comes in after a write never
+joins a computation that started before it.
+
+A waiter gives up after SINGLE_FLIGHT_TIMEOUT seconds and computes on its
+own, and so do the waiters of a computation that was cancelled. Flights are
+per worker and live on the event loop, so a waiter holds neither a thread
+nor a database connection.
+"""
+import asyncio
+import os
+from app import metrics
+
+SINGLE_FLIGHT_TIMEOUT = float(os.getenv("SINGLE_FLIGHT_TIMEOUT", 10))  # Seconds a request waits on another's computation
+
+# Outcome of a flight whose leader was cancelled before it finished
+ABANDONED = object()
+
+
+class SingleFlight:
+    def __init__(self, timeout: float = SINGLE_FLIGHT_TIMEOUT):
+        self.timeout = timeout
+        self.calls: dict[tuple, asyncio.Future] = {}
+
+    async def do(self, key: tuple, compute):
+        """await compute(), or share the result of the computation already running for key.
+
+        key[0] is the kind of result, used as the metrics label.
+        """
+        call = self.calls.get(key)
+        if call is None:
+            return await self.lead(key, compute)
+        try:
+            outcome = await asyncio.wait_for(asyncio.shield(call), self.timeout)
+        except asyncio.TimeoutError:
+            metrics.SINGLE_FLIGHT_TIMEOUTS.inc(key[0])
+            return await compute()
+        if outcome is ABANDONED:
+            return await compute()
+        metrics.SINGLE_FLIGHT_COALESCED.inc(key[0])
+        return outcome
+
+    async def lead(self, key: tuple, compute):
+        call = asyncio.get_running_loop().create_future()
+        self.calls[key] = call
+        try:
+            result = await compute()
+        except Exception as exc:
+            call.set_exception(exc)
+            call.exception()  # Retrieved, so asyncio doesn't warn when nobody was waiting
+            raise
+        except BaseException:
+            call.set_result(ABANDONED)
+            raise
+        else:
+            call.set_result(result)
+            return result
+        finally:
+            del self.calls[key]
+
+
+flights = SingleFlight()
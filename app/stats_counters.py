@@ -0,0 +1,430 @@
+"""Per-habit stats counters, maintained on write.
+
+`habit_stats` keeps running totals so GET /habits/{id}/stats does not rescan
+habit_logs. The counters are updated by a Session after_flush hook, in the
+same transaction as the log change, so every ORM write path keeps them
+current: stop_log, create_manual_log, complete_habit, use_freeze, scripts
+and tests alike. Core bulk statements bypass the hook and must update the
+counters themselves (see add_freezes). Days (best day, completion runs) are
+the owner's local days, habit_logs.local_date (see app/timezones.py).
+
+The completion runs only move forward: deleting or un-completing a log does
+not shorten them, and backfilled days do not extend a run. reconcile_stats.py
+rebuilds everything from habit_logs and reports any such drift.
+"""
+from collections import Counter, namedtuple
+from datetime import date, datetime, timezone
+from sqlalchemy import and_, case, event, func, inspect, select, tuple_, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app import models, timezones, versions
+
+COUNTER_FIELDS = [
+    "sessions_count",
+    "total_minutes",
+    "completions_count",
+    "freezes_used",
+    "best_day_minutes",
+    "duration_histogram",
+    "last_completed_date",
+    "completion_run",
+    "best_completion_run",
+]
+
+# What one habit_logs row adds to its habit's counters
+Contribution = namedtuple("Contribution", "habit_id completed session minutes duration frozen day")
+CONTRIBUTION_FIELDS = ("habit_id", "status", "local_date", "end_time", "duration_min")
+
+# Session.info key of the old log values read before a flush (see load_stored_values)
+STORED_VALUES = "stats_counters.stored_values"
+
+stats_table = models.HabitStats.__table__
+logs_table = models.HabitLog.__table__
+
+
+def empty_counters() -> dict:
+    return {
+        "sessions_count": 0,
+        "total_minutes": 0,
+        "completions_count": 0,
+        "freezes_used": 0,
+        "best_day_minutes": 0,
+        "duration_histogram": {},
+        "last_completed_date": None,
+        "completion_run": 0,
+        "best_completion_run": 0,
+    }
+
+
+def median_from_histogram(histogram: dict) -> float:
+    """Median session length from a {minutes: sessions} histogram."""
+    counts = sorted((int(minutes), count) for minutes, count in histogram.items() if count > 0)
+    total = sum(count for _, count in counts)
+    if total == 0:
+        return 0.0
+    # 0-based positions of the middle element(s)
+    wanted = [(total - 1) // 2, total // 2]
+    found = []
+    seen = 0
+    for minutes, count in counts:
+        while wanted and wanted[0] < seen + count:
+            found.append(minutes)
+            wanted.pop(0)
+        seen += count
+    return sum(found) / 2
+
+
+def completion_runs(days: list[date]) -> tuple[int, int]:
+    """(run ending at the last day, longest run) of consecutive completion days."""
+    best_run = 0
+    run = 0
+    previous = None
+    for day in sorted(days):
+        run = run + 1 if previous is not None and (day - previous).days == 1 else 1
+        best_run = max(best_run, run)
+        previous = day
+    return run, best_run
+
+
+def build_counters(conn: Connection, habit_ids: list[int]) -> dict[int, dict]:
+    """Compute counters from habit_logs for a batch of habits, with two grouped queries."""
+    counters = {habit_id: empty_counters() for habit_id in habit_ids}
+    if not habit_ids:
+        return counters
+
+    log = models.HabitLog
+    is_session = and_(log.status == "completed", log.end_time != None)
+    day = log.local_date.label("day")
+    day_rows = conn.execute(
+        select(
+            log.habit_id,
+            day,
+            func.sum(case((is_session, func.coalesce(log.duration_min, 0)), else_=0)).label("minutes"),
+            func.count().filter(is_session).label("sessions"),
+            func.count().filter(log.status == "completed").label("completions"),
+            func.count().filter(log.status == "frozen").label("frozen"),
+        )
+        .where(log.habit_id.in_(habit_ids), log.status.in_(["completed", "frozen"]))
+        .group_by(log.habit_id, day)
+    )
+
+    completion_days: dict[int, list[date]] = {habit_id: [] for habit_id in habit_ids}
+    for row in day_rows:
+        values = counters[row.habit_id]
+        values["sessions_count"] += row.sessions
+        values["total_minutes"] += row.minutes or 0
+        values["completions_count"] += row.completions
+        values["freezes_used"] += row.frozen
+        values["best_day_minutes"] = max(values["best_day_minutes"], row.minutes or 0)
+        if row.completions:
+            completion_days[row.habit_id].append(row.day)
+
+    duration_rows = conn.execute(
+        select(log.habit_id, log.duration_min, func.count().label("sessions"))
+        .where(log.habit_id.in_(habit_ids), is_session, log.duration_min != None)
+        .group_by(log.habit_id, log.duration_min)
+    )
+    for row in duration_rows:
+        counters[row.habit_id]["duration_histogram"][str(row.duration_min)] = row.sessions
+
+    for habit_id, days in completion_days.items():
+        if days:
+            values = counters[habit_id]
+            values["last_completed_date"] = max(days)
+            values["completion_run"], values["best_completion_run"] = completion_runs(days)
+    return counters
+
+
+def insert_ignore(conn: Connection, rows: list[dict]):
+    """Insert habit_stats rows, skipping habits that already have one."""
+    if conn.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    conn.execute(dialect_insert(stats_table).on_conflict_do_nothing(index_elements=["habit_id"]), rows)
+
+
+def get_counters(db: Session, habit_id: int) -> dict:
+    """Counters for one habit: a single-row read.
+
+    Habits whose row has not been created yet (no logs since the counters were
+    introduced and no reconcile run) are computed from habit_logs without writing.
+    """
+    row = db.execute(select(stats_table).where(stats_table.c.habit_id == habit_id)).mappings().first()
+    if row is not None:
+        return {field: row[field] for field in COUNTER_FIELDS}
+    return build_counters(db.connection(), [habit_id])[habit_id]
+
+
+def add_freezes(db: Session, habit_ids: list[int]):
+    """Count one freeze per occurrence of each habit, for frozen logs inserted with Core statements."""
+    by_count: dict[int, list[int]] = {}
+    for habit_id, count in Counter(habit_ids).items():
+        by_count.setdefault(count, []).append(habit_id)
+    for count, ids in by_count.items():
+        db.execute(
+            update(stats_table)
+            .where(stats_table.c.habit_id.in_(ids))
+            .values(freezes_used=stats_table.c.freezes_used + count, updated_at=datetime.now(timezone.utc))
+        )
+
+
+def reconcile(db: Session, habit_ids: list[int], fix: bool = False) -> list[tuple[int, str, object, object]]:
+    """Compare stored counters with habit_logs. Returns (habit_id, field, stored, expected) drifts.
+
+    A habit without a habit_stats row drifts on every field (stored None).
+    """
+    conn = db.connection()
+    expected = build_counters(conn, habit_ids)
+    stored = {
+        row["habit_id"]: row
+        for row in conn.execute(select(stats_table).where(stats_table.c.habit_id.in_(habit_ids))).mappings()
+    }
+
+    drifts = []
+    missing = []
+    for habit_id, values in expected.items():
+        row = stored.get(habit_id)
+        if row is None:
+            # Every counter of a habit without its row is drift
+            drifts.extend((habit_id, field, None, values[field]) for field in COUNTER_FIELDS)
+            missing.append({"habit_id": habit_id, **values, "updated_at": datetime.now(timezone.utc)})
+            continue
+        changed = {field: values[field] for field in COUNTER_FIELDS if row[field] != values[field]}
+        drifts.extend((habit_id, field, row[field], value) for field, value in changed.items())
+        if fix and changed:
+            conn.execute(
+                update(stats_table)
+                .where(stats_table.c.habit_id == habit_id)
+                .values(**changed, updated_at=datetime.now(timezone.utc))
+            )
+    if fix and missing:
+        insert_ignore(conn, missing)
+    if fix and drifts:
+        # Corrected stats must not be served under the old ETag
+        versions.bump(db, {habit_id for habit_id, *_ in drifts})
+    return drifts
+
+
+# -------------------------
+# Write-time maintenance
+# -------------------------
+
+def log_contribution(habit_id, status, local_date, end_time, duration_min) -> Contribution | None:
+    if habit_id is None or status not in ("completed", "frozen"):
+        return None
+    session = status == "completed" and end_time is not None
+    return Contribution(
+        habit_id=habit_id,
+        completed=status == "completed",
+        session=session,
+        minutes=(duration_min or 0) if session else 0,
+        duration=duration_min if session else None,
+        frozen=status == "frozen",
+        day=local_date,
+    )
+
+
+def current_contribution(log: models.HabitLog) -> Contribution | None:
+    return log_contribution(log.habit_id, log.status, log.local_date, log.end_time, log.duration_min)
+
+
+def previous_contribution(log: models.HabitLog) -> Contribution | None:
+    """Contribution of the row as it was before this flush, from attribute history."""
+    state = inspect(log)
+    stored = state.session.info.get(STORED_VALUES, {}).get(log, {}) if state.session else {}
+    values = {}
+    for name in CONTRIBUTION_FIELDS:
+        history = state.attrs[name].history
+        if name in stored:
+            values[name] = stored[name]
+        elif history.deleted:
+            values[name] = history.deleted[0]
+        elif history.has_changes():
+            # The row was gone before the flush
+            values[name] = None
+        else:
+            values[name] = getattr(log, name)
+    return log_contribution(**values)
+
+
+@event.listens_for(Session, "before_flush")
+def load_stored_values(session: Session, flush_context, instances):
+    """Read the old values previous_contribution cannot get from attribute history.
+
+    A value overwritten before it was ever loaded has no history, and an
+    expired attribute of a deleted log can no longer be loaded after the
+    flush: both are read from the row, in one query, while it still holds them.
+    """
+    session.info[STORED_VALUES] = {}
+    unknown = {}
+    for obj in list(session.dirty) + list(session.deleted):
+        if not isinstance(obj, models.HabitLog):
+            continue
+        state = inspect(obj)
+        if state.key is None:
+            continue
+        names = [
+            name for name in CONTRIBUTION_FIELDS
+            if name in state.unloaded
+            or (state.attrs[name].history.has_changes() and not state.attrs[name].history.deleted)
+        ]
+        if names:
+            unknown[obj] = names
+    if not unknown:
+        return
+
+    columns = [logs_table.c[name] for name in CONTRIBUTION_FIELDS]
+    # (id, start_time) as stored, so Postgres only reads the rows' partitions
+    keys = {inspect(obj).identity for obj in unknown}
+    rows = {
+        (row["id"], row["start_time"]): row
+        for row in session.connection().execute(
+            select(logs_table.c.id, logs_table.c.start_time, *columns).where(
+                tuple_(logs_table.c.id, logs_table.c.start_time).in_(keys)
+            )
+        ).mappings()
+    }
+    for obj, names in unknown.items():
+        row = rows.get(inspect(obj).identity)
+        if row is not None:
+            session.info[STORED_VALUES][obj] = {name: row[name] for name in names}
+
+
+@event.listens_for(Session, "after_flush_postexec")
+def clear_stored_values(session: Session, flush_context):
+    session.info.pop(STORED_VALUES, None)
+
+
+def day_minutes(conn: Connection, habit_id: int, day: date) -> int:
+    """Completed session minutes on one local day (index lookup on habit_id, local_date)."""
+    window_start, window_end = timezones.start_time_window(day)
+    return conn.execute(
+        select(func.coalesce(func.sum(func.coalesce(logs_table.c.duration_min, 0)), 0)).where(
+            logs_table.c.habit_id == habit_id,
+            logs_table.c.local_date == day,
+            logs_table.c.start_time >= window_start,
+            logs_table.c.start_time < window_end,
+            logs_table.c.status == "completed",
+            logs_table.c.end_time != None,
+        )
+    ).scalar()
+
+
+def best_day_minutes(conn: Connection, habit_id: int) -> int:
+    """Largest per-day total of completed session minutes, rescanning the habit's logs."""
+    day_totals = select(
+        func.sum(func.coalesce(logs_table.c.duration_min, 0)).label("minutes")
+    ).where(
+        logs_table.c.habit_id == habit_id,
+        logs_table.c.status == "completed",
+        logs_table.c.end_time != None,
+    ).group_by(logs_table.c.local_date).subquery()
+    return conn.execute(select(func.coalesce(func.max(day_totals.c.minutes), 0))).scalar()
+
+
+def apply_changes(conn: Connection, habit_id: int, changes: list[tuple[Contribution | None, Contribution | None]]):
+    row = conn.execute(
+        select(stats_table).where(stats_table.c.habit_id == habit_id).with_for_update()
+    ).mappings().first()
+    if row is None:
+        # First counted log of this habit: the flushed rows are visible, build from scratch
+        insert_ignore(conn, [{
+            "habit_id": habit_id,
+            **build_counters(conn, [habit_id])[habit_id],
+            "updated_at": datetime.now(timezone.utc),
+        }])
+        return
+
+    values = {field: row[field] for field in COUNTER_FIELDS}
+    histogram = dict(values["duration_histogram"] or {})
+    session_days = set()
+    completion_days = set()
+    # Only removing minutes can lower the best day, and only a rescan can tell
+    rescan_best_day = False
+
+    for before, after in changes:
+        for contribution, sign in ((before, -1), (after, 1)):
+            if contribution is None:
+                continue
+            if contribution.session:
+                values["sessions_count"] += sign
+                values["total_minutes"] += sign * contribution.minutes
+                if contribution.duration is not None:
+                    key = str(contribution.duration)
+                    histogram[key] = histogram.get(key, 0) + sign
+                    if histogram[key] <= 0:
+                        del histogram[key]
+            if contribution.completed:
+                values["completions_count"] += sign
+            if contribution.frozen:
+                values["freezes_used"] += sign
+        if after and after.session and after.day:
+            session_days.add(after.day)
+        if before and before.session and before.minutes and not (
+            after and after.session and after.day == before.day and after.minutes >= before.minutes
+        ):
+            rescan_best_day = True
+        if after and after.completed and after.day and not (before and before.completed and before.day == after.day):
+            completion_days.add(after.day)
+    values["duration_histogram"] = histogram
+
+    if rescan_best_day:
+        values["best_day_minutes"] = best_day_minutes(conn, habit_id)
+    else:
+        for day in session_days:
+            values["best_day_minutes"] = max(values["best_day_minutes"], day_minutes(conn, habit_id, day))
+
+    for day in sorted(completion_days):
+        last_day = values["last_completed_date"]
+        if last_day is None or (day - last_day).days > 1:
+            values["completion_run"] = 1
+        elif (day - last_day).days == 1:
+            values["completion_run"] += 1
+        else:
+            # Same day, or a backfilled earlier day: reconcile_stats.py recomputes runs
+            continue
+        values["last_completed_date"] = day
+        values["best_completion_run"] = max(values["best_completion_run"], values["completion_run"])
+
+    changed = {field: value for field, value in values.items() if row[field] != value}
+    if changed:
+        conn.execute(
+            update(stats_table)
+            .where(stats_table.c.habit_id == habit_id)
+            .values(**changed, updated_at=datetime.now(timezone.utc))
+        )
+
+
+@event.listens_for(Session, "after_flush")
+def update_counters_after_flush(session: Session, flush_context):
+    changes: dict[int, list] = {}
+    # Their habit_stats rows go with them (ON DELETE CASCADE)
+    deleted_habits = {obj.id for obj in session.deleted if isinstance(obj, models.Habit)}
+
+    def add(before, after):
+        if before == after:
+            return
+        if before and after and before.habit_id != after.habit_id:
+            add(before, None)
+            add(None, after)
+            return
+        habit_id = (after or before).habit_id
+        changes.setdefault(habit_id, []).append((before, after))
+
+    for obj in session.new:
+        if isinstance(obj, models.HabitLog):
+            add(None, current_contribution(obj))
+    for obj in session.dirty:
+        if isinstance(obj, models.HabitLog) and session.is_modified(obj):
+            add(previous_contribution(obj), current_contribution(obj))
+    for obj in session.deleted:
+        if isinstance(obj, models.HabitLog):
+            add(previous_contribution(obj), None)
+
+    if changes:
+        conn = session.connection()
+        for habit_id, habit_changes in changes.items():
+            if habit_id in deleted_habits:
+                continue
+            apply_changes(conn, habit_id, habit_changes)
@@ -0,0 +1,104 @@
+"""Per-user day boundaries.
+
+A user's days run from midnight to midnight in their IANA timezone
+(users.timezone, UTC by default). Every habit_logs row stores the day it falls
+on in its owner's zone as local_date, set at write time by a Session
+before_flush hook, so day lookups (today's logs, per-day stats, the calendar)
+are equality lookups on the (habit_id, local_date) index instead of timestamp
+ranges computed per user. Core inserts bypass the hook and set local_date
+themselves (import_logs, the rollover).
+
+local_date is fixed when a log is written or its start_time moves: changing a
+user's timezone does not move their past logs to other days.
+"""
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from zoneinfo import ZoneInfo
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from app import models
+
+DEFAULT_TIMEZONE = "UTC"
+
+# The first timezone to start a day is UTC+14, the last to finish it UTC-12
+FIRST_MIDNIGHT_OFFSET = timedelta(hours=14)
+LAST_MIDNIGHT_OFFSET = timedelta(hours=12)
+
+
+@lru_cache(maxsize=None)
+def get_zone(name: str | None) -> ZoneInfo:
+    return ZoneInfo(name or DEFAULT_TIMEZONE)
+
+
+def zone_for(habit: models.Habit | None) -> ZoneInfo:
+    """The zone of the habit's owner (loads the owner unless already loaded)."""
+    owner = habit.owner if habit is not None else None
+    return get_zone(owner.timezone if owner is not None else None)
+
+
+def local_date(moment: datetime, zone: ZoneInfo) -> date:
+    return moment.astimezone(zone).date()
+
+
+def day_bounds(day: date, zone: ZoneInfo) -> tuple[datetime, datetime]:
+    """UTC instants of the day's midnight and the next one (23 or 25 hours apart on DST changes)."""
+    start = datetime.combine(day, datetime.min.time(), tzinfo=zone)
+    end = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=zone)
+    return start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+
+
+def start_time_window(first_day: date, last_day: date | None = None) -> tuple[datetime, datetime]:
+    """A UTC start_time range holding every log whose local_date is in [first_day, last_day], in any zone.
+
+    Redundant next to a local_date condition, but it lets Postgres skip the
+    habit_logs partitions outside it (see app/partitions.py).
+    """
+    start = datetime.combine(first_day, datetime.min.time(), tzinfo=timezone.utc) - FIRST_MIDNIGHT_OFFSET
+    end = datetime.combine((last_day or first_day) + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+    return start, end + LAST_MIDNIGHT_OFFSET
+
+
+def habit_zones(session: Session, habit_ids) -> dict[int, ZoneInfo]:
+    """Owner zones for habits, from loaded objects where possible, else in one query."""
+    zones = {}
+    missing = set()
+    for habit_id in habit_ids:
+        habit = session.identity_map.get(identity_key(models.Habit, habit_id))
+        owner = habit.__dict__.get("owner") if habit is not None else None
+        if owner is not None and "timezone" in owner.__dict__:
+            zones[habit_id] = get_zone(owner.timezone)
+        else:
+            missing.add(habit_id)
+    if missing:
+        rows = session.connection().execute(
+            select(models.Habit.id, models.User.timezone)
+            .outerjoin(models.User, models.User.id == models.Habit.user_id)
+            .where(models.Habit.id.in_(missing))
+        )
+        for habit_id, name in rows:
+            zones[habit_id] = get_zone(name)
+    return zones
+
+
+# -------------------------
+# Write-time maintenance
+# -------------------------
+
+@event.listens_for(Session, "before_flush")
+def set_local_dates(session: Session, flush_context, instances):
+    logs = [obj for obj in session.new if isinstance(obj, models.HabitLog)]
+    for obj in session.dirty:
+        if isinstance(obj, models.HabitLog):
+            state = inspect(obj)
+            if state.attrs.start_time.history.has_changes() or state.attrs.habit_id.history.has_changes():
+                logs.append(obj)
+    if not logs:
+        return
+
+    zones = habit_zones(session, {log.habit_id for log in logs if log.habit_id is not None})
+    for log in logs:
+        if log.start_time is None:
+            # The column default, needed now to date the log
+            log.start_time = datetime.now(timezone.utc)
+        log.local_date = local_date(log.start_time, zones.get(log.habit_id, get_zone(None)))
@@ -1,14 +1,23 @@
 from passlib.context import CryptContext
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
 from jose import JWTError, jwt
+import hashlib
 import os
+import threading
+import time
 from dotenv import load_dotenv
 from fastapi import Depends, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import and_, exists, or_, select
 
-load_dotenv()  # take environment variables from .env
+load_dotenv()  # take environment variables from .env, before the app modules below read theirs
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app import database, models, pubsub
+
+# Each extra round doubles the hashing time; hashes made with another cost are redone on login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -16,23 +25,161 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Verify, and return a fresh hash when the stored one uses outdated parameters."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 SECRET_KEY = os.getenv("SECRET_KEY")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose").lower()  # jose | pyjwt
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 10000))  # Verified tokens kept; 0 disables the cache
+TOKEN_CACHE_TTL = int(os.getenv("TOKEN_CACHE_TTL", 300))  # Seconds, capped by each token's exp
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
-    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
-    to_encode.update({"exp": expire})
+    now = datetime.now(timezone.utc)
+    expire = now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
+    # Sub-second iat, so a login right after revoke_user_tokens is not caught by it
+    to_encode.update({"exp": expire, "iat": now.timestamp()})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
-def verify_token(token: str):
+def jose_decode(token: str) -> dict | None:
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     except JWTError:
         return None
 
+def pyjwt_decoder():
+    """PyJWT's decoder (JWT_BACKEND=pyjwt); PyJWT is only needed when selected."""
+    import jwt as pyjwt
+
+    def pyjwt_decode(token: str) -> dict | None:
+        try:
+            return pyjwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+        except pyjwt.PyJWTError:
+            return None
+    return pyjwt_decode
+
+JWT_DECODERS = {
+    "jose": lambda: jose_decode,
+    "pyjwt": pyjwt_decoder,
+}
+decode_token = JWT_DECODERS[JWT_BACKEND]()
+
+# -------------------------
+# Verified token cache and revocation
+# -------------------------
+
+class TokenCache:
+    """Verified token -> claims, least recently used first out.
+
+    An entry expires at the token's exp or after the TTL, whichever comes
+    first. Revocations drop entries, and bump the generation so a lookup that
+    raced with one does not cache its stale answer.
+    """
+
+    def __init__(self, maxsize: int = TOKEN_CACHE_SIZE, ttl: float = TOKEN_CACHE_TTL):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.generation = 0
+        self.lock = threading.Lock()
+
+    def get(self, token: str, now: float) -> dict | None:
+        with self.lock:
+            entry = self.entries.get(token)
+            if entry is None:
+                return None
+            expires_at, claims = entry
+            if now >= expires_at:
+                del self.entries[token]
+                return None
+            self.entries.move_to_end(token)
+            return claims
+
+    def put(self, token: str, claims: dict, now: float, generation: int | None = None):
+        """Cache claims, unless a revocation came in since generation was read."""
+        if self.maxsize <= 0:
+            return
+        expires_at = min(float(claims.get("exp", now)), now + self.ttl)
+        with self.lock:
+            if generation is not None and generation != self.generation:
+                return
+            self.entries[token] = (expires_at, claims)
+            self.entries.move_to_end(token)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def discard(self, token: str):
+        with self.lock:
+            self.generation += 1
+            self.entries.pop(token, None)
+
+    def discard_subject(self, sub: str):
+        with self.lock:
+            self.generation += 1
+            for token in [token for token, (_, claims) in self.entries.items() if claims.get("sub") == sub]:
+                del self.entries[token]
+
+    def clear(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+
+token_cache = TokenCache()
+
+# Revocations are rows of revoked_tokens, shared by every worker and kept across
+# restarts, checked when a token is first verified. While the broker reaches
+# every worker (EVENTS_BROKER=postgres, LISTEN connected) the "tokens_revoked"
+# event drops the user's cached tokens everywhere, so cache hits skip the check.
+# Otherwise another worker's revocation only shows in the table, checked on every hit.
+TOKENS_REVOKED = "tokens_revoked"
+
+def token_hash(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def forget_user_tokens(user_id: int, data: str = "{}"):
+    """Drop a user's verified tokens from this worker's cache; they are checked again on next use."""
+    token_cache.discard_subject(str(user_id))
+
+pubsub.on_worker_event(TOKENS_REVOKED, forget_user_tokens)
+
+def is_revoked(token: str, claims: dict) -> bool:
+    """Whether the token was logged out, or its user's tokens were revoked after it was issued."""
+    sub = claims.get("sub")
+    if sub is None or not str(sub).isdigit():
+        return False
+    issued_at = datetime.fromtimestamp(float(claims.get("iat", 0)), timezone.utc)
+    revoked = models.RevokedToken
+    query = select(exists().where(
+        revoked.user_id == int(sub),
+        revoked.expires_at > datetime.now(timezone.utc),
+        or_(
+            revoked.token_hash == token_hash(token),
+            and_(revoked.token_hash.is_(None), revoked.revoked_at > issued_at),
+        ),
+    ))
+    with database.SessionLocal() as db:
+        return db.execute(query).scalar()
+
+def verify_token(token: str):
+    """Claims of a valid, unexpired, unrevoked token, else None. Signatures are checked once per cache TTL."""
+    now = time.time()
+    claims = token_cache.get(token, now)
+    if claims is not None:
+        if pubsub.broker.reaches_all_workers or not is_revoked(token, claims):
+            return claims
+        token_cache.discard(token)
+        return None
+    generation = token_cache.generation
+    claims = decode_token(token)
+    if claims is None or is_revoked(token, claims):
+        return None
+    token_cache.put(token, claims, now, generation)
+    return claims
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
@@ -44,3 +191,12 @@ def get_current_user_id(token: str = Depends(oauth2_scheme)) -> int:
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
     return int(user_id)
+
+# EventSource cannot send an Authorization header, so streams also take ?access_token=
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+def get_stream_user_id(token: str | None = Depends(optional_oauth2_scheme), access_token: str | None = None) -> int:
+    """get_current_user_id for Server-Sent Events: the token may come as a query parameter."""
+    if not (token or access_token):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return get_current_user_id(token or access_token)
@@ -0,0 +1,97 @@
+"""Version counters behind the ETags of GET /habits/, /habits/{id}/status and /stats.
+
+habits.version goes up whenever the habit or one of its logs is written, and
+users.version whenever the user or one of their habits is. A conditional GET
+then needs just the counter, not the data it stands for.
+
+The counters are bumped by a Session before_flush hook, in the same flush as
+the change, so every ORM write path keeps them current. Loaded objects get a
+`version + 1` expression that rides along in their UPDATE; the rest are
+updated by one Core statement per table. Core writes bypass the hook and call
+bump() themselves (import_logs, rollover, reconcile).
+"""
+from sqlalchemy import event, or_, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+from app import models
+
+# Session.info key: ids of the habits written in the current transaction (app/cache.py drops their results)
+CHANGED_HABITS = "changed_habits"
+
+
+def bump(db: Session, habit_ids, user_ids=()):
+    """Bump the given habits and their owners, plus any other users, with Core statements."""
+    habit_ids, user_ids = list(habit_ids), list(user_ids)
+    db.info.setdefault(CHANGED_HABITS, set()).update(habit_ids)
+    conditions = []
+    if habit_ids:
+        db.execute(
+            update(models.Habit)
+            .where(models.Habit.id.in_(habit_ids))
+            .values(version=models.Habit.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+        conditions.append(models.User.id.in_(select(models.Habit.user_id).where(models.Habit.id.in_(habit_ids))))
+    if user_ids:
+        conditions.append(models.User.id.in_(user_ids))
+    if conditions:
+        db.execute(
+            update(models.User)
+            .where(or_(*conditions))
+            .values(version=models.User.version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def loaded(session: Session, model, primary_key):
+    """The session's instance of a row, without querying for it."""
+    obj = session.identity_map.get(identity_key(model, primary_key))
+    return None if obj is None or obj in session.deleted else obj
+
+
+@event.listens_for(Session, "before_flush")
+def bump_versions_before_flush(session: Session, flush_context, instances):
+    habit_ids = set()
+    user_ids = set()
+    for obj in session.new:
+        if isinstance(obj, models.HabitLog):
+            habit_ids.add(obj.habit_id)
+        elif isinstance(obj, models.Habit):
+            user_ids.add(obj.user_id)
+    for obj in session.dirty:
+        if not session.is_modified(obj):
+            continue
+        if isinstance(obj, models.HabitLog):
+            habit_ids.add(obj.habit_id)
+        elif isinstance(obj, models.Habit):
+            habit_ids.add(obj.id)
+        elif isinstance(obj, models.User):
+            user_ids.add(obj.id)
+    for obj in session.deleted:
+        if isinstance(obj, models.HabitLog):
+            habit_ids.add(obj.habit_id)
+        elif isinstance(obj, models.Habit):
+            user_ids.add(obj.user_id)
+            session.info.setdefault(CHANGED_HABITS, set()).add(obj.id)
+    habit_ids.discard(None)
+    session.info.setdefault(CHANGED_HABITS, set()).update(habit_ids)
+
+    unloaded_habits = []
+    for habit_id in habit_ids:
+        habit = loaded(session, models.Habit, habit_id)
+        if habit is None:
+            unloaded_habits.append(habit_id)
+        else:
+            habit.version = models.Habit.version + 1
+            user_ids.add(habit.user_id)
+    user_ids.discard(None)
+
+    unloaded_users = []
+    for user_id in user_ids:
+        user = loaded(session, models.User, user_id)
+        if user is None:
+            unloaded_users.append(user_id)
+        else:
+            user.version = models.User.version + 1
+    if unloaded_habits or unloaded_users:
+        bump(session, unloaded_habits, unloaded_users)
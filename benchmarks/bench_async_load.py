@@ -0,0 +1,132 @@
+"""Load test: requests/sec and latency of DB_MODE=sync vs DB_MODE=async.
+
+For each mode, starts one uvicorn worker on the same database, signs up a
+throwaway user with one habit, then has CONCURRENCY clients call
+GET /habits/{id}/status (plus GET /habits/dashboard) back to back for
+DURATION seconds and reports throughput and p50/p99 latency.
+
+Uses DATABASE_URL, or the Postgres settings from .env when it is unset
+(async mode needs asyncpg). For aiosqlite pass a SQLite file URL:
+
+    python -m benchmarks.bench_async_load
+    python -m benchmarks.bench_async_load --database-url sqlite:///./bench.db --concurrency 200
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+from app import database
+
+CONCURRENCY = 500
+DURATION = 30
+PORT = 8765
+
+
+def start_server(mode: str, database_url: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, DB_MODE=mode, DATABASE_URL=database_url)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def wait_until_ready(client: httpx.AsyncClient, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+async def sign_up(client: httpx.AsyncClient) -> tuple[dict, int]:
+    email = f"bench-{uuid.uuid4()}@example.com"
+    await client.post("/users/", json={"email": email, "password": "benchpass"})
+    token = (await client.post("/auth/login", data={"username": email, "password": "benchpass"})).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    habit = (await client.post("/habits/", json={"name": "Bench Habit"}, headers=headers)).json()
+    return headers, habit["id"]
+
+
+async def worker(client: httpx.AsyncClient, paths: list[str], headers: dict, deadline: float,
+                 latencies: list[float], errors: list[int]):
+    i = 0
+    while time.monotonic() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+                continue
+        except httpx.TransportError:
+            errors.append(0)
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct))]
+
+
+async def load(base_url: str, concurrency: int, duration: float) -> dict:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await wait_until_ready(client)
+        headers, habit_id = await sign_up(client)
+        paths = [f"/habits/{habit_id}/status", "/habits/dashboard"]
+
+        latencies: list[float] = []
+        errors: list[int] = []
+        start = time.monotonic()
+        deadline = start + duration
+        await asyncio.gather(*(
+            worker(client, paths, headers, deadline, latencies, errors) for _ in range(concurrency)
+        ))
+        elapsed = time.monotonic() - start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+        "errors": len(errors),
+    }
+
+
+def run(database_url: str, modes: list[str], concurrency: int, duration: float, port: int):
+    print(f"{concurrency} clients for {duration}s against {database_url.split('@')[-1]}")
+    print(f"{'mode':>6} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode in modes:
+        server = start_server(mode, database_url, port)
+        try:
+            result = asyncio.run(load(f"http://127.0.0.1:{port}", concurrency, duration))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:>6} {result['requests']:>9} {result['rps']:>8.0f} {result['p50']:>8.1f} "
+              f"{result['p99']:>8.1f} {result['errors']:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database-url", default=database.get_database_url())
+    parser.add_argument("--modes", nargs="+", choices=["sync", "async"], default=["sync", "async"])
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--duration", type=float, default=DURATION)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    run(args.database_url, args.modes, args.concurrency, args.duration, args.port)
@@ -0,0 +1,163 @@
+"""Benchmark GET /users/me/export: peak memory while streaming a huge history.
+
+Seeds a throwaway user with one timer habit and ROWS completed logs, then
+streams the export through the app and samples RSS while reading it. The
+request is driven straight through the ASGI interface and body chunks are
+dropped as they arrive (TestClient would buffer the whole body). The export
+should stay within a fixed memory ceiling whatever the row count; the script
+exits with status 1 when the RSS growth goes over it.
+
+Run against a migrated Postgres database (uses the same .env as the app):
+
+    python -m benchmarks.bench_export
+    python -m benchmarks.bench_export 1000000 csv --ceiling-mb 64
+"""
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+from sqlalchemy import insert, delete
+from app import models, database, utils
+from main import app
+
+ROWS = 5_000_000
+BATCH_SIZE = 10_000
+CEILING_MB = 100
+
+
+def seed_logs(db, habit_id: int, rows: int):
+    """Insert completed logs, one every 10 minutes going back from now."""
+    now = datetime.now(timezone.utc)
+    for batch_start in range(0, rows, BATCH_SIZE):
+        db.execute(insert(models.HabitLog), [
+            {
+                "habit_id": habit_id,
+                "start_time": now - timedelta(minutes=10 * i),
+                "end_time": now - timedelta(minutes=10 * i - 5),
+                "duration_min": 5,
+                "is_manual": False,
+                "status": "completed",
+                "local_date": (now - timedelta(minutes=10 * i)).date(),  # The bench user is on UTC
+            }
+            for i in range(batch_start, min(batch_start + BATCH_SIZE, rows))
+        ])
+        db.commit()
+
+
+def current_rss_mb() -> float:
+    """Resident set size right now (Linux), falling back to the peak elsewhere."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def stream_get(path: str, query: str, headers: dict[str, str]) -> tuple[int, int]:
+    """GET through the ASGI app, counting body bytes without keeping them. Returns (status, bytes)."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+    request_sent = False
+    never_disconnect = asyncio.Event()
+    result = {"status": 0, "bytes": 0}
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await never_disconnect.wait()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            result["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            result["bytes"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return result["status"], result["bytes"]
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, interval: float = 0.05):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.peak_mb = current_rss_mb()
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.is_set():
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            self._done.wait(self.interval)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def run(rows: int, format: str, ceiling_mb: float) -> bool:
+    db = database.SessionLocal()
+    user = models.User(email=f"bench-{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    habit = models.Habit(name="Bench Habit", is_timer=True, user_id=user.id)
+    db.add(habit)
+    db.commit()
+
+    try:
+        print(f"Seeding {rows} logs...")
+        seed_logs(db, habit.id, rows)
+
+        headers = {"Authorization": f"Bearer {utils.create_access_token({'sub': str(user.id)})}"}
+        baseline_mb = current_rss_mb()
+        sampler = RssSampler()
+        sampler.start()
+        start = time.perf_counter()
+        status, exported_bytes = asyncio.run(stream_get("/users/me/export", f"format={format}", headers))
+        elapsed = time.perf_counter() - start
+        sampler.stop()
+        if status != 200:
+            raise RuntimeError(f"Export failed with HTTP {status}")
+    finally:
+        db.rollback()
+        db.execute(delete(models.HabitLog).where(models.HabitLog.habit_id == habit.id))
+        db.execute(delete(models.Habit).where(models.Habit.id == habit.id))
+        db.execute(delete(models.User).where(models.User.id == user.id))
+        db.commit()
+        db.close()
+
+    growth_mb = sampler.peak_mb - baseline_mb
+    print(f"{'rows':>10} {'format':>7} {'seconds':>8} {'MB out':>8} {'rows/s':>10} {'RSS +MB':>8}")
+    print(f"{rows:>10} {format:>7} {elapsed:>8.1f} {exported_bytes / 2**20:>8.1f} "
+          f"{rows / elapsed:>10.0f} {growth_mb:>8.1f}")
+    if growth_mb > ceiling_mb:
+        print(f"FAIL: RSS grew {growth_mb:.1f} MB, ceiling is {ceiling_mb} MB")
+        return False
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rows", type=int, nargs="?", default=ROWS)
+    parser.add_argument("format", choices=["ndjson", "csv"], nargs="?", default="ndjson")
+    parser.add_argument("--ceiling-mb", type=float, default=CEILING_MB)
+    args = parser.parse_args()
+    sys.exit(0 if run(args.rows, args.format, args.ceiling_mb) else 1)
@@ -0,0 +1,88 @@
+"""Benchmark status/stats latency as one habit's log history grows.
+
+Seeds a throwaway user + timer habit, grows its history through each size in
+SIZES and times the hot crud paths at every step. With the habit_logs indexes
+in place, status latency should stay flat from 100 rows to 1M rows.
+
+Run against a migrated Postgres database (uses the same .env as the app):
+
+    python -m benchmarks.bench_log_indexes
+    python -m benchmarks.bench_log_indexes 100 10000 100000
+"""
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from statistics import median
+
+from sqlalchemy import insert, delete, text
+from app import models, crud, database
+
+SIZES = [100, 10_000, 100_000, 1_000_000]
+BATCH_SIZE = 10_000
+REPEATS = 20
+
+
+def seed_logs(db, habit_id: int, start: int, stop: int):
+    """Insert completed logs, one every 10 minutes going back from now."""
+    now = datetime.now(timezone.utc)
+    for batch_start in range(start, stop, BATCH_SIZE):
+        rows = []
+        for i in range(batch_start, min(batch_start + BATCH_SIZE, stop)):
+            start_time = now - timedelta(minutes=10 * i)
+            rows.append({
+                "habit_id": habit_id,
+                "start_time": start_time,
+                "end_time": start_time + timedelta(minutes=5),
+                "duration_min": 5,
+                "is_manual": False,
+                "status": "completed",
+                "local_date": start_time.date(),  # The bench user is on UTC
+            })
+        db.execute(insert(models.HabitLog), rows)
+        db.commit()
+
+
+def time_call(fn, *args) -> float:
+    """Median wall time of fn(*args) in milliseconds."""
+    timings = []
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return median(timings)
+
+
+def run(sizes: list[int]):
+    db = database.SessionLocal()
+    user = models.User(email=f"bench-{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    habit = models.Habit(name="Bench Habit", is_timer=True, user_id=user.id)
+    db.add(habit)
+    db.commit()
+
+    print(f"{'rows':>10} {'status ms':>10} {'active ms':>10} {'stats ms':>10}")
+    seeded = 0
+    try:
+        for size in sizes:
+            seed_logs(db, habit.id, seeded, size)
+            seeded = size
+            if db.bind.dialect.name == "postgresql":
+                db.execute(text("ANALYZE habit_logs"))
+                db.commit()
+            status_ms = time_call(crud.get_habit_status, db, habit.id, user.id)
+            active_ms = time_call(crud.get_active_log, db, habit.id)
+            stats_ms = time_call(crud.get_habit_stats, db, habit.id, user.id)
+            print(f"{size:>10} {status_ms:>10.2f} {active_ms:>10.2f} {stats_ms:>10.2f}")
+    finally:
+        db.rollback()
+        db.execute(delete(models.HabitLog).where(models.HabitLog.habit_id == habit.id))
+        db.execute(delete(models.Habit).where(models.Habit.id == habit.id))
+        db.execute(delete(models.User).where(models.User.id == user.id))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    run([int(arg) for arg in sys.argv[1:]] or SIZES)
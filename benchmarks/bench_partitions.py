@@ -0,0 +1,181 @@
+"""Benchmark "today" lookups on a plain vs a monthly-partitioned habit_logs.
+
+Builds two copies of habit_logs in a scratch schema, one plain and one
+partitioned by month of start_time like the migrated table (see
+app/partitions.py), fills both with the same synthetic rows generated server
+side, and times the day lookups crud runs on them: today's logs of a habit
+and its last 30 days of minutes. The partitioned table is queried with the
+start_time window crud adds (pruned) and without it (every partition
+scanned). The table sizes and the partitions each plan reads are printed
+along with the timings.
+
+Run against a Postgres database (uses the same .env as the app). The default
+100M rows take a while to load and about 15GB of disk for both copies:
+
+    python -m benchmarks.bench_partitions
+    python -m benchmarks.bench_partitions --rows 10000000 --habits 100000 --months 24
+    python -m benchmarks.bench_partitions --keep    # leave the tables for manual EXPLAINs
+"""
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from statistics import median, quantiles
+
+from sqlalchemy import text
+from app import database, partitions, timezones
+
+SCHEMA = "bench_partitions"
+CHUNK_SIZE = 5_000_000
+
+COLUMNS = """
+    id bigint NOT NULL,
+    habit_id integer NOT NULL,
+    start_time timestamptz NOT NULL,
+    end_time timestamptz,
+    duration_min integer,
+    status varchar NOT NULL,
+    local_date date NOT NULL
+"""
+
+# One log per row number, spread over the last `months` months: a few per habit and day
+SEED_CHUNK = """
+INSERT INTO {table}
+SELECT n, 1 + n % :habits, start_time, start_time + interval '10 minutes', 10,
+       CASE WHEN n % 10 = 0 THEN 'missed' ELSE 'completed' END, CAST(timezone('UTC', start_time) AS date)
+FROM (
+    SELECT n, :now - (:span * ((n * 7919) % :rows) / :rows) AS start_time
+    FROM generate_series(CAST(:low AS bigint), CAST(:high AS bigint) - 1) AS n
+) AS seeded
+"""
+
+TODAY = """
+SELECT id, start_time, status FROM {table}
+WHERE habit_id = :habit_id AND local_date = :day {window}
+"""
+LAST_30_DAYS = """
+SELECT COALESCE(SUM(duration_min), 0) FROM {table}
+WHERE habit_id = :habit_id AND local_date >= :first_day AND local_date <= :day AND status = 'completed' {window}
+"""
+WINDOW = "AND start_time >= :window_start AND start_time < :window_end"
+
+
+def create_tables(conn, months: int, now: datetime):
+    conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.plain ({COLUMNS})"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.monthly ({COLUMNS}) PARTITION BY RANGE (start_time)"))
+    conn.execute(text(f"CREATE TABLE {SCHEMA}.monthly_default PARTITION OF {SCHEMA}.monthly DEFAULT"))
+    current = partitions.month_start(now.date())
+    for offset in range(-months - 1, partitions.MONTHS_AHEAD + 1):
+        month = partitions.add_months(current, offset)
+        conn.execute(text(
+            f"CREATE TABLE {SCHEMA}.{partitions.partition_name(month)} PARTITION OF {SCHEMA}.monthly "
+            f"{partitions.partition_bounds(month)}"
+        ))
+
+
+def seed(conn, rows: int, habits: int, months: int, now: datetime):
+    params = {"habits": habits, "rows": rows, "now": now, "span": timedelta(days=30 * months)}
+    for low in range(0, rows, CHUNK_SIZE):
+        high = min(low + CHUNK_SIZE, rows)
+        for table in ("plain", "monthly"):
+            conn.execute(text(SEED_CHUNK.format(table=f"{SCHEMA}.{table}")), {**params, "low": low, "high": high})
+        conn.commit()
+        print(f"  seeded {high:,} / {rows:,}", flush=True)
+    # Built after loading, the same indexes as habit_logs' day and time lookups
+    for table in ("plain", "monthly"):
+        key = "(id)" if table == "plain" else "(id, start_time)"
+        conn.execute(text(f"ALTER TABLE {SCHEMA}.{table} ADD PRIMARY KEY {key}"))
+        conn.execute(text(f"CREATE INDEX ON {SCHEMA}.{table} (habit_id, local_date)"))
+        conn.execute(text(f"CREATE INDEX ON {SCHEMA}.{table} (habit_id, start_time, id)"))
+        conn.execute(text(f"ANALYZE {SCHEMA}.{table}"))
+    conn.commit()
+
+
+def query_params(habit_id: int, first_day, day) -> dict:
+    window_start, window_end = timezones.start_time_window(first_day, day)
+    return {
+        "habit_id": habit_id,
+        "day": day,
+        "first_day": first_day,
+        "window_start": window_start,
+        "window_end": window_end,
+    }
+
+
+def scanned_relations(conn, sql: str, params: dict) -> int:
+    """Number of tables or partitions the plan reads."""
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+    relations = set()
+    nodes = [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        if "Relation Name" in node:
+            relations.add(node["Relation Name"])
+        nodes.extend(node.get("Plans", []))
+    return len(relations)
+
+
+def time_query(conn, sql: str, habits: int, first_day, day, queries: int) -> tuple[float, float]:
+    """Median and p95 wall time in milliseconds over random habits."""
+    timings = []
+    for _ in range(queries):
+        params = query_params(random.randint(1, habits), first_day, day)
+        start = time.perf_counter()
+        conn.execute(text(sql), params).all()
+        timings.append((time.perf_counter() - start) * 1000)
+    return median(timings), quantiles(timings, n=20)[-1]
+
+
+def run(rows: int, habits: int, months: int, queries: int, keep: bool):
+    engine = database.get_engine()
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("bench_partitions needs Postgres")
+    now = datetime.now(timezone.utc)
+    day = now.date()
+    variants = [
+        ("plain", "plain", ""),
+        ("partitioned, unpruned", "monthly", ""),
+        ("partitioned, pruned", "monthly", WINDOW),
+    ]
+    with engine.connect() as conn:
+        try:
+            print(f"Seeding {rows:,} rows over {months} months for {habits:,} habits")
+            create_tables(conn, months, now)
+            seed(conn, rows, habits, months, now)
+            for table in ("plain", "monthly"):
+                size = conn.execute(text(
+                    f"SELECT pg_size_pretty(SUM(pg_total_relation_size(relid))) "
+                    f"FROM pg_partition_tree('{SCHEMA}.{table}')"
+                )).scalar()
+                print(f"{table}: {size}")
+
+            print(f"{'query':>12} {'table':>22} {'tables read':>12} {'median ms':>10} {'p95 ms':>10}")
+            for name, query, days in (("today", TODAY, 1), ("last 30 days", LAST_30_DAYS, 30)):
+                first_day = day - timedelta(days=days - 1)
+                for label, table, window in variants:
+                    sql = query.format(table=f"{SCHEMA}.{table}", window=window)
+                    scanned = scanned_relations(conn, sql, query_params(1, first_day, day))
+                    # Warm the cache and plans before timing
+                    time_query(conn, sql, habits, first_day, day, min(queries, 100))
+                    median_ms, p95_ms = time_query(conn, sql, habits, first_day, day, queries)
+                    print(f"{name:>12} {label:>22} {scanned:>12} {median_ms:>10.3f} {p95_ms:>10.3f}")
+        finally:
+            conn.rollback()
+            if not keep:
+                conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+                conn.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000_000)
+    parser.add_argument("--habits", type=int, default=1_000_000)
+    parser.add_argument("--months", type=int, default=36, help="Months of history the rows are spread over")
+    parser.add_argument("--queries", type=int, default=1000, help="Timed queries per variant")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema")
+    args = parser.parse_args()
+    run(args.rows, args.habits, args.months, args.queries, args.keep)
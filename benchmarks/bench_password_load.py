@@ -0,0 +1,113 @@
+"""Load test: a login burst next to normal traffic, per password hashing pool.
+
+For each PASSWORD_HASH_POOL mode, starts one uvicorn worker, signs up a
+throwaway user with one habit, then for DURATION seconds runs LOGINS clients
+calling POST /auth/login back to back alongside STATUS clients calling
+GET /habits/{id}/status. Reports logins/sec, shed logins (503) and the
+status route's throughput and p50/p99 latency, which should stay flat
+however hard logins are hammered.
+
+Uses DATABASE_URL, or the Postgres settings from .env when it is unset:
+
+    python -m benchmarks.bench_password_load
+    python -m benchmarks.bench_password_load --modes process --logins 200 --status 50
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+from benchmarks.bench_async_load import percentile, wait_until_ready
+
+LOGINS = 100
+STATUS = 50
+DURATION = 20
+PORT = 8766
+
+
+def start_server(mode: str, port: int) -> subprocess.Popen:
+    env = dict(os.environ, PASSWORD_HASH_POOL=mode)
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def login_worker(client: httpx.AsyncClient, email: str, deadline: float, results: dict):
+    while time.monotonic() < deadline:
+        response = await client.post("/auth/login", data={"username": email, "password": "benchpass"})
+        if response.status_code == 200:
+            results["ok"] += 1
+        elif response.status_code == 503:
+            results["shed"] += 1
+            await asyncio.sleep(float(response.headers.get("Retry-After", 1)))
+        else:
+            results["errors"] += 1
+
+
+async def status_worker(client: httpx.AsyncClient, path: str, headers: dict, deadline: float, latencies: list[float]):
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        if response.status_code == 200:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def load(base_url: str, logins: int, status: int, duration: float) -> dict:
+    limits = httpx.Limits(max_connections=logins + status)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        await wait_until_ready(client)
+        email = f"bench-{uuid.uuid4()}@example.com"
+        await client.post("/users/", json={"email": email, "password": "benchpass"})
+        token = (await client.post("/auth/login", data={"username": email, "password": "benchpass"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        habit = (await client.post("/habits/", json={"name": "Bench Habit"}, headers=headers)).json()
+
+        results = {"ok": 0, "shed": 0, "errors": 0}
+        latencies: list[float] = []
+        start = time.monotonic()
+        deadline = start + duration
+        await asyncio.gather(
+            *(login_worker(client, email, deadline, results) for _ in range(logins)),
+            *(status_worker(client, f"/habits/{habit['id']}/status", headers, deadline, latencies) for _ in range(status)),
+        )
+        elapsed = time.monotonic() - start
+
+    latencies.sort()
+    return {
+        "logins": results["ok"] / elapsed,
+        "shed": results["shed"],
+        "status_rps": len(latencies) / elapsed,
+        "p50": percentile(latencies, 0.50),
+        "p99": percentile(latencies, 0.99),
+    }
+
+
+def run(modes: list[str], logins: int, status: int, duration: float, port: int):
+    print(f"{logins} login + {status} status clients for {duration}s")
+    print(f"{'pool':>8} {'logins/s':>9} {'shed':>6} {'status/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    for mode in modes:
+        server = start_server(mode, port)
+        try:
+            result = asyncio.run(load(f"http://127.0.0.1:{port}", logins, status, duration))
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:>8} {result['logins']:>9.1f} {result['shed']:>6} {result['status_rps']:>9.0f} "
+              f"{result['p50']:>8.1f} {result['p99']:>8.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=["process", "thread"], default=["process", "thread"])
+    parser.add_argument("--logins", type=int, default=LOGINS)
+    parser.add_argument("--status", type=int, default=STATUS)
+    parser.add_argument("--duration", type=float, default=DURATION)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    run(args.modes, args.logins, args.status, args.duration, args.port)
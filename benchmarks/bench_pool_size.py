@@ -0,0 +1,91 @@
+"""Benchmark throughput against connection pool size.
+
+Seeds a throwaway user with a few habits, then for each pool size runs
+THREADS threads that each check out a session and load the user's
+dashboard, back to back, for DURATION seconds (max_overflow=0, so the pool
+size is the hard cap). Reports dashboards/sec and the pool checkout waits
+recorded by the instrumented pool.
+
+Run against a migrated Postgres database (uses the same .env as the app):
+
+    python -m benchmarks.bench_pool_size
+    python -m benchmarks.bench_pool_size 1 5 10 --threads 100 --duration 20
+"""
+import argparse
+import threading
+import time
+import uuid
+
+from sqlalchemy import delete
+from sqlalchemy.orm import sessionmaker
+from app import models, crud, database
+
+POOL_SIZES = [1, 2, 5, 10, 20, 40]
+THREADS = 64
+DURATION = 10
+HABITS = 10
+
+
+def seed(db) -> tuple[int, list[int]]:
+    user = models.User(email=f"bench-{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    habits = [models.Habit(name=f"Bench Habit {i}", user_id=user.id) for i in range(HABITS)]
+    db.add_all(habits)
+    db.commit()
+    return user.id, [habit.id for habit in habits]
+
+
+def measure(pool_size: int, threads: int, duration: float, user_id: int) -> dict:
+    settings = dict(database.POOL_SETTINGS, mode="queue", pool_size=pool_size, max_overflow=0, pool_timeout=60)
+    engine = database.create_db_engine(settings=settings)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    database.pool_metrics.reset()
+
+    completed = [0] * threads
+    deadline = time.monotonic() + duration
+
+    def worker(index: int):
+        while time.monotonic() < deadline:
+            with Session() as db:
+                crud.get_dashboard(db, user_id)
+            completed[index] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    start = time.monotonic()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.monotonic() - start
+    engine.dispose()
+
+    stats = database.pool_metrics.snapshot()
+    stats["rps"] = sum(completed) / elapsed
+    return stats
+
+
+def run(pool_sizes: list[int], threads: int, duration: float):
+    db = database.SessionLocal()
+    user_id, habit_ids = seed(db)
+    print(f"{threads} threads for {duration}s per pool size")
+    print(f"{'pool':>5} {'req/s':>8} {'avg wait ms':>12} {'max wait ms':>12} {'timeouts':>9}")
+    try:
+        for pool_size in pool_sizes:
+            stats = measure(pool_size, threads, duration, user_id)
+            print(f"{pool_size:>5} {stats['rps']:>8.0f} {stats['avg_wait_ms']:>12.2f} "
+                  f"{stats['max_wait_ms']:>12.1f} {stats['timeouts']:>9}")
+    finally:
+        db.execute(delete(models.Habit).where(models.Habit.id.in_(habit_ids)))
+        db.execute(delete(models.User).where(models.User.id == user_id))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pool_sizes", type=int, nargs="*", default=POOL_SIZES)
+    parser.add_argument("--threads", type=int, default=THREADS)
+    parser.add_argument("--duration", type=float, default=DURATION)
+    args = parser.parse_args()
+    run(args.pool_sizes, args.threads, args.duration)
@@ -0,0 +1,117 @@
+"""Benchmark response rendering: response_model validation vs the orjson fast path.
+
+Seeds a throwaway timer habit with LOGS completed logs, then measures
+renders/sec for:
+
+- a LOGS-row log page: ORM objects validated through list[schemas.HabitLog]
+  and dumped by Pydantic (what FastAPI does with a response_model), against
+  plain column rows rendered by FastJSONResponse (the new route path);
+- the HabitStats response: the crud dict validated through the
+  Timer/Manual stats union and dumped, against FastJSONResponse.
+
+Both variants include the page query, so the numbers are per response.
+
+Run against a migrated Postgres database (uses the same .env as the app):
+
+    python -m benchmarks.bench_serialization
+    python -m benchmarks.bench_serialization --logs 50000 --repeat 5
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+from pydantic import TypeAdapter
+from sqlalchemy import insert, delete
+from app import models, schemas, crud, database
+from app.responses import FastJSONResponse, row_dicts
+
+LOGS = 10_000
+REPEAT = 10
+STATS_REPEAT = 2_000
+
+
+def seed(db, logs: int) -> tuple[int, int]:
+    user = models.User(email=f"bench-{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    habit = models.Habit(name="Bench Habit", user_id=user.id, is_timer=True)
+    db.add(habit)
+    db.commit()
+    now = datetime.now(timezone.utc)
+    db.execute(insert(models.HabitLog), [
+        {
+            "habit_id": habit.id,
+            "start_time": now - timedelta(minutes=10 * i + 10),
+            "end_time": now - timedelta(minutes=10 * i + 5),
+            "duration_min": 5,
+            "notes": "",
+            "is_manual": False,
+            "status": "completed",
+            "local_date": (now - timedelta(minutes=10 * i + 10)).date(),  # The bench user is on UTC
+        }
+        for i in range(logs)
+    ])
+    db.commit()
+    return user.id, habit.id
+
+
+def rate(fn, repeat: int) -> float:
+    """Calls per second, after one warm-up call."""
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return repeat / (time.perf_counter() - start)
+
+
+def run(logs: int, repeat: int):
+    db = database.SessionLocal()
+    user_id, habit_id = seed(db, logs)
+    try:
+        logs_adapter = TypeAdapter(list[schemas.HabitLog])
+        stats_adapter = TypeAdapter(schemas.HabitStats)
+
+        def logs_validated():
+            page, _ = crud.get_logs_page(db, habit_id, limit=logs)
+            db.expunge_all()  # Each request starts with an empty identity map
+            return logs_adapter.dump_json(logs_adapter.validate_python(page, from_attributes=True))
+
+        def logs_fast():
+            page, _ = crud.get_logs_page(db, habit_id, limit=logs, as_rows=True)
+            return FastJSONResponse(row_dicts(page, schemas.HabitLog)).body
+
+        stats = crud.get_habit_stats(db, habit_id, user_id)
+
+        def stats_validated():
+            return stats_adapter.dump_json(stats_adapter.validate_python(stats))
+
+        def stats_fast():
+            return FastJSONResponse(stats).body
+
+        assert len(logs_validated()) == len(logs_fast())
+        assert stats_validated() == stats_fast()
+
+        print(f"{'response':<22} {'validated/s':>12} {'fast/s':>10} {'speedup':>8}")
+        for name, slow, fast, times in (
+            (f"{logs} logs", logs_validated, logs_fast, repeat),
+            ("HabitStats", stats_validated, stats_fast, STATS_REPEAT),
+        ):
+            slow_rate, fast_rate = rate(slow, times), rate(fast, times)
+            print(f"{name:<22} {slow_rate:>12.1f} {fast_rate:>10.1f} {fast_rate / slow_rate:>7.1f}x")
+    finally:
+        db.rollback()
+        db.execute(delete(models.HabitLog).where(models.HabitLog.habit_id == habit_id))
+        db.execute(delete(models.HabitStats).where(models.HabitStats.habit_id == habit_id))
+        db.execute(delete(models.Habit).where(models.Habit.id == habit_id))
+        db.execute(delete(models.User).where(models.User.id == user_id))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logs", type=int, default=LOGS)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    args = parser.parse_args()
+    run(args.logs, args.repeat)
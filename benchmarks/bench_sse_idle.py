@@ -0,0 +1,115 @@
+"""Load test: many idle Server-Sent Event streams on one worker.
+
+Starts one uvicorn worker, signs up a throwaway user with one habit and opens
+CONNECTIONS streams to GET /events/ for that user. Reports the worker's memory
+per open stream, then starts a timer session and reports how long the
+session_started event takes to reach the first and the last stream.
+
+Every stream is a socket on both ends, so raise `ulimit -n` above twice
+CONNECTIONS when client and server share a machine.
+
+Uses DATABASE_URL, or the Postgres settings from .env when it is unset:
+
+    python -m benchmarks.bench_sse_idle
+    python -m benchmarks.bench_sse_idle --connections 2000
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.bench_async_load import sign_up, wait_until_ready
+
+CONNECTIONS = 10_000
+BATCH = 500  # Connections opened at once, to stay under the listen backlog
+PORT = 8767
+
+
+def start_server(port: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=dict(os.environ),
+    )
+
+
+def rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+async def open_stream(port: int, token: str) -> asyncio.StreamReader:
+    """A raw HTTP/1.1 stream connection, read up to the first SSE line (the retry hint)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(f"GET /events/?access_token={token} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+    await writer.drain()
+    while not (await reader.readline()).startswith(b"retry:"):
+        pass
+    return reader, writer
+
+
+async def wait_for_event(reader: asyncio.StreamReader, name: bytes) -> float:
+    while not (await reader.readline()).startswith(b"event: " + name):
+        pass
+    return time.perf_counter()
+
+
+async def load(port: int, connections: int, pid: int) -> dict:
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=60) as client:
+        await wait_until_ready(client)
+        headers, habit_id = await sign_up(client)
+        token = headers["Authorization"].split()[1]
+
+        baseline = rss_mb(pid)
+        streams = []
+        start = time.perf_counter()
+        for offset in range(0, connections, BATCH):
+            batch = min(BATCH, connections - offset)
+            streams += await asyncio.gather(*(open_stream(port, token) for _ in range(batch)))
+        connect_seconds = time.perf_counter() - start
+        await asyncio.sleep(1)
+        loaded = rss_mb(pid)
+
+        waiters = [asyncio.create_task(wait_for_event(reader, b"session_started")) for reader, _ in streams]
+        sent = time.perf_counter()
+        await client.post(f"/habit_logs/{habit_id}/logs/start", headers=headers)
+        received = await asyncio.gather(*waiters)
+
+        for _, writer in streams:
+            writer.close()
+    return {
+        "connect_seconds": connect_seconds,
+        "baseline_mb": baseline,
+        "loaded_mb": loaded,
+        "first_ms": (min(received) - sent) * 1000,
+        "last_ms": (max(received) - sent) * 1000,
+    }
+
+
+def run(connections: int, port: int):
+    server = start_server(port)
+    try:
+        result = asyncio.run(load(port, connections, server.pid))
+    finally:
+        server.terminate()
+        server.wait()
+    added = result["loaded_mb"] - result["baseline_mb"]
+    print(f"{connections} streams opened in {result['connect_seconds']:.1f}s")
+    print(f"worker RSS {result['baseline_mb']:.0f} MB -> {result['loaded_mb']:.0f} MB "
+          f"({added * 1024 / connections:.1f} KB per stream)")
+    print(f"session_started reached the first stream in {result['first_ms']:.1f} ms, "
+          f"the last in {result['last_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=CONNECTIONS)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    run(args.connections, args.port)
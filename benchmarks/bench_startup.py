@@ -0,0 +1,90 @@
+"""Benchmark how quickly a new worker can serve: import, first response, first query.
+
+For each of RUNS cold starts, reports:
+- import: `import main` in a fresh interpreter (no database work since create_app)
+- first response: spawning a uvicorn worker until GET / answers
+- first query: from spawning until an authenticated GET /habits/ answers, which
+  builds the engine and opens the first connection
+
+The token belongs to no user, so the requests read nothing but still run
+their queries. Times are milliseconds, median and worst over the runs.
+
+Uses DATABASE_URL, or the Postgres settings from .env when it is unset. The
+schema must already exist (alembic upgrade head):
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 20
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from app import utils
+
+RUNS = 10
+PORT = 8768
+POLL_SECONDS = 0.005
+
+
+def time_import() -> float:
+    code = "import time; start = time.perf_counter(); import main; print(time.perf_counter() - start)"
+    result = subprocess.run([sys.executable, "-c", code], env=dict(os.environ), capture_output=True, text=True, check=True)
+    return float(result.stdout) * 1000
+
+
+def wait_for(client: httpx.Client, path: str, headers: dict | None = None, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if client.get(path, headers=headers).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(POLL_SECONDS)
+    raise RuntimeError("Server did not start")
+
+
+def time_worker_start(port: int, headers: dict) -> tuple[float, float]:
+    """(ms until GET / answers, ms until GET /habits/ answers), both from spawning the worker."""
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=dict(os.environ),
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            wait_for(client, "/")
+            first_response = time.perf_counter()
+            wait_for(client, "/habits/", headers)
+            first_query = time.perf_counter()
+    finally:
+        server.terminate()
+        server.wait()
+    return (first_response - start) * 1000, (first_query - start) * 1000
+
+
+def run(runs: int, port: int):
+    headers = {"Authorization": f"Bearer {utils.create_access_token({'sub': '0'})}"}
+    imports, responses, queries = [], [], []
+    for _ in range(runs):
+        imports.append(time_import())
+        first_response, first_query = time_worker_start(port, headers)
+        responses.append(first_response)
+        queries.append(first_query)
+
+    print(f"{'':>16} {'median ms':>10} {'max ms':>8}")
+    for name, samples in (("import", imports), ("first response", responses), ("first query", queries)):
+        print(f"{name:>16} {statistics.median(samples):>10.0f} {max(samples):>8.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=RUNS)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    run(args.runs, args.port)
@@ -0,0 +1,133 @@
+"""Benchmark the stats/status result cache at a 95% read ratio.
+
+Seeds a throwaway user with HABITS timer habits, each with LOGS completed
+logs, then runs OPERATIONS random operations through crud: reads
+(get_cached_habit_stats or get_cached_habit_status, as the routes call them)
+and, at WRITE_RATIO, manual logs, which invalidate that habit's entries. The
+same operations run once with caching off and once per requested backend,
+reporting throughput, hit ratio and queries per read.
+
+Run against a migrated Postgres database (uses the same .env as the app):
+
+    python -m benchmarks.bench_stats_cache
+    python -m benchmarks.bench_stats_cache --habits 200 --backends memory redis
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+
+from sqlalchemy import delete, event, insert
+from app import cache, crud, database, metrics, models
+
+HABITS = 50
+LOGS = 500
+OPERATIONS = 5_000
+WRITE_RATIO = 0.05
+
+
+def seed(db, habits: int, logs: int) -> tuple[int, list[int]]:
+    user = models.User(email=f"bench-{uuid.uuid4()}@example.com", hashed_password="x")
+    db.add(user)
+    db.commit()
+    rows = [models.Habit(name=f"Bench Habit {i}", is_timer=True, user_id=user.id) for i in range(habits)]
+    db.add_all(rows)
+    db.commit()
+    now = datetime.now(timezone.utc)
+    for habit in rows:
+        db.execute(insert(models.HabitLog), [
+            {
+                "habit_id": habit.id,
+                "start_time": now - timedelta(hours=2 * i + 1),
+                "end_time": now - timedelta(hours=2 * i),
+                "duration_min": 60,
+                "is_manual": False,
+                "status": "completed",
+                "local_date": (now - timedelta(hours=2 * i + 1)).date(),  # The bench user is on UTC
+            }
+            for i in range(logs)
+        ])
+    db.commit()
+    return user.id, [habit.id for habit in rows]
+
+
+def run_operations(habit_ids: list[int], operations: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    queries = 0
+
+    def count(*args):
+        nonlocal queries
+        queries += 1
+
+    engine = database.get_engine()
+    event.listen(engine, "before_cursor_execute", count)
+    reads = writes = read_queries = 0
+    start = time.perf_counter()
+    try:
+        for _ in range(operations):
+            habit_id = rng.choice(habit_ids)
+            with database.SessionLocal() as db:
+                if rng.random() < WRITE_RATIO:
+                    crud.create_manual_log(db, habit_id, 15)
+                    writes += 1
+                    continue
+                before = queries
+                habit = crud.get_habit_by_id(db, habit_id)
+                if rng.random() < 0.5:
+                    crud.get_cached_habit_stats(db, habit, crud.stats_etag(habit))
+                else:
+                    crud.get_cached_habit_status(db, habit, crud.status_etag(habit))
+                reads += 1
+                read_queries += queries - before
+    finally:
+        event.remove(engine, "before_cursor_execute", count)
+    elapsed = time.perf_counter() - start
+    return {"elapsed": elapsed, "reads": reads, "writes": writes, "read_queries": read_queries}
+
+
+def lookups() -> tuple[float, float]:
+    hits = sum(metrics.RESULT_CACHE_HITS.series.values())
+    misses = sum(metrics.RESULT_CACHE_MISSES.series.values())
+    return hits, misses
+
+
+def run(operations: int, habits: int, logs: int, backends: list[str]):
+    db = database.SessionLocal()
+    user_id, habit_ids = seed(db, habits, logs)
+    db.close()
+
+    configurations = [("off", cache.MemoryBackend(maxsize=0))]
+    for name in backends:
+        configurations.append((name, cache.RedisBackend() if name == "redis" else cache.MemoryBackend()))
+
+    original = cache.results.backend
+    print(f"{'cache':>8} {'ops/s':>8} {'hit %':>6} {'queries/read':>13}")
+    try:
+        for name, backend in configurations:
+            backend.clear()
+            cache.results.backend = backend
+            hits, misses = lookups()
+            result = run_operations(habit_ids, operations, seed=0)
+            new_hits, new_misses = lookups()
+            hit_ratio = (new_hits - hits) / max(new_hits - hits + new_misses - misses, 1)
+            print(f"{name:>8} {operations / result['elapsed']:>8.0f} {hit_ratio * 100:>6.1f} "
+                  f"{result['read_queries'] / result['reads']:>13.2f}")
+    finally:
+        cache.results.backend = original
+        db = database.SessionLocal()
+        db.execute(delete(models.HabitLog).where(models.HabitLog.habit_id.in_(habit_ids)))
+        db.execute(delete(models.Habit).where(models.Habit.id.in_(habit_ids)))
+        db.execute(delete(models.User).where(models.User.id == user_id))
+        db.commit()
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("operations", type=int, nargs="?", default=OPERATIONS)
+    parser.add_argument("--habits", type=int, default=HABITS)
+    parser.add_argument("--logs", type=int, default=LOGS)
+    parser.add_argument("--backends", nargs="+", choices=["memory", "redis"], default=["memory"])
+    args = parser.parse_args()
+    run(args.operations, args.habits, args.logs, args.backends)
@@ -1,31 +1,149 @@
-from fastapi import FastAPI
+import json
+import logging
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware 
-from app import models, database
-from app.routers import habits, habit_logs, users, auth
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from app import models, database, metrics, passwords, pubsub
+from app.responses import FastJSONResponse
+from app.rollover import RolloverScheduler
+from app.routers import habits, habit_logs, users, auth, monitoring, events
+from app.settings import Settings
 
 
+logger = logging.getLogger(__name__)
 
-# Create DB tables
-models.Base.metadata.create_all(bind=database.engine)
+# Requests at least this slow (ms) log every SQL statement they ran
+SLOW_REQUEST_MS = database.env_int("SLOW_REQUEST_MS", 500)
 
-app = FastAPI(title="Habit Tracker")
+class QueryTimingMiddleware:
+    """Count and time the SQL each request runs; report it in Server-Timing, the log and /metrics.
 
-# Include routers
-app.include_router(habits.router)
-app.include_router(habit_logs.router)
-app.include_router(users.router)
-app.include_router(auth.router)
+    Plain ASGI rather than @app.middleware("http"), which runs every response
+    through an extra task and memory stream: ~20 KB held per open /events stream.
+    """
 
-# Set up CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:3000"], # React dev server
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stats = database.QueryStats()
+        token = database.current_query_stats.set(stats)
+        start = time.perf_counter()
+        started = False
+
+        async def send_with_timing(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                total_ms = (time.perf_counter() - start) * 1000
+                MutableHeaders(scope=message)["Server-Timing"] = stats.server_timing(total_ms)
+                record_request(scope, message["status"], total_ms, stats)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        except Exception as e:
+            if not started:
+                route = metrics.route_template(scope)
+                metrics.REQUEST_EXCEPTIONS.inc(scope["method"], route, type(e).__name__)
+                metrics.observe_request(scope["method"], route, 500, time.perf_counter() - start, stats)
+            raise
+        finally:
+            database.current_query_stats.reset(token)
+
+def record_request(scope, status: int, total_ms: float, stats: database.QueryStats):
+    metrics.observe_request(scope["method"], metrics.route_template(scope), status, total_ms / 1000, stats)
+    entry = {
+        "method": scope["method"],
+        "path": scope["path"],
+        "status": status,
+        "duration_ms": round(total_ms, 1),
+        "queries": stats.count,
+        "db_ms": round(stats.total_ms, 1),
+        "slowest_query_ms": round(stats.slowest_ms, 1),
+    }
+    if total_ms >= SLOW_REQUEST_MS:
+        entry["statements"] = [
+            {"ms": round(elapsed_ms, 1), "sql": " ".join(statement.split())}
+            for elapsed_ms, statement in stats.statements
+        ]
+        logger.warning("slow request %s", json.dumps(entry))
+    else:
+        logger.info("request %s", json.dumps(entry))
+
+async def password_hashing_busy(request: Request, exc: passwords.PasswordHashingBusy):
+    """Shed login/signup bursts instead of queueing them without bound."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Too many password checks in progress, try again shortly"},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
-@app.get("/")
 async def root():
     return {"message": "Welcome to the Habit Tracker API!"}
 
+def create_app(settings: Settings | None = None) -> FastAPI:
+    """Build the API. Nothing here touches the database: the engine is built by the first request that needs it."""
+    settings = settings or Settings.from_env()
+    database.configure(settings)
+    pubsub.configure(settings.events_broker)
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        if settings.create_schema:
+            # Development only; production schemas are managed by `alembic upgrade head`
+            await run_in_threadpool(models.Base.metadata.create_all, bind=database.get_engine())
+        # Nightly freezes/streak resets; enable on the API workers or run rollover.py from cron instead
+        scheduler = None
+        if settings.rollover_scheduler_enabled:
+            scheduler = RolloverScheduler()
+            scheduler.start()
+        # Multi-worker /metrics: each worker publishes its values to METRICS_DIR
+        flusher = None
+        if settings.metrics_dir:
+            flusher = metrics.Flusher(settings.metrics_dir, settings.metrics_flush_interval)
+            flusher.start()
+        # With EVENTS_BROKER=postgres, LISTEN for live events from the other workers
+        await pubsub.broker.start()
+        yield
+        await pubsub.broker.stop()
+        if scheduler:
+            scheduler.stop()
+        if flusher:
+            flusher.stop()
+        passwords.shutdown()
+
+    app = FastAPI(title="Habit Tracker", lifespan=lifespan, default_response_class=FastJSONResponse)
+    app.state.settings = settings
+
+    # Include routers
+    app.include_router(habits.router)
+    app.include_router(habit_logs.router)
+    app.include_router(users.router)
+    app.include_router(auth.router)
+    app.include_router(monitoring.router)
+    app.include_router(events.router)
+
+    # Set up CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=settings.cors_origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Next-Cursor", "Server-Timing"],  # Log pagination cursor, per-request DB timing
+    )
+    app.add_middleware(QueryTimingMiddleware)
+
+    app.add_exception_handler(passwords.PasswordHashingBusy, password_hashing_busy)
+    app.get("/")(root)
+    return app
+
+app = create_app()
@@ -0,0 +1,49 @@
+"""Maintain the monthly habit_logs partitions (Postgres, see app/partitions.py).
+
+`ensure` creates the partitions of this month and the next ones; run it daily
+from cron unless the API runs the in-process scheduler
+(ROLLOVER_SCHEDULER_ENABLED=true). `archive` detaches the months that end by
+--before into the archive schema. `list` prints the attached months.
+
+    python partitions.py ensure
+    python partitions.py ensure --months-ahead 6
+    python partitions.py archive --before 2024-01-01
+    python partitions.py list
+"""
+import argparse
+import sys
+from datetime import date
+from app import database, partitions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    ensure = commands.add_parser("ensure", help="Create this month's and the coming months' partitions")
+    ensure.add_argument("--months-ahead", type=int, default=partitions.MONTHS_AHEAD)
+    archive = commands.add_parser("archive", help="Detach old months into the archive schema")
+    archive.add_argument("--before", type=date.fromisoformat, required=True,
+                         help="Archive the months that end on or before this day, YYYY-MM-DD")
+    archive.add_argument("--schema", default=partitions.ARCHIVE_SCHEMA)
+    commands.add_parser("list", help="Print the attached months")
+    args = parser.parse_args()
+
+    with database.SessionLocal() as db:
+        conn = db.connection()
+        if not partitions.is_partitioned(conn):
+            print("habit_logs is not partitioned (run alembic upgrade head on Postgres)")
+            sys.exit(1)
+        if args.command == "ensure":
+            names = partitions.ensure_partitions(conn, months_ahead=args.months_ahead)
+            print(f"{len(names)} partitions created: {', '.join(names)}" if names else "All partitions exist")
+        elif args.command == "archive":
+            names = partitions.archive_partitions(conn, args.before, args.schema)
+            print(f"{len(names)} partitions moved to {args.schema}: {', '.join(names)}" if names else "Nothing to archive")
+        else:
+            for month in partitions.attached_months(conn):
+                print(partitions.partition_name(month))
+        db.commit()
+
+
+if __name__ == "__main__":
+    main()
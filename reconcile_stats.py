@@ -0,0 +1,47 @@
+"""Rebuild the habit_stats counters from habit_logs and report any drift.
+
+Without --fix nothing is written and the exit code is 1 when drift is found
+(missing rows included), so it can run as a periodic check. With --fix stored
+counters are corrected and missing rows are created (the backfill after the
+habit_stats migration).
+
+    python reconcile_stats.py
+    python reconcile_stats.py --fix --chunk-size 5000
+"""
+import argparse
+import sys
+from app import database, models
+from app.stats_counters import reconcile
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fix", action="store_true", help="Write the rebuilt counters")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Habits checked per transaction")
+    args = parser.parse_args()
+
+    drift_count = 0
+    last_habit_id = 0
+    with database.SessionLocal() as db:
+        while True:
+            habit_ids = [
+                habit_id for (habit_id,) in db.query(models.Habit.id).filter(
+                    models.Habit.id > last_habit_id
+                ).order_by(models.Habit.id).limit(args.chunk_size)
+            ]
+            if not habit_ids:
+                break
+            for habit_id, field, stored, expected in reconcile(db, habit_ids, fix=args.fix):
+                print(f"habit {habit_id}: {field} is {stored!r}, expected {expected!r}")
+                drift_count += 1
+            db.commit()
+            last_habit_id = habit_ids[-1]
+
+    action = "fixed" if args.fix else "found"
+    print(f"{drift_count} drifted counters {action}")
+    if drift_count and not args.fix:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
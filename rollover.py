@@ -0,0 +1,33 @@
+"""Run the day rollover (automatic freezes and streak resets) for all habits.
+
+Meant to be run by cron right after 12:00 UTC, when the previous day has
+ended in every timezone, unless the API runs the in-process scheduler
+(ROLLOVER_SCHEDULER_ENABLED=true). Safe to rerun: an interrupted run resumes
+where it stopped and a finished day is skipped.
+
+    python rollover.py
+    python rollover.py --date 2026-03-01 --chunk-size 5000
+"""
+import argparse
+import logging
+from datetime import date
+from app import database
+from app.rollover import run_rollover, DEFAULT_CHUNK_SIZE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="Day whose previous day is judged, YYYY-MM-DD (default: the latest one that has ended everywhere)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help="Habits processed per transaction")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s [%(name)s] %(message)s")
+    with database.SessionLocal() as db:
+        run = run_rollover(db, args.date, args.chunk_size)
+    print(f"Rollover for {run.day}: {run.habits_frozen} habits frozen, {run.streaks_reset} streaks reset")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 import pytest
+from app import database
 from app.database import Base
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from fastapi.testclient import TestClient
 from main import app
 import uuid
@@ -28,6 +29,12 @@ def db():
 # API Testing Fixtures (for endpoint tests with FastAPI TestClient)
 # ============================================================================
 
+@pytest.fixture(scope="session", autouse=True)
+def app_schema():
+    """Create the app database's tables once per run (main no longer does it at import)."""
+    Base.metadata.create_all(bind=database.get_engine())
+
+
 @pytest.fixture
 def client():
     """FastAPI TestClient for making HTTP requests in tests"""
@@ -70,3 +77,19 @@ def test_habit(client, auth_headers):
     )
     return response.json()
 
+
+@pytest.fixture
+def query_log():
+    """Record every SQL statement the app engine executes during the test.
+
+    Clear the list right before the request under test, then check its length.
+    """
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = database.get_engine()
+    event.listen(engine, "before_cursor_execute", record)
+    yield statements
+    event.remove(engine, "before_cursor_execute", record)
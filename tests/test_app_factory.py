@@ -0,0 +1,106 @@
+"""Tests for main.create_app: no database work at import, schema creation only when asked."""
+import os
+import subprocess
+import sys
+import uuid
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+from app import database
+from app.settings import Settings
+from main import create_app
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def table_names(path) -> list[str]:
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        return inspect(engine).get_table_names()
+    finally:
+        engine.dispose()
+
+
+def isolated_engine(monkeypatch):
+    """Let create_app configure its own engine; the suite's is put back afterwards."""
+    monkeypatch.setattr(database, "engine", None)
+    monkeypatch.setattr(database, "SQLALCHEMY_DATABASE_URL", None)
+    monkeypatch.setattr(database, "SessionLocal", database.LazySessionmaker(autocommit=False, autoflush=False))
+    monkeypatch.setattr(database, "async_engine", None)
+    monkeypatch.setattr(database, "AsyncSessionLocal", None)
+    monkeypatch.setattr(database, "DB_MODE", database.DB_MODE)
+
+
+def test_import_does_not_touch_the_database():
+    # Nothing listens on port 1: any connection attempt at import would fail
+    env = dict(os.environ, DATABASE_URL="postgresql://nobody@127.0.0.1:1/none", SECRET_KEY="test")
+    code = "import sys, main; print(main.database.engine, 'psycopg2' in sys.modules)"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.split() == ["None", "False"]
+
+
+def test_development_settings_create_the_schema(tmp_path, monkeypatch):
+    isolated_engine(monkeypatch)
+    path = tmp_path / "dev.db"
+    app = create_app(Settings(database_url=f"sqlite:///{path}", create_schema=True))
+    assert not path.exists()
+
+    with TestClient(app) as client:
+        assert client.get("/").status_code == 200
+    assert {"users", "habits", "habit_logs"} <= set(table_names(path))
+    database.engine.dispose()
+
+
+def test_production_settings_leave_the_schema_to_alembic(tmp_path, monkeypatch):
+    isolated_engine(monkeypatch)
+    path = tmp_path / "prod.db"
+    app = create_app(Settings(database_url=f"sqlite:///{path}"))
+
+    with TestClient(app) as client:
+        assert client.get("/").status_code == 200
+    assert table_names(path) == []
+    assert database.engine is None
+
+
+def test_async_engine_follows_a_new_url(tmp_path, monkeypatch):
+    pytest.importorskip("aiosqlite")
+    isolated_engine(monkeypatch)
+    paths = [tmp_path / "first.db", tmp_path / "second.db"]
+    for path in paths:
+        engine = create_engine(f"sqlite:///{path}")
+        database.Base.metadata.create_all(bind=engine)
+        engine.dispose()
+
+    for path in paths:
+        app = create_app(Settings(database_url=f"sqlite:///{path}", db_mode="async"))
+        assert database.DB_MODE == "async"
+        with TestClient(app) as client:
+            email = f"factory-{uuid.uuid4()}@example.com"
+            assert client.post("/users/", json={"email": email, "password": "testpass123"}).status_code == 201
+        assert str(database.async_engine.url) == f"sqlite+aiosqlite:///{path}"
+
+    for path in paths:
+        engine = create_engine(f"sqlite:///{path}")
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT COUNT(*) FROM users")).scalar() == 1
+        engine.dispose()
+
+
+def test_settings_from_env(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "sqlite:///./app.db")
+    monkeypatch.setenv("CORS_ORIGINS", "https://habits.example.com, http://localhost:3000")
+    monkeypatch.delenv("APP_ENV", raising=False)
+    monkeypatch.delenv("DB_CREATE_SCHEMA", raising=False)
+    monkeypatch.setenv("DB_MODE", "Async")
+    settings = Settings.from_env()
+    assert settings.database_url == "sqlite:///./app.db"
+    assert settings.db_mode == "async"
+    assert settings.cors_origins == ["https://habits.example.com", "http://localhost:3000"]
+    assert not settings.create_schema
+
+    monkeypatch.setenv("APP_ENV", "development")
+    assert Settings.from_env().create_schema
+    monkeypatch.setenv("DB_CREATE_SCHEMA", "false")
+    assert not Settings.from_env().create_schema
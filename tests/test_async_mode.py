@@ -0,0 +1,68 @@
+"""Tests for DB_MODE=async: the same routes and crud running on an AsyncSession."""
+import uuid
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from app import database
+from main import app
+
+pytest.importorskip("aiosqlite")
+
+
+@pytest.fixture
+def async_db_path(tmp_path):
+    """A fresh SQLite database file with the schema created."""
+    path = tmp_path / "async.db"
+    sync_engine = create_engine(f"sqlite:///{path}")
+    database.Base.metadata.create_all(bind=sync_engine)
+    sync_engine.dispose()
+    return path
+
+
+@pytest.fixture
+def async_client(async_db_path, monkeypatch):
+    """TestClient with routes on an aiosqlite AsyncSession over async_db_path."""
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    # NullPool: connections never outlive the event loop that opened them
+    engine = create_async_engine(f"sqlite+aiosqlite:///{async_db_path}", poolclass=NullPool)
+    monkeypatch.setattr(database, "DB_MODE", "async")
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(engine, autoflush=False, expire_on_commit=False))
+    with TestClient(app) as client:
+        yield client
+
+
+def test_async_url_mapping():
+    assert database.async_database_url("postgresql://u:p@db:5432/app") == "postgresql+asyncpg://u:p@db:5432/app"
+    assert database.async_database_url("postgresql+psycopg2://u:p@db/app") == "postgresql+asyncpg://u:p@db/app"
+    assert database.async_database_url("sqlite:///./app.db") == "sqlite+aiosqlite:///./app.db"
+
+
+def test_journey_in_async_mode(async_client, async_db_path):
+    email = f"async-{uuid.uuid4()}@example.com"
+    assert async_client.post("/users/", json={"email": email, "password": "testpass123"}).status_code == 201
+    token = async_client.post("/auth/login", data={"username": email, "password": "testpass123"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+
+    habit = async_client.post("/habits/", json={"name": "Async Habit"}, headers=headers).json()
+    log = async_client.post(f"/habit_logs/{habit['id']}/logs", json={"duration_min": 30}, headers=headers)
+    assert log.status_code == 201
+
+    status_response = async_client.get(f"/habits/{habit['id']}/status", headers=headers)
+    status = status_response.json()
+    assert status["status"] == "completed"
+    # Queries run via run_sync are counted for the request too, as is the token's revocation check
+    assert '"3 queries"' in status_response.headers["Server-Timing"]
+    assert status["current_streak"] == 1
+
+    stats = async_client.get(f"/habits/{habit['id']}/stats", headers=headers).json()
+    assert stats["stats"]["total_time_minutes"] == 30
+    assert stats["streaks"]["best"] == 1
+
+    dashboard = async_client.get("/habits/dashboard", headers=headers).json()
+    assert [item["habit_id"] for item in dashboard] == [habit["id"]]
+
+    # Everything went through the async engine's database
+    with create_engine(f"sqlite:///{async_db_path}").connect() as conn:
+        assert conn.execute(text("SELECT count(*) FROM habit_logs")).scalar() == 1
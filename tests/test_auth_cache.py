@@ -0,0 +1,199 @@
+"""Tests for the verified-token cache, revocation and the JWT backends."""
+import os
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import pytest
+from fastapi.testclient import TestClient
+from app import crud, database, pubsub, utils
+from app.settings import Settings
+from main import create_app
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Another worker: a fresh process on the same database, printing the status of GET /habits/ for each token
+OTHER_WORKER = """
+import sys
+from fastapi.testclient import TestClient
+from main import app
+client = TestClient(app)
+print(*(client.get("/habits/", headers={"Authorization": f"Bearer {token}"}).status_code for token in sys.argv[1:]))
+"""
+
+
+@pytest.fixture
+def count_decodes(monkeypatch):
+    """Count signature verifications done by verify_token."""
+    calls = []
+    decode = utils.decode_token
+
+    def counting_decode(token):
+        calls.append(token)
+        return decode(token)
+
+    monkeypatch.setattr(utils, "decode_token", counting_decode)
+    utils.token_cache.clear()
+    return calls
+
+
+def sign_up(client) -> tuple[int, str]:
+    email = f"auth-cache-{uuid.uuid4()}@example.com"
+    user_id = client.post("/users/", json={"email": email, "password": "testpass123"}).json()["id"]
+    return user_id, email
+
+
+def login(client, email: str, password: str = "testpass123") -> dict:
+    token = client.post("/auth/login", data={"username": email, "password": password}).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_signature_is_verified_once(count_decodes):
+    token = utils.create_access_token({"sub": "42"})
+
+    for _ in range(5):
+        assert utils.verify_token(token)["sub"] == "42"
+    assert count_decodes == [token]
+
+
+def test_invalid_tokens_are_not_cached(count_decodes):
+    token = utils.create_access_token({"sub": "42"}) + "x"
+
+    assert utils.verify_token(token) is None
+    assert utils.verify_token(token) is None
+    assert len(count_decodes) == 2
+
+
+def test_entry_never_outlives_exp():
+    cache = utils.TokenCache(maxsize=10, ttl=300)
+    now = time.time()
+    cache.put("token", {"sub": "1", "exp": now + 5}, now)
+
+    assert cache.get("token", now + 4) is not None
+    assert cache.get("token", now + 5) is None
+
+
+def test_entry_expires_after_ttl():
+    cache = utils.TokenCache(maxsize=10, ttl=60)
+    now = time.time()
+    cache.put("token", {"sub": "1", "exp": now + 3600}, now)
+
+    assert cache.get("token", now + 59) is not None
+    assert cache.get("token", now + 60) is None
+
+
+def test_least_recently_used_is_evicted():
+    cache = utils.TokenCache(maxsize=2, ttl=60)
+    now = time.time()
+    claims = {"sub": "1", "exp": now + 60}
+    cache.put("a", claims, now)
+    cache.put("b", claims, now)
+    cache.get("a", now)
+    cache.put("c", claims, now)
+
+    assert set(cache.entries) == {"a", "c"}
+
+
+def test_expired_token_is_rejected():
+    token = utils.create_access_token({"sub": "42"}, expires_delta=timedelta(seconds=-1))
+    assert utils.verify_token(token) is None
+
+
+def test_logout_revokes_cached_token(client):
+    _, email = sign_up(client)
+    headers = login(client, email)
+    assert client.get("/habits/", headers=headers).status_code == 200
+
+    assert client.post("/auth/logout", headers=headers).status_code == 204
+    assert client.get("/habits/", headers=headers).status_code == 401
+    assert client.get("/habits/", headers=login(client, email)).status_code == 200
+
+
+def test_password_change_revokes_older_tokens(client):
+    user_id, email = sign_up(client)
+    old_headers = login(client, email)
+    assert client.get("/habits/", headers=old_headers).status_code == 200
+
+    client.patch(f"/users/{user_id}", json={"password": "newpass456"})
+    assert client.get("/habits/", headers=old_headers).status_code == 401
+    assert client.get("/habits/", headers=login(client, email, "newpass456")).status_code == 200
+
+
+@pytest.fixture
+def shared_db(tmp_path, monkeypatch):
+    """(client, url): this worker's app on a database file other processes can open."""
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    monkeypatch.setattr(database, "engine", None)
+    monkeypatch.setattr(database, "SQLALCHEMY_DATABASE_URL", None)
+    monkeypatch.setattr(database, "SessionLocal", database.LazySessionmaker(autocommit=False, autoflush=False))
+    app = create_app(Settings(database_url=url, create_schema=True))
+    utils.token_cache.clear()
+    with TestClient(app) as client:
+        yield client, url
+    database.engine.dispose()
+
+
+def other_worker(url: str, *headers: dict) -> list[int]:
+    env = dict(os.environ, DATABASE_URL=url, SECRET_KEY=utils.SECRET_KEY, ALGORITHM=utils.ALGORITHM)
+    tokens = [h["Authorization"].removeprefix("Bearer ") for h in headers]
+    result = subprocess.run([sys.executable, "-c", OTHER_WORKER, *tokens], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    return [int(status) for status in result.stdout.split()]
+
+
+def test_revocations_reach_other_workers(shared_db):
+    client, url = shared_db
+    user_id, email = sign_up(client)
+    first, second = login(client, email), login(client, email)
+    assert other_worker(url, first, second) == [200, 200]
+
+    assert client.post("/auth/logout", headers=first).status_code == 204
+    assert other_worker(url, first, second) == [401, 200]
+
+    client.patch(f"/users/{user_id}", json={"password": "newpass456"})
+    assert other_worker(url, second, login(client, email, "newpass456")) == [401, 200]
+
+
+def test_revocation_event_drops_cached_tokens():
+    token = utils.create_access_token({"sub": "42"})
+    assert utils.verify_token(token)["sub"] == "42"
+
+    # As another worker's revocation arrives through LISTEN with EVENTS_BROKER=postgres
+    pubsub.PostgresBroker().on_notify(None, 0, pubsub.EVENTS_CHANNEL, f"42 {utils.TOKENS_REVOKED} {{}}")
+    assert utils.token_cache.get(token, time.time()) is None
+
+
+def test_cached_token_revoked_by_another_worker(client):
+    user_id, email = sign_up(client)
+    headers = login(client, email)
+    assert client.get("/habits/", headers=headers).status_code == 200
+
+    # Another worker's logout: only the row, no event reaches this worker with the local broker
+    token = headers["Authorization"].removeprefix("Bearer ")
+    claims = utils.token_cache.get(token, time.time())
+    with database.SessionLocal() as db:
+        crud.add_token_revocation(db, user_id, token, datetime.fromtimestamp(claims["exp"], timezone.utc))
+        db.info.pop(pubsub.PENDING_EVENTS)
+        db.commit()
+    assert client.get("/habits/", headers=headers).status_code == 401
+
+
+def test_configure_picks_the_broker(monkeypatch):
+    monkeypatch.setattr(pubsub, "broker", pubsub.LocalBroker())
+    pubsub.configure("postgres")
+    assert type(pubsub.broker) is pubsub.PostgresBroker
+    assert not pubsub.broker.reaches_all_workers  # Until LISTEN is connected
+    pubsub.configure("local")
+    assert type(pubsub.broker) is pubsub.LocalBroker
+
+
+def test_pyjwt_backend_accepts_our_tokens():
+    pytest.importorskip("jwt")
+    decode = utils.JWT_DECODERS["pyjwt"]()
+    token = utils.create_access_token({"sub": "42"})
+
+    assert decode(token)["sub"] == "42"
+    assert decode(token + "x") is None
+    assert decode(utils.create_access_token({"sub": "42"}, expires_delta=timedelta(seconds=-1))) is None
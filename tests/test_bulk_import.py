@@ -0,0 +1,147 @@
+"""Tests for bulk import of backdated habit logs."""
+from datetime import date, datetime, timedelta, timezone
+from app import crud, models
+from app.completion_index import StreakRun
+from app.database import SessionLocal
+from app.stats_counters import reconcile
+
+
+def day_entries(days_ago: list[int], duration_min: int = 20, status: str = "completed") -> list[dict]:
+    today = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    return [
+        {"start_time": (today - timedelta(days=n) + timedelta(hours=8)).isoformat(), "duration_min": duration_min, "status": status}
+        for n in days_ago
+    ]
+
+
+def import_entries(client, auth_headers, habit_id: int, entries: list[dict]):
+    return client.post(f"/habit_logs/{habit_id}/logs/bulk", json={"entries": entries}, headers=auth_headers)
+
+
+class TestBulkImport:
+    """Test POST /habit_logs/{habit_id}/logs/bulk"""
+
+    def test_import_recomputes_streaks(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        # An old 10-day run, then a 4-day run ending yesterday
+        entries = day_entries(list(range(30, 20, -1))) + day_entries([4, 3, 2, 1])
+
+        response = import_entries(client, auth_headers, habit_id, entries)
+        assert response.status_code == 201
+        result = response.json()
+        assert result["imported"] == 14
+        assert result["skipped"] == 0
+        assert result["current_streak"] == 4
+        assert result["best_streak"] == 10
+
+        stats = client.get(f"/habits/{habit_id}/stats", headers=auth_headers).json()
+        assert stats["stats"]["sessions_count"] == 14
+        assert stats["stats"]["total_time_minutes"] == 280
+        assert stats["streak_start_date"] is not None
+        with SessionLocal() as db:
+            assert reconcile(db, [habit_id]) == []
+
+    def test_frozen_days_bridge_without_counting(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        entries = day_entries([3, 1]) + day_entries([2], status="frozen")
+
+        result = import_entries(client, auth_headers, habit_id, entries).json()
+        assert result["current_streak"] == 2
+
+    def test_stale_history_has_no_current_streak(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+
+        result = import_entries(client, auth_headers, habit_id, day_entries([12, 11, 10])).json()
+        assert result["current_streak"] == 0
+        assert result["best_streak"] == 3
+
+    def test_earns_freezes_for_imported_streak(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        with SessionLocal() as db:
+            db.get(models.Habit, habit_id).freezes_remaining = 0
+            db.commit()
+
+        result = import_entries(client, auth_headers, habit_id, day_entries(list(range(7, 0, -1)))).json()
+        assert result["current_streak"] == 7
+        assert result["freezes_remaining"] == 1
+
+    def test_skipped_day_before_yesterday_uses_a_freeze(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+
+        result = import_entries(client, auth_headers, habit_id, day_entries([5, 4, 3])).json()
+        assert result["current_streak"] == 3
+        assert result["freezes_remaining"] == 1
+        logs = client.get(f"/habit_logs/{habit_id}/logs", headers=auth_headers).json()
+        assert [log["status"] for log in logs].count("frozen") == 1
+
+        # The frozen day is history now: importing again charges nothing
+        result = import_entries(client, auth_headers, habit_id, day_entries([6])).json()
+        assert result["current_streak"] == 4
+        assert result["freezes_remaining"] == 1
+        with SessionLocal() as db:
+            assert reconcile(db, [habit_id]) == []
+
+    def test_old_gaps_keep_the_current_freezes(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+
+        result = import_entries(client, auth_headers, habit_id, day_entries([400, 398, 396, 1])).json()
+        assert result["current_streak"] == 1
+        assert result["best_streak"] == 3
+        assert result["freezes_remaining"] == 2
+        logs = client.get(f"/habit_logs/{habit_id}/logs", headers=auth_headers).json()
+        assert "frozen" not in [log["status"] for log in logs]
+
+    def test_skipped_days_in_history(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+
+        # One skipped day survives, two reset the streak; no freeze is spent on either
+        result = import_entries(client, auth_headers, habit_id, day_entries([9, 8, 6, 5, 2, 1])).json()
+        assert result["current_streak"] == 2
+        assert result["best_streak"] == 4
+        assert result["freezes_remaining"] == 2
+
+    def test_retried_upload_is_skipped(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        entries = day_entries([3, 2, 1])
+        import_entries(client, auth_headers, habit_id, entries)
+
+        result = import_entries(client, auth_headers, habit_id, entries).json()
+        assert result["imported"] == 0
+        assert result["skipped"] == 3
+        assert len(client.get(f"/habit_logs/{habit_id}/logs", headers=auth_headers).json()) == 3
+
+    def test_future_entries_reject_the_batch(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        future = (datetime.now(timezone.utc) + timedelta(days=1)).isoformat()
+        entries = day_entries([2]) + [{"start_time": future, "duration_min": 5}]
+
+        response = import_entries(client, auth_headers, habit_id, entries)
+        assert response.status_code == 422
+        assert client.get(f"/habit_logs/{habit_id}/logs", headers=auth_headers).json() == []
+
+    def test_requires_habit_owner(self, client, auth_headers, test_habit):
+        response = client.post(f"/habit_logs/{test_habit['id']}/logs/bulk", json={"entries": day_entries([1])})
+        assert response.status_code == 401
+
+
+class TestReplayStreak:
+    """The day rollover's rules replayed over runs of completed/frozen days."""
+
+    def test_gaps(self):
+        today = date(2026, 3, 20)
+        runs = [
+            StreakRun(date(2026, 3, 18), date(2026, 3, 19), 2),
+            StreakRun(date(2026, 3, 14), date(2026, 3, 15), 2),
+            StreakRun(date(2026, 3, 10), date(2026, 3, 12), 3),
+        ]
+        # The 13th is survived, the 16th and 17th break the streak; freezes are not spent on history
+        assert crud.replay_streak(runs, today, 2) == (2, date(2026, 3, 18), 5, [])
+        assert crud.replay_streak(runs, today, 0) == (2, date(2026, 3, 18), 5, [])
+
+    def test_days_before_yesterday_count(self):
+        runs = [StreakRun(date(2026, 3, 10), date(2026, 3, 12), 3)]
+        assert crud.replay_streak(runs, date(2026, 3, 14), 0)[0] == 3
+        assert crud.replay_streak(runs, date(2026, 3, 15), 0)[0] == 0
+        assert crud.replay_streak(runs, date(2026, 3, 15), 1) == (3, date(2026, 3, 10), 3, [date(2026, 3, 13)])
+        # The 13th and 14th have both been judged: the rollover has reset the streak, freezes or not
+        assert crud.replay_streak(runs, date(2026, 3, 16), 2) == (0, None, 3, [])
@@ -0,0 +1,170 @@
+"""Tests for the per-habit day bitmaps and GET /habits/{id}/calendar."""
+import base64
+from datetime import date, datetime, timezone, timedelta
+from sqlalchemy import delete
+from sqlalchemy.orm import load_only
+from app import completion_index, models
+from app.database import SessionLocal
+from app.rollover import rollover_habits
+
+
+def add_log(habit_id: int, day: date, status: str = "completed") -> int:
+    with SessionLocal() as db:
+        start = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc) + timedelta(hours=12)
+        log = models.HabitLog(
+            habit_id=habit_id, start_time=start, end_time=start, duration_min=0, is_manual=True, status=status
+        )
+        db.add(log)
+        db.commit()
+        return log.id
+
+
+def assert_matches_logs(habit_id: int, year: int):
+    """The stored row equals a rebuild from habit_logs."""
+    key = (habit_id, year)
+    with SessionLocal() as db:
+        conn = db.connection()
+        assert completion_index.read_rows(conn, [key]) == completion_index.build_years(conn, [key])
+
+
+def day_byte(day: date) -> int:
+    return completion_index.day_index(day) // 8
+
+
+def day_bit(day: date) -> int:
+    return 1 << (completion_index.day_index(day) % 8)
+
+
+def calendar(client, auth_headers, habit_id: int, **params):
+    return client.get(f"/habits/{habit_id}/calendar", params=params, headers=auth_headers)
+
+
+class TestCalendarEndpoint:
+    def test_completions_and_freezes_by_day(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        today = datetime.now(timezone.utc).date()
+        client.post(f"/habits/{habit_id}/complete", headers=auth_headers)
+
+        response = calendar(client, auth_headers, habit_id)
+        assert response.status_code == 200
+        assert response.json() == {
+            "habit_id": habit_id, "year": today.year, "format": "days", "completed": [today.isoformat()], "frozen": []
+        }
+
+    def test_packed_bits(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        add_log(habit_id, date(2024, 1, 1))
+        add_log(habit_id, date(2024, 12, 31))
+        add_log(habit_id, date(2024, 3, 2), status="frozen")
+
+        body = calendar(client, auth_headers, habit_id, year=2024, format="bits").json()
+        completed = base64.b64decode(body["completed"])
+        frozen = base64.b64decode(body["frozen"])
+        assert len(completed) == len(frozen) == completion_index.YEAR_BYTES
+        # January 1st is bit 0 of byte 0; December 31st of a leap year is day 365
+        assert completed[0] == 0b1 and completed[365 // 8] == 1 << (365 % 8)
+        assert int.from_bytes(completed, "little").bit_count() == 2
+        assert int.from_bytes(frozen, "little") == 1 << 61
+
+    def test_not_modified_until_a_log_changes(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        etag = calendar(client, auth_headers, habit_id, year=2025).headers["ETag"]
+        headers = {**auth_headers, "If-None-Match": etag}
+        assert client.get(f"/habits/{habit_id}/calendar?year=2025", headers=headers).status_code == 304
+
+        add_log(habit_id, date(2025, 5, 5))
+        response = client.get(f"/habits/{habit_id}/calendar?year=2025", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["completed"] == ["2025-05-05"]
+
+    def test_rejects_bad_parameters(self, client, auth_headers, test_habit):
+        assert calendar(client, auth_headers, test_habit["id"], format="csv").status_code == 422
+        assert calendar(client, auth_headers, test_habit["id"], year=0).status_code == 422
+
+
+class TestBitmapsOnWrite:
+    """Every write path keeps the stored bitmaps equal to a rebuild."""
+
+    def test_deleted_and_changed_logs_clear_their_day(self, test_habit):
+        habit_id = test_habit["id"]
+        day = date(2025, 7, 10)
+        first = add_log(habit_id, day)
+        second = add_log(habit_id, day)
+        moved = add_log(habit_id, day + timedelta(days=1))
+
+        with SessionLocal() as db:
+            db.delete(db.query(models.HabitLog).filter(models.HabitLog.id == first).one())
+            db.commit()
+        with SessionLocal() as db:
+            assert completion_index.get_year(db, habit_id, 2025)["completed"][day_byte(day)] & day_bit(day)
+
+        with SessionLocal() as db:
+            db.query(models.HabitLog).filter(models.HabitLog.id == second).one().status = "frozen"
+            db.query(models.HabitLog).filter(models.HabitLog.id == moved).one().start_time = datetime(2025, 8, 1, 12, tzinfo=timezone.utc)
+            db.commit()
+        with SessionLocal() as db:
+            days = completion_index.get_year(db, habit_id, 2025)
+        assert completion_index.days_in(days["completed"], 2025) == [date(2025, 8, 1)]
+        assert completion_index.days_in(days["frozen"], 2025) == [day]
+        assert_matches_logs(habit_id, 2025)
+
+    def test_status_overwritten_without_being_loaded(self, test_habit):
+        habit_id = test_habit["id"]
+        day = date(2025, 7, 12)
+        log_id = add_log(habit_id, day)
+
+        with SessionLocal() as db:
+            log = db.query(models.HabitLog).options(load_only(models.HabitLog.id)).filter(
+                models.HabitLog.id == log_id
+            ).one()
+            log.status = "missed"
+            db.commit()
+        with SessionLocal() as db:
+            assert completion_index.days_in(completion_index.get_year(db, habit_id, 2025)["completed"], 2025) == []
+        assert_matches_logs(habit_id, 2025)
+
+    def test_rollover_freeze_sets_its_day(self, test_habit):
+        habit_id = test_habit["id"]
+        rollover_day = date(2099, 6, 15)
+        with SessionLocal() as db:
+            db.get(models.Habit, habit_id).current_streak = 3
+            db.commit()
+        add_log(habit_id, rollover_day - timedelta(days=2))
+
+        with SessionLocal() as db:
+            assert rollover_habits(db, [habit_id], rollover_day) == (1, 0)
+            db.commit()
+        with SessionLocal() as db:
+            frozen = completion_index.get_year(db, habit_id, 2099)["frozen"]
+        assert completion_index.days_in(frozen, 2099) == [rollover_day - timedelta(days=1)]
+        assert_matches_logs(habit_id, 2099)
+
+    def test_years_without_a_row_are_read_from_logs(self, test_habit):
+        habit_id = test_habit["id"]
+        add_log(habit_id, date(2023, 2, 3))
+        with SessionLocal() as db:
+            db.execute(delete(models.HabitCalendar).where(models.HabitCalendar.habit_id == habit_id))
+            db.commit()
+            assert completion_index.days_in(completion_index.get_year(db, habit_id, 2023)["completed"], 2023) == [
+                date(2023, 2, 3)
+            ]
+
+
+def test_streak_runs_across_years():
+    def year(completed=(), frozen=()):
+        bitmaps = {kind: bytearray(completion_index.YEAR_BYTES) for kind in completion_index.KINDS}
+        for day in completed:
+            completion_index.set_bit(bitmaps["completed"], completion_index.day_index(day))
+        for day in frozen:
+            completion_index.set_bit(bitmaps["frozen"], completion_index.day_index(day))
+        return {kind: bytes(bits) for kind, bits in bitmaps.items()}
+
+    history = {
+        2025: year(completed=[date(2025, 3, 1), date(2025, 3, 2), date(2025, 12, 30), date(2025, 12, 31)]),
+        2026: year(completed=[date(2026, 1, 2)], frozen=[date(2026, 1, 1)]),
+    }
+    assert completion_index.streak_runs(history) == [
+        (date(2025, 12, 30), date(2026, 1, 2), 3),
+        (date(2025, 3, 1), date(2025, 3, 2), 2),
+    ]
+    assert completion_index.streak_runs({}) == []
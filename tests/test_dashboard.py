@@ -0,0 +1,97 @@
+"""Tests for the GET /habits/dashboard endpoint."""
+import uuid
+from datetime import datetime, timezone, timedelta
+from app import schemas, models
+from app.database import SessionLocal
+
+
+def create_habits(client, auth_headers, count: int) -> list[int]:
+    habit_ids = []
+    for i in range(count):
+        response = client.post("/habits/", json={"name": f"Habit {i}"}, headers=auth_headers)
+        habit_ids.append(response.json()["id"])
+    return habit_ids
+
+
+def add_completed_log(habit_id: int, days_ago: int):
+    with SessionLocal() as db:
+        start = datetime.now(timezone.utc) - timedelta(days=days_ago)
+        db.add(models.HabitLog(
+            habit_id=habit_id,
+            start_time=start,
+            end_time=start,
+            duration_min=0,
+            is_manual=True,
+            status="completed"
+        ))
+        db.commit()
+
+
+class TestDashboard:
+    """Test the single-request dashboard of all habits."""
+
+    def test_dashboard_empty(self, client, auth_headers):
+        """A user without habits gets an empty dashboard."""
+        response = client.get("/habits/dashboard", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.json() == []
+
+    def test_dashboard_matches_status_endpoint(self, client, auth_headers):
+        """Each dashboard item agrees with GET /habits/{id}/status."""
+        habit_ids = create_habits(client, auth_headers, 3)
+        client.post(f"/habits/{habit_ids[0]}/complete", headers=auth_headers)
+
+        response = client.get("/habits/dashboard", headers=auth_headers)
+        assert response.status_code == 200
+        items = [schemas.HabitDashboardItem(**item) for item in response.json()]
+        assert [item.habit_id for item in items] == habit_ids
+
+        for item in items:
+            status = client.get(f"/habits/{item.habit_id}/status", headers=auth_headers).json()
+            assert item.status == status["status"]
+            assert item.color == status["color"]
+            assert item.current_streak == status["current_streak"]
+
+        assert items[0].status == "completed"
+        assert items[0].color == "green"
+        assert items[0].current_streak == 1
+        assert items[1].freezes_remaining == 2
+
+    def test_dashboard_is_a_pure_read(self, client, auth_headers, query_log):
+        """Skipped days are left to the nightly rollover, the dashboard never writes."""
+        habit_id = create_habits(client, auth_headers, 1)[0]
+        add_completed_log(habit_id, days_ago=2)
+
+        query_log.clear()
+        response = client.get("/habits/dashboard", headers=auth_headers)
+        item = response.json()[0]
+        assert item["status"] == "pending"
+        assert item["freezes_remaining"] == 2
+        assert all(statement.lstrip().upper().startswith("SELECT") for statement in query_log)
+
+    def test_dashboard_only_lists_own_habits(self, client, auth_headers, test_habit):
+        """Habits of other users are not included."""
+        other_email = f"dashboard-other-{uuid.uuid4()}@example.com"
+        client.post("/users/", json={"email": other_email, "password": "testpass123"})
+        login = client.post("/auth/login", data={"username": other_email, "password": "testpass123"})
+        other_headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        response = client.get("/habits/dashboard", headers=other_headers)
+        assert response.status_code == 200
+        assert test_habit["id"] not in [item["habit_id"] for item in response.json()]
+
+    def test_dashboard_query_count_is_constant(self, client, auth_headers, query_log):
+        """The number of queries does not grow with the number of habits."""
+        habit_ids = create_habits(client, auth_headers, 1)
+        add_completed_log(habit_ids[0], days_ago=1)
+        query_log.clear()
+        client.get("/habits/dashboard", headers=auth_headers)
+        single_habit_queries = len(query_log)
+
+        more_ids = create_habits(client, auth_headers, 14)
+        for habit_id in more_ids:
+            add_completed_log(habit_id, days_ago=1)
+        query_log.clear()
+        response = client.get("/habits/dashboard", headers=auth_headers)
+        assert len(response.json()) == 15
+        assert len(query_log) == single_habit_queries
@@ -0,0 +1,136 @@
+"""Tests for version counters and conditional GETs on habits, status and stats."""
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from app import crud, models
+from app.database import SessionLocal
+from app.responses import etag_matches
+from app.rollover import rollover_habits
+
+
+def versions(habit_id: int) -> tuple[int, int]:
+    """(habit version, owner's version)."""
+    with SessionLocal() as db:
+        habit = db.get(models.Habit, habit_id)
+        return habit.version, db.get(models.User, habit.user_id).version
+
+
+def revalidate(client, path: str, headers: dict):
+    """GET path, then GET it again with the ETag it returned."""
+    first = client.get(path, headers=headers)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    return etag, client.get(path, headers={**headers, "If-None-Match": etag})
+
+
+class TestConditionalGets:
+    def test_unchanged_habit_list_is_not_modified(self, client, auth_headers, test_habit, query_log):
+        first = client.get("/habits/", headers=auth_headers)
+        etag = first.headers["ETag"]
+        assert first.headers["Cache-Control"] == "private, no-cache"
+
+        query_log.clear()
+        response = client.get("/habits/", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.content == b""
+        assert response.headers["ETag"] == etag
+        # The user's version and the token's revocation check
+        assert len(query_log) == 2
+
+    def test_new_habit_changes_list_etag(self, client, auth_headers, test_habit):
+        etag = client.get("/habits/", headers=auth_headers).headers["ETag"]
+        client.post("/habits/", json={"name": "Another"}, headers=auth_headers)
+
+        response = client.get("/habits/", headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+
+    def test_status_not_modified_without_computing_it(self, client, auth_headers, test_habit, query_log):
+        path = f"/habits/{test_habit['id']}/status"
+        etag = client.get(path, headers=auth_headers).headers["ETag"]
+
+        query_log.clear()
+        response = client.get(path, headers={**auth_headers, "If-None-Match": etag})
+        assert response.status_code == 304
+        # The habit row and the token's revocation check; today's logs are never read
+        assert len(query_log) == 2
+
+    def test_completion_changes_status_and_stats_etags(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        status_etag = client.get(f"/habits/{habit_id}/status", headers=auth_headers).headers["ETag"]
+        stats_etag = client.get(f"/habits/{habit_id}/stats", headers=auth_headers).headers["ETag"]
+
+        client.post(f"/habits/{habit_id}/complete", headers=auth_headers)
+
+        status = client.get(f"/habits/{habit_id}/status", headers={**auth_headers, "If-None-Match": status_etag})
+        assert status.status_code == 200
+        assert status.json()["status"] == "completed"
+        stats = client.get(f"/habits/{habit_id}/stats", headers={**auth_headers, "If-None-Match": stats_etag})
+        assert stats.status_code == 200
+
+    def test_stats_not_modified(self, client, auth_headers, test_habit):
+        _, response = revalidate(client, f"/habits/{test_habit['id']}/stats", auth_headers)
+        assert response.status_code == 304
+
+    def test_other_users_habit_is_not_found_not_revalidated(self, client, auth_headers, test_habit):
+        path = f"/habits/{test_habit['id']}/status"
+        etag = client.get(path, headers=auth_headers).headers["ETag"]
+
+        email = f"etag-intruder-{uuid.uuid4()}@example.com"
+        client.post("/users/", json={"email": email, "password": "testpass123"})
+        token = client.post("/auth/login", data={"username": email, "password": "testpass123"}).json()["access_token"]
+        response = client.get(path, headers={"Authorization": f"Bearer {token}", "If-None-Match": etag})
+        assert response.status_code == 404
+
+
+class TestVersionCounters:
+    def test_log_writes_bump_habit_and_owner(self, client, test_habit):
+        habit_id = test_habit["id"]
+        habit_version, user_version = versions(habit_id)
+
+        log = client.post(f"/habit_logs/{habit_id}/logs/start").json()
+        assert versions(habit_id) == (habit_version + 1, user_version + 1)
+
+        client.patch(f"/habit_logs/{habit_id}/logs/{log['id']}/stop")
+        assert versions(habit_id) == (habit_version + 2, user_version + 2)
+
+    def test_rollover_bumps_versions(self, client, test_habit):
+        habit_id = test_habit["id"]
+        day = date(2099, 7, 1)
+        with SessionLocal() as db:
+            habit = db.get(models.Habit, habit_id)
+            habit.current_streak = 5
+            db.add(models.HabitLog(
+                habit_id=habit_id,
+                start_time=datetime(2099, 6, 25, 12, tzinfo=timezone.utc),
+                end_time=datetime(2099, 6, 25, 12, tzinfo=timezone.utc),
+                duration_min=0,
+                status="completed"
+            ))
+            db.commit()
+        habit_version, user_version = versions(habit_id)
+
+        with SessionLocal() as db:
+            assert rollover_habits(db, [habit_id], day) == (0, 1)
+            db.commit()
+        assert versions(habit_id) == (habit_version + 1, user_version + 1)
+
+
+def test_status_etag_rolls_over_at_color_thresholds_and_midnight():
+    habit = models.Habit(id=1, version=3)
+    day = datetime(2026, 3, 31, tzinfo=timezone.utc)
+
+    morning = crud.status_etag(habit, day + timedelta(hours=1))
+    assert crud.status_etag(habit, day + timedelta(hours=11)) == morning
+    afternoon = crud.status_etag(habit, day + timedelta(hours=13))
+    evening = crud.status_etag(habit, day + timedelta(hours=21))
+    next_morning = crud.status_etag(habit, day + timedelta(days=1, hours=1))
+    assert len({morning, afternoon, evening, next_morning}) == 4
+
+
+def test_etag_matching():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('W/"a"', '"a"')
+    assert etag_matches('"b", "a"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
+    assert not etag_matches(None, '"a"')
@@ -0,0 +1,116 @@
+"""Tests for live events: crud emits on commit, pubsub.stream formats them for /events."""
+import asyncio
+import json
+import uuid
+from app import crud, models, pubsub, schemas
+
+
+def make_habit(db, freeze_balance: int = 0) -> models.Habit:
+    user = crud.create_user(
+        db, schemas.UserCreate(email=f"events-{uuid.uuid4()}@example.com", password="x"), hashed_password="x"
+    )
+    user.freeze_balance = freeze_balance
+    return crud.create_habit(db, schemas.HabitCreate(name="Read"), user.id)
+
+
+async def next_chunk(stream) -> str:
+    return await asyncio.wait_for(anext(stream), 1)
+
+
+def parse(chunk: str) -> list[tuple[str, dict]]:
+    """(event type, data) of each event in an SSE chunk."""
+    events = []
+    for block in chunk.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+def test_timer_sessions_reach_the_users_stream(db):
+    habit = make_habit(db)
+
+    async def scenario():
+        stream = pubsub.stream(habit.user_id)
+        assert await next_chunk(stream) == f"retry: {pubsub.EVENTS_RETRY_MS}\n\n"
+
+        log = crud.create_log(db, habit.id)
+        [(event_type, data)] = parse(await next_chunk(stream))
+        assert event_type == "session_started"
+        assert data["habit_id"] == habit.id and data["log_id"] == log.id
+
+        crud.stop_log(db, log)
+        [(event_type, data)] = parse(await next_chunk(stream))
+        assert event_type == "session_stopped"
+        assert data["log_id"] == log.id and data["duration_min"] == 0
+        await stream.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_completion_and_freeze_events(db):
+    habit = make_habit(db, freeze_balance=1)
+
+    async def scenario():
+        stream = pubsub.stream(habit.user_id)
+        await next_chunk(stream)
+
+        assert crud.complete_habit(db, habit.id, habit.user_id)["success"]
+        assert parse(await next_chunk(stream)) == [("habit_completed", {"habit_id": habit.id, "streak": 1})]
+
+        assert crud.use_freeze(db, habit.id, habit.user_id)["success"]
+        assert parse(await next_chunk(stream)) == [("freeze_used", {"habit_id": habit.id, "freezes_remaining": 1})]
+        await stream.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_rolled_back_and_other_users_events_are_not_sent(db):
+    habit = make_habit(db)
+    other = make_habit(db)
+
+    async def scenario():
+        stream = pubsub.stream(habit.user_id, heartbeat_seconds=0.05)
+        await next_chunk(stream)
+
+        pubsub.emit(db, habit.user_id, "session_started", habit_id=habit.id)
+        db.rollback()
+        crud.create_log(db, other.id)
+        assert await next_chunk(stream) == ": keep-alive\n\n"
+        await stream.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_stream_that_falls_behind_is_cut_off(monkeypatch):
+    monkeypatch.setattr(pubsub, "EVENTS_QUEUE_SIZE", 2)
+    open_before = pubsub.broker.open
+
+    async def scenario():
+        stream = pubsub.stream(-1)
+        await next_chunk(stream)
+        for _ in range(3):
+            pubsub.broker.deliver(-1, "session_started", "{}")
+        assert await next_chunk(stream) == "event: overflow\ndata: {}\n\n"
+        assert await anext(stream, None) is None
+
+    asyncio.run(scenario())
+    assert pubsub.broker.open == open_before
+
+
+def test_postgres_notifications_are_fanned_out_locally():
+    broker = pubsub.PostgresBroker("postgresql+psycopg2://habits@db:5432/habits")
+    assert broker.url == "postgresql://habits@db:5432/habits"
+
+    async def scenario():
+        subscription = broker.subscribe(7)
+        broker.on_notify(None, 1234, pubsub.EVENTS_CHANNEL, '7 habit_completed {"habit_id": 1, "streak": 3}')
+        await asyncio.wait_for(subscription.ready.wait(), 1)
+        assert list(subscription.events) == [("habit_completed", '{"habit_id": 1, "streak": 3}')]
+        broker.unsubscribe(subscription)
+
+    asyncio.run(scenario())
+
+
+def test_stream_requires_a_token(client):
+    assert client.get("/events/").status_code == 401
+    assert client.get("/events/?access_token=not-a-token").status_code == 401
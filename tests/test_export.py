@@ -0,0 +1,74 @@
+"""Tests for the streaming user data export."""
+import csv
+import io
+import json
+import uuid
+from app import export, models
+from app.database import SessionLocal
+
+
+def create_habit_with_logs(client, auth_headers, name: str, manual_logs: list[int]) -> int:
+    habit_id = client.post("/habits/", json={"name": name}, headers=auth_headers).json()["id"]
+    for duration in manual_logs:
+        client.post(f"/habit_logs/{habit_id}/logs", json={"duration_min": duration}, headers=auth_headers)
+    return habit_id
+
+
+class TestExport:
+    """Test GET /users/me/export"""
+
+    def test_ndjson_export(self, client, auth_headers):
+        first = create_habit_with_logs(client, auth_headers, "Reading", [10, 20])
+        second = create_habit_with_logs(client, auth_headers, "Empty", [])
+
+        response = client.get("/users/me/export", headers=auth_headers)
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert [(record["type"], record["habit_id"]) for record in records] == [
+            ("habit", first), ("log", first), ("log", first), ("habit", second)
+        ]
+        assert [record["duration_min"] for record in records if record["type"] == "log"] == [10, 20]
+
+    def test_csv_export(self, client, auth_headers):
+        habit_id = create_habit_with_logs(client, auth_headers, "Reading", [15])
+
+        response = client.get("/users/me/export?format=csv", headers=auth_headers)
+        assert response.status_code == 200
+
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 1
+        assert rows[0]["habit_id"] == str(habit_id)
+        assert rows[0]["duration_min"] == "15"
+
+    def test_export_streams_in_batches(self, client, auth_headers, monkeypatch):
+        monkeypatch.setattr(export, "YIELD_PER", 2)
+        habit_id = create_habit_with_logs(client, auth_headers, "Reading", [1, 2, 3, 4, 5])
+        with SessionLocal() as db:
+            user_id = db.get(models.Habit, habit_id).user_id
+
+        # 1 habit line + 5 log lines, two lines per chunk
+        chunks = list(export.stream_export(user_id, "ndjson"))
+        assert [chunk.count("\n") for chunk in chunks] == [2, 2, 2]
+
+    def test_export_only_includes_own_habits(self, client, auth_headers):
+        create_habit_with_logs(client, auth_headers, "Mine", [5])
+
+        other_email = f"export-other-{uuid.uuid4()}@example.com"
+        client.post("/users/", json={"email": other_email, "password": "testpass123"})
+        token = client.post(
+            "/auth/login", data={"username": other_email, "password": "testpass123"}
+        ).json()["access_token"]
+
+        response = client.get("/users/me/export", headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 200
+        assert response.text == ""
+
+    def test_export_requires_auth(self, client):
+        response = client.get("/users/me/export")
+        assert response.status_code == 401
+
+    def test_unknown_format(self, client, auth_headers):
+        response = client.get("/users/me/export?format=xml", headers=auth_headers)
+        assert response.status_code == 422
@@ -0,0 +1,46 @@
+"""The orjson fast path must produce what response_model validation would have."""
+import json
+from datetime import datetime, timezone
+from decimal import Decimal
+from pydantic import TypeAdapter
+from app import schemas
+from app.responses import FastJSONResponse
+
+
+def as_validated(schema, body):
+    """body after a round trip through the route's response_model."""
+    adapter = TypeAdapter(schema)
+    return json.loads(adapter.dump_json(adapter.validate_python(body)))
+
+
+def test_logs_match_response_model(client, auth_headers, test_habit):
+    habit_id = test_habit["id"]
+    for minutes in (5, 10):
+        client.post(f"/habit_logs/{habit_id}/logs", json={"duration_min": minutes, "notes": "note"}, headers=auth_headers)
+    client.post(f"/habit_logs/{habit_id}/logs/start")
+
+    body = client.get(f"/habit_logs/{habit_id}/logs").json()
+    assert len(body) == 3
+    assert body == as_validated(list[schemas.HabitLog], body)
+    assert list(body[0]) == list(schemas.HabitLog.model_fields)
+
+
+def test_habits_match_response_model(client, auth_headers, test_habit):
+    body = client.get("/habits/", headers=auth_headers).json()
+    assert body == as_validated(list[schemas.Habit], body)
+
+
+def test_stats_match_response_model(client, auth_headers, test_habit):
+    client.post(f"/habit_logs/{test_habit['id']}/logs", json={"duration_min": 25}, headers=auth_headers)
+    body = client.get(f"/habits/{test_habit['id']}/stats", headers=auth_headers).json()
+
+    assert body == as_validated(schemas.HabitStats, body)
+    assert body["stats"]["total_time_minutes"] == 25
+
+
+def test_rendering_matches_pydantic():
+    stamp = datetime(2026, 3, 1, 8, 30, 15, 250000, tzinfo=timezone.utc)
+    log = schemas.HabitLog(id=1, habit_id=2, start_time=stamp, is_manual=False, status="completed")
+
+    assert FastJSONResponse(log.model_dump()).body == log.model_dump_json().encode()
+    assert FastJSONResponse({"total": Decimal("12"), "avg": Decimal("2.5")}).body == b'{"total":12,"avg":2.5}'
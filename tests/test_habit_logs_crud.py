@@ -2,7 +2,20 @@
 Tests for habit logging start/stop lifecycle via API endpoints
 """
 import time
-from app import schemas
+from datetime import datetime, timedelta, timezone
+from app import schemas, models
+from app.database import SessionLocal
+
+
+def add_logs(habit_id: int, start_times: list[datetime], status: str = "completed") -> list[int]:
+    with SessionLocal() as db:
+        logs = [
+            models.HabitLog(habit_id=habit_id, start_time=start, end_time=start, duration_min=0, status=status)
+            for start in start_times
+        ]
+        db.add_all(logs)
+        db.commit()
+        return [log.id for log in logs]
 
 
 class TestLoggingLifecycle:
@@ -137,3 +150,61 @@ class TestLoggingLifecycle:
         assert status_response.status_code == 200
         status = status_response.json()
         assert status["status"] == "completed"
+
+
+class TestLogPagination:
+    """Test keyset pagination and filters on the log listing"""
+
+    def scroll(self, client, auth_headers, url: str) -> list[int]:
+        ids = []
+        cursor = None
+        while True:
+            page_url = f"{url}&before={cursor}" if cursor else url
+            response = client.get(page_url, headers=auth_headers)
+            assert response.status_code == 200
+            ids.extend(log["id"] for log in response.json())
+            cursor = response.headers.get("X-Next-Cursor")
+            if not cursor:
+                return ids
+
+    def test_scrolls_full_history_newest_first(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        base = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+        # Two logs share a start time, so the id breaks the tie
+        starts = [base + timedelta(hours=i) for i in range(6)] + [base + timedelta(hours=3)]
+        log_ids = add_logs(habit_id, starts)
+
+        ids = self.scroll(client, auth_headers, f"/habit_logs/{habit_id}/logs?limit=2")
+
+        expected = [log_id for _, log_id in sorted(zip(starts, log_ids), reverse=True)]
+        assert ids == expected
+
+    def test_after_cursor_returns_newer_logs(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        base = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+        log_ids = add_logs(habit_id, [base + timedelta(days=i) for i in range(5)])
+
+        first = client.get(f"/habit_logs/{habit_id}/logs?limit=3", headers=auth_headers)
+        cursor = first.headers["X-Next-Cursor"]
+        newer = client.get(f"/habit_logs/{habit_id}/logs?limit=10&after={cursor}", headers=auth_headers)
+
+        assert [log["id"] for log in newer.json()] == [log_ids[4], log_ids[3]]
+
+    def test_time_range_and_status_filters(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        base = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+        completed = add_logs(habit_id, [base + timedelta(days=i) for i in range(5)])
+        add_logs(habit_id, [base + timedelta(days=2, hours=1)], status="frozen")
+
+        response = client.get(
+            f"/habit_logs/{habit_id}/logs",
+            params={"from": "2026-01-02T00:00:00Z", "to": "2026-01-04T00:00:00Z", "status": "completed"},
+            headers=auth_headers
+        )
+
+        assert [log["id"] for log in response.json()] == [completed[2], completed[1]]
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_invalid_cursor(self, client, auth_headers, test_habit):
+        response = client.get(f"/habit_logs/{test_habit['id']}/logs?before=not-a-cursor", headers=auth_headers)
+        assert response.status_code == 400
@@ -2,7 +2,7 @@
 import pytest
 import time
 from datetime import datetime, timezone, timedelta
-from app import schemas, models
+from app import schemas, models, crud
 from app.database import SessionLocal
 from tests.conftest import client, auth_headers, test_habit
 
@@ -304,3 +304,43 @@ class TestStatsResponseSchema:
         stats_data = response.json()
         stats = schemas.HabitStats(**stats_data)
         assert stats.habit_type == "manual"
+
+
+class TestTimerStatsBackends:
+    """The SQL aggregation path and the Python fallback must agree."""
+
+    def test_sql_and_python_backends_match(self, client, auth_headers, test_habit):
+        """Both backends return identical TimerHabitStats for the same logs."""
+        habit_id = test_habit["id"]
+        create_completed_logs(habit_id, 12, durations=[10, 25, 0, 40, 5, 90, 15, 30, 45, 60, 20, 35])
+
+        with SessionLocal() as db:
+            if db.get_bind().dialect.name != "postgresql":
+                pytest.skip("SQL stats backend needs Postgres")
+            now = datetime.now(timezone.utc)
+            # Two sessions on the same day, plus an unfinished one that must be ignored
+            db.add_all([
+                models.HabitLog(habit_id=habit_id, start_time=now - timedelta(days=40), end_time=now - timedelta(days=40),
+                                duration_min=50, status="completed"),
+                models.HabitLog(habit_id=habit_id, start_time=now - timedelta(days=40), end_time=now - timedelta(days=40),
+                                duration_min=70, status="completed"),
+                models.HabitLog(habit_id=habit_id, start_time=now, status="pending"),
+            ])
+            db.commit()
+
+            habit = db.query(models.Habit).filter(models.Habit.id == habit_id).first()
+            sql_stats = schemas.TimerHabitStats(**crud.get_timer_habit_stats_sql(db, habit, now))
+            python_stats = schemas.TimerHabitStats(**crud.get_timer_habit_stats_python(db, habit, now))
+
+        assert sql_stats == python_stats
+        assert sql_stats.best_day_minutes == 120
+        assert sql_stats.sessions_count == 14
+
+    def test_backends_match_without_sessions(self, client, auth_headers, test_habit):
+        """Both backends return zeros for a habit without sessions."""
+        with SessionLocal() as db:
+            if db.get_bind().dialect.name != "postgresql":
+                pytest.skip("SQL stats backend needs Postgres")
+            habit = db.query(models.Habit).filter(models.Habit.id == test_habit["id"]).first()
+            now = datetime.now(timezone.utc)
+            assert crud.get_timer_habit_stats_sql(db, habit, now) == crud.get_timer_habit_stats_python(db, habit, now)
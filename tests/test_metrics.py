@@ -0,0 +1,86 @@
+"""Tests for the metrics registry and the /metrics endpoint."""
+import json
+from app import metrics
+
+# Larger than any pid the kernel hands out, so it is never a live process
+DEAD_PID = 999999999
+
+
+def sample(text: str, line_prefix: str) -> float:
+    """Value of the exposition line starting with line_prefix (0 if absent)."""
+    for line in text.splitlines():
+        if line.startswith(line_prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_request_metrics_use_route_templates(client, auth_headers, test_habit):
+    series = 'http_requests_total{method="GET",route="/habits/{id}/status",status="200"}'
+    before = sample(client.get("/metrics").text, series)
+
+    client.get(f"/habits/{test_habit['id']}/status", headers=auth_headers)
+    client.get(f"/habits/{test_habit['id']}/status", headers=auth_headers)
+
+    text = client.get("/metrics").text
+    assert sample(text, series) == before + 2
+    assert f"/habits/{test_habit['id']}/status" not in text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/habits/{id}/status",le="+Inf"}' in text
+    assert sample(text, 'db_queries_total{route="/habits/{id}/status"}') > 0
+
+
+def test_unknown_paths_share_one_label(client):
+    client.get("/no/such/path/123")
+    assert 'route="unmatched",status="404"' in client.get("/metrics").text
+
+
+def test_timer_session_metrics(client, test_habit):
+    before = client.get("/metrics").text
+    log = client.post(f"/habit_logs/{test_habit['id']}/logs/start").json()
+
+    during = client.get("/metrics").text
+    assert sample(during, "timer_sessions_started_total") == sample(before, "timer_sessions_started_total") + 1
+    assert sample(during, "timer_sessions_active") == sample(before, "timer_sessions_active") + 1
+
+    client.patch(f"/habit_logs/{test_habit['id']}/logs/{log['id']}/stop")
+    after = client.get("/metrics").text
+    assert sample(after, "timer_sessions_stopped_total") == sample(before, "timer_sessions_stopped_total") + 1
+    assert sample(after, "timer_sessions_active") == sample(before, "timer_sessions_active")
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("test_latency_seconds", "Test.", ("route",), buckets=(0.1, 1.0))
+    try:
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, "/x")
+        lines = metrics.render_metric("test_latency_seconds", "histogram", "Test.", histogram.samples(dict(histogram.series)))
+    finally:
+        del metrics.REGISTRY["test_latency_seconds"]
+
+    assert 'test_latency_seconds_bucket{route="/x",le="0.1"} 2' in lines
+    assert 'test_latency_seconds_bucket{route="/x",le="1"} 3' in lines
+    assert 'test_latency_seconds_bucket{route="/x",le="+Inf"} 4' in lines
+    assert 'test_latency_seconds_count{route="/x"} 4' in lines
+    assert 'test_latency_seconds_sum{route="/x"} 3.65' in lines
+
+
+def test_workers_are_summed(tmp_path):
+    """Counters of other (even exited) workers are added; gauges of exited workers are not."""
+    metrics.flush(str(tmp_path))
+    mine = metrics.render(str(tmp_path))
+
+    other_worker = {
+        "timer_sessions_started_total": [[[], 5]],
+        "http_request_duration_seconds": [[["GET", "/"], [1] + [0] * 11 + [0.001]]],
+        "db_pool_connections_in_use": [[[], 3]],
+    }
+    (tmp_path / f"{DEAD_PID}.json").write_text(json.dumps(other_worker))
+
+    merged = metrics.render(str(tmp_path))
+    assert sample(merged, "timer_sessions_started_total") == sample(mine, "timer_sessions_started_total") + 5
+    series = 'http_request_duration_seconds_count{method="GET",route="/"}'
+    assert sample(merged, series) == sample(mine, series) + 1
+    assert sample(merged, "db_pool_connections_in_use") == sample(mine, "db_pool_connections_in_use")
+
+
+def test_label_values_are_escaped():
+    assert metrics.format_labels(("route",), ('/a"b\\c',)) == '{route="/a\\"b\\\\c"}'
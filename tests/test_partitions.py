@@ -0,0 +1,73 @@
+"""Tests for the habit_logs partition helpers, the start_time windows of day lookups and the log key."""
+from datetime import date, datetime, timezone
+import pytest
+from app import models, partitions, timezones
+from app.database import SessionLocal
+
+
+class TestMonths:
+    def test_add_months_crosses_years(self):
+        assert partitions.add_months(date(2026, 11, 1), 3) == date(2027, 2, 1)
+        assert partitions.add_months(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+    def test_partition_name_and_bounds(self):
+        assert partitions.partition_name(date(2026, 3, 1)) == "habit_logs_y2026m03"
+        assert partitions.PARTITION_NAME.match("habit_logs_y2026m03")
+        assert not partitions.PARTITION_NAME.match(partitions.DEFAULT_PARTITION)
+        assert partitions.partition_bounds(date(2026, 12, 1)) == (
+            "FOR VALUES FROM ('2026-12-01 00:00:00+00') TO ('2027-01-01 00:00:00+00')"
+        )
+
+
+class TestStartTimeWindow:
+    @pytest.mark.parametrize("zone_name", ["Pacific/Kiritimati", "Etc/GMT+12", "America/Los_Angeles", "UTC"])
+    def test_holds_the_local_day_in_any_zone(self, zone_name):
+        day = date(2026, 3, 8)
+        start, end = timezones.start_time_window(day)
+        local_start, local_end = timezones.day_bounds(day, timezones.get_zone(zone_name))
+        assert start <= local_start and local_end <= end
+
+    def test_spans_a_range_of_days(self):
+        start, end = timezones.start_time_window(date(2026, 3, 1), date(2026, 3, 31))
+        assert start == datetime(2026, 2, 28, 10, tzinfo=timezone.utc)
+        assert end == datetime(2026, 4, 1, 12, tzinfo=timezone.utc)
+
+
+class TestUnpartitioned:
+    def test_maintenance_is_a_no_op(self):
+        with SessionLocal() as db:
+            conn = db.connection()
+            assert not partitions.is_partitioned(conn)
+            assert partitions.ensure_partitions(conn) == []
+            assert partitions.archive_partitions(conn, date(2026, 1, 1)) == []
+
+    def test_archive_schema_name_is_checked(self):
+        with SessionLocal() as db:
+            with pytest.raises(ValueError):
+                partitions.archive_partitions(db.connection(), date(2026, 1, 1), "archive; DROP TABLE users")
+
+
+class TestLogKey:
+    def test_writes_name_the_partition(self, test_habit, query_log):
+        started = datetime(2026, 3, 2, 9, tzinfo=timezone.utc)
+        with SessionLocal() as db:
+            log = models.HabitLog(habit_id=test_habit["id"], start_time=started, status="pending")
+            db.add(log)
+            db.commit()
+            key = (log.id, started)
+
+        with SessionLocal() as db:
+            log = db.get(models.HabitLog, key)
+            log.start_time = datetime(2026, 4, 2, 9, tzinfo=timezone.utc)
+            query_log.clear()
+            db.commit()
+        updates = [s for s in query_log if s.startswith("UPDATE habit_logs")]
+        assert updates and all("habit_logs.start_time =" in s.split("WHERE")[1] for s in updates)
+
+        with SessionLocal() as db:
+            assert db.get(models.HabitLog, key) is None
+            db.delete(db.get(models.HabitLog, (key[0], datetime(2026, 4, 2, 9, tzinfo=timezone.utc))))
+            query_log.clear()
+            db.commit()
+        deletes = [s for s in query_log if s.startswith("DELETE FROM habit_logs")]
+        assert deletes and all("habit_logs.start_time =" in s for s in deletes)
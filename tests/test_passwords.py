@@ -0,0 +1,76 @@
+"""Tests for the password hashing pool: rehash on login and backpressure."""
+import uuid
+from passlib.context import CryptContext
+from app import models, passwords, utils
+from app.database import SessionLocal
+
+
+def stored_hash(email: str) -> str:
+    with SessionLocal() as db:
+        return db.query(models.User.hashed_password).filter(models.User.email == email).scalar()
+
+
+def set_stored_hash(email: str, hashed_password: str):
+    with SessionLocal() as db:
+        db.query(models.User).filter(models.User.email == email).update({"hashed_password": hashed_password})
+        db.commit()
+
+
+def test_signup_hash_uses_configured_rounds(client):
+    email = f"pw-{uuid.uuid4()}@example.com"
+    client.post("/users/", json={"email": email, "password": "testpass123"})
+    assert stored_hash(email).startswith(f"$2b${utils.BCRYPT_ROUNDS:02d}$")
+
+
+def test_duplicate_signup_is_not_hashed(client, monkeypatch):
+    email = f"pw-{uuid.uuid4()}@example.com"
+    client.post("/users/", json={"email": email, "password": "testpass123"})
+    hashed = []
+
+    async def counting_hash(password):
+        hashed.append(password)
+        return utils.hash_password(password)
+
+    monkeypatch.setattr(passwords, "hash_password", counting_hash)
+    response = client.post("/users/", json={"email": email, "password": "otherpass456"})
+    assert response.status_code == 400
+    assert hashed == []
+
+
+def test_login_rehashes_outdated_hash(client):
+    email = f"pw-{uuid.uuid4()}@example.com"
+    client.post("/users/", json={"email": email, "password": "testpass123"})
+    cheap = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("testpass123")
+    set_stored_hash(email, cheap)
+
+    response = client.post("/auth/login", data={"username": email, "password": "testpass123"})
+    assert response.status_code == 200
+    rehashed = stored_hash(email)
+    assert rehashed != cheap
+    assert rehashed.startswith(f"$2b${utils.BCRYPT_ROUNDS:02d}$")
+
+    # Same password still works, and the current hash is left alone
+    assert client.post("/auth/login", data={"username": email, "password": "testpass123"}).status_code == 200
+    assert stored_hash(email) == rehashed
+
+
+def test_wrong_password_does_not_rehash(client):
+    email = f"pw-{uuid.uuid4()}@example.com"
+    client.post("/users/", json={"email": email, "password": "testpass123"})
+    cheap = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("testpass123")
+    set_stored_hash(email, cheap)
+
+    assert client.post("/auth/login", data={"username": email, "password": "wrong"}).status_code == 401
+    assert stored_hash(email) == cheap
+
+
+def test_full_queue_sheds_with_503(client, monkeypatch):
+    monkeypatch.setattr(passwords, "PASSWORD_HASH_QUEUE", 0)
+
+    response = client.post("/auth/login", data={"username": "anyone@example.com", "password": "x"})
+    # Unknown users are rejected before any hashing
+    assert response.status_code == 401
+
+    response = client.post("/users/", json={"email": f"pw-{uuid.uuid4()}@example.com", "password": "testpass123"})
+    assert response.status_code == 503
+    assert int(response.headers["Retry-After"]) >= 1
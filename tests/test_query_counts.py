@@ -0,0 +1,80 @@
+"""Per-endpoint query budgets: each row is fetched at most once per request.
+
+Every authenticated request also checks its token in revoked_tokens (the tests
+run the local events broker, see utils.verify_token): one query, counted in.
+"""
+import re
+import pytest
+
+
+def selects_from(statements: list[str], table: str) -> int:
+    """Number of SELECTs reading from the given table."""
+    pattern = re.compile(rf"^\s*SELECT\b.*\bFROM {table}\b", re.DOTALL | re.IGNORECASE)
+    return sum(1 for statement in statements if pattern.match(statement))
+
+
+@pytest.fixture
+def timer_habit(client, auth_headers):
+    """A timer habit with one finished session, so its stats row already exists."""
+    habit = client.post("/habits/", json={"name": "Counted Habit", "is_timer": True}, headers=auth_headers).json()
+    client.post(f"/habit_logs/{habit['id']}/logs", json={"duration_min": 10}, headers=auth_headers)
+    return habit
+
+
+class TestReadQueryCounts:
+    def test_status(self, client, auth_headers, timer_habit, query_log):
+        """Habit by id, then today's logs once (status and color share them)."""
+        query_log.clear()
+        response = client.get(f"/habits/{timer_habit['id']}/status", headers=auth_headers)
+        assert response.status_code == 200
+        assert len(query_log) == 3
+        assert selects_from(query_log, "habits") == 1
+        assert selects_from(query_log, "habit_logs") == 1
+        assert selects_from(query_log, "revoked_tokens") == 1
+
+    def test_stats(self, client, auth_headers, timer_habit, query_log):
+        """No user lookup: habit, counters row and the recent-window aggregate."""
+        query_log.clear()
+        response = client.get(f"/habits/{timer_habit['id']}/stats", headers=auth_headers)
+        assert response.status_code == 200
+        assert len(query_log) == 4
+        assert selects_from(query_log, "habits") == 1
+        assert selects_from(query_log, "users") == 0
+        assert selects_from(query_log, "habit_stats") == 1
+
+    def test_read_habit(self, client, auth_headers, timer_habit, query_log):
+        query_log.clear()
+        client.get(f"/habits/{timer_habit['id']}", headers=auth_headers)
+        assert len(query_log) == 2
+
+
+class TestWriteQueryCounts:
+    def test_complete(self, client, auth_headers, query_log):
+        """The router's ownership check loads the habit; crud reuses it."""
+        habit = client.post("/habits/", json={"name": "Complete Me"}, headers=auth_headers).json()
+
+        query_log.clear()
+        response = client.post(f"/habits/{habit['id']}/complete", headers=auth_headers)
+        assert response.status_code == 200
+        # Once for the ownership check and once to refresh it after commit
+        assert selects_from(query_log, "habits") == 2
+        # The owner (for its timezone) is joined into the habit's query
+        assert selects_from(query_log, "users") == 0
+
+    def test_stop(self, client, auth_headers, timer_habit, query_log):
+        habit_id = timer_habit["id"]
+        log = client.post(f"/habit_logs/{habit_id}/logs/start").json()
+
+        query_log.clear()
+        response = client.patch(f"/habit_logs/{habit_id}/logs/{log['id']}/stop")
+        assert response.status_code == 200
+        assert selects_from(query_log, "habits") == 1
+        assert selects_from(query_log, "users") == 1
+
+    def test_manual_log(self, client, auth_headers, timer_habit, query_log):
+        """The router loads the habit; create_manual_log gets it from the identity map."""
+        query_log.clear()
+        response = client.post(f"/habit_logs/{timer_habit['id']}/logs", json={"duration_min": 5})
+        assert response.status_code == 201
+        assert selects_from(query_log, "habits") == 1
+        assert selects_from(query_log, "users") == 0
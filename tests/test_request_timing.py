@@ -0,0 +1,62 @@
+"""Tests for the per-request SQL count/timing middleware."""
+import json
+import logging
+import main
+from app import database
+
+
+def parse_server_timing(header: str) -> dict[str, dict]:
+    metrics = {}
+    for part in header.split(","):
+        name, *params = [piece.strip() for piece in part.split(";")]
+        metrics[name] = dict(param.split("=", 1) for param in params)
+    return metrics
+
+
+def test_server_timing_header(client, auth_headers, test_habit, query_log):
+    query_log.clear()
+    response = client.get(f"/habits/{test_habit['id']}/status", headers=auth_headers)
+
+    metrics = parse_server_timing(response.headers["Server-Timing"])
+    assert metrics["db"]["desc"] == f'"{len(query_log)} queries"'
+    assert float(metrics["db-slowest"]["dur"]) <= float(metrics["db"]["dur"]) <= float(metrics["total"]["dur"])
+
+
+def test_request_without_queries(client):
+    response = client.get("/")
+    assert parse_server_timing(response.headers["Server-Timing"])["db"]["desc"] == '"0 queries"'
+
+
+def test_request_log_line(client, auth_headers, test_habit, caplog):
+    with caplog.at_level(logging.INFO, logger="main"):
+        client.get(f"/habits/{test_habit['id']}/status", headers=auth_headers)
+
+    entry = json.loads(caplog.records[-1].getMessage().removeprefix("request "))
+    assert entry["path"] == f"/habits/{test_habit['id']}/status"
+    assert entry["status"] == 200
+    assert entry["queries"] >= 1
+    assert "statements" not in entry
+
+
+def test_slow_request_dumps_statements(client, auth_headers, test_habit, caplog, monkeypatch):
+    monkeypatch.setattr(main, "SLOW_REQUEST_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="main"):
+        client.get(f"/habits/{test_habit['id']}/status", headers=auth_headers)
+
+    record = caplog.records[-1]
+    assert record.levelno == logging.WARNING
+    entry = json.loads(record.getMessage().removeprefix("slow request "))
+    assert len(entry["statements"]) == entry["queries"]
+    assert any("FROM habit_logs" in statement["sql"] for statement in entry["statements"])
+
+
+def test_query_stats_records_slowest():
+    stats = database.QueryStats()
+    stats.record("SELECT 1", 2.0)
+    stats.record("SELECT 2", 5.0)
+    stats.record("SELECT 3", 1.0)
+
+    assert stats.count == 3
+    assert stats.total_ms == 8.0
+    assert stats.slowest_statement == "SELECT 2"
+    assert stats.server_timing(10.0) == 'db;desc="3 queries";dur=8.0, db-slowest;dur=5.0, total;dur=10.0'
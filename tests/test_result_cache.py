@@ -0,0 +1,101 @@
+"""Tests for the stats/status result cache and its invalidation."""
+from datetime import date, datetime, timezone
+import sys
+import pytest
+from app import cache, metrics, models
+from app.database import SessionLocal
+from app.rollover import rollover_habits
+
+
+def cached_entry(kind: str, habit_id: int):
+    return cache.results.backend.get(f"{kind}:{habit_id}")
+
+
+def test_repeated_stats_are_served_from_cache(client, auth_headers, test_habit, query_log):
+    path = f"/habits/{test_habit['id']}/stats"
+    first = client.get(path, headers=auth_headers).json()
+    hits = metrics.RESULT_CACHE_HITS.series.get(("stats",), 0)
+
+    query_log.clear()
+    assert client.get(path, headers=auth_headers).json() == first
+    # Just the habit row, for ownership and the current tag, and the token's revocation check
+    assert len(query_log) == 2
+    assert metrics.RESULT_CACHE_HITS.series[("stats",)] == hits + 1
+
+
+def test_writes_invalidate_their_habit(client, auth_headers, test_habit):
+    habit_id = test_habit["id"]
+    client.get(f"/habits/{habit_id}/stats", headers=auth_headers)
+    client.get(f"/habits/{habit_id}/status", headers=auth_headers)
+    assert cached_entry("stats", habit_id) is not None
+
+    client.post(f"/habit_logs/{habit_id}/logs", json={"duration_min": 25}, headers=auth_headers)
+    assert cached_entry("stats", habit_id) is None
+    assert cached_entry("status", habit_id) is None
+
+    stats = client.get(f"/habits/{habit_id}/stats", headers=auth_headers).json()
+    assert stats["stats"]["total_time_minutes"] == 25
+    status = client.get(f"/habits/{habit_id}/status", headers=auth_headers).json()
+    assert status["status"] == "completed"
+
+
+def test_rollover_invalidates(client, auth_headers, test_habit):
+    habit_id = test_habit["id"]
+    with SessionLocal() as db:
+        db.get(models.Habit, habit_id).current_streak = 4
+        db.add(models.HabitLog(
+            habit_id=habit_id,
+            start_time=datetime(2099, 6, 25, 12, tzinfo=timezone.utc),
+            end_time=datetime(2099, 6, 25, 12, tzinfo=timezone.utc),
+            duration_min=0,
+            status="completed"
+        ))
+        db.commit()
+    client.get(f"/habits/{habit_id}/status", headers=auth_headers)
+    assert cached_entry("status", habit_id) is not None
+
+    with SessionLocal() as db:
+        rollover_habits(db, [habit_id], date(2099, 7, 1))
+        db.commit()
+    assert cached_entry("status", habit_id) is None
+
+
+def test_entry_under_an_older_tag_is_recomputed():
+    results = cache.ResultCache(cache.MemoryBackend(maxsize=10, ttl=60))
+    results.get_or_compute("stats", 1, '"v1"', lambda: {"n": 1})
+
+    assert results.get_or_compute("stats", 1, '"v1"', lambda: {"n": 99}) == {"n": 1}
+    assert results.get_or_compute("stats", 1, '"v2"', lambda: {"n": 2}) == {"n": 2}
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = cache.MemoryBackend(maxsize=2, ttl=60)
+    evictions = metrics.RESULT_CACHE_EVICTIONS.series.get((), 0)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    backend.get("a")
+    backend.set("c", 3)
+
+    assert list(backend.entries) == ["a", "c"]
+    assert metrics.RESULT_CACHE_EVICTIONS.series[()] == evictions + 1
+
+
+def test_memory_backend_entries_expire():
+    backend = cache.MemoryBackend(maxsize=10, ttl=0)
+    backend.set("a", 1)
+    assert backend.get("a") is None
+
+
+def test_redis_backend_without_redis_fails_when_created(monkeypatch):
+    monkeypatch.setitem(sys.modules, "redis", None)  # import redis raises ImportError
+    with pytest.raises(RuntimeError, match="pip install redis"):
+        cache.RedisBackend()
+
+
+def test_backends_implement_every_method():
+    class Partial(cache.CacheBackend):
+        def get(self, key):
+            return None
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,149 @@
+"""Tests for the nightly day rollover (automatic freezes and streak resets)."""
+from datetime import date, datetime, timezone, timedelta
+from app import models
+from app.database import SessionLocal
+from app.rollover import rollover_habits, run_rollover
+
+# A day no real rollover will ever run for, so tests control its progress row
+TEST_DAY = date(2099, 6, 15)
+
+
+def create_habit(client, auth_headers, name: str = "Rollover Habit") -> int:
+    response = client.post("/habits/", json={"name": name}, headers=auth_headers)
+    return response.json()["id"]
+
+
+def add_log(habit_id: int, day: date, status: str = "completed"):
+    with SessionLocal() as db:
+        start = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc) + timedelta(hours=12)
+        db.add(models.HabitLog(
+            habit_id=habit_id,
+            start_time=start,
+            end_time=start,
+            duration_min=0,
+            is_manual=True,
+            status=status
+        ))
+        db.commit()
+
+
+def set_habit_state(habit_id: int, current_streak: int, freezes_remaining: int = 2):
+    with SessionLocal() as db:
+        habit = db.query(models.Habit).filter(models.Habit.id == habit_id).first()
+        habit.current_streak = current_streak
+        habit.current_streak_started_at = datetime.now(timezone.utc) if current_streak else None
+        habit.freezes_remaining = freezes_remaining
+        db.commit()
+
+
+def get_habit(habit_id: int) -> models.Habit:
+    with SessionLocal() as db:
+        return db.query(models.Habit).filter(models.Habit.id == habit_id).first()
+
+
+def count_frozen_logs(habit_id: int) -> int:
+    with SessionLocal() as db:
+        return db.query(models.HabitLog).filter(
+            models.HabitLog.habit_id == habit_id,
+            models.HabitLog.status == "frozen"
+        ).count()
+
+
+class TestRolloverRules:
+    """Test the skipped-day rules applied at the day boundary."""
+
+    def test_completed_yesterday_is_untouched(self, client, auth_headers):
+        habit_id = create_habit(client, auth_headers)
+        set_habit_state(habit_id, current_streak=4)
+        add_log(habit_id, TEST_DAY - timedelta(days=1))
+
+        with SessionLocal() as db:
+            assert rollover_habits(db, [habit_id], TEST_DAY) == (0, 0)
+            db.commit()
+
+        habit = get_habit(habit_id)
+        assert habit.current_streak == 4
+        assert habit.freezes_remaining == 2
+
+    def test_skipped_yesterday_consumes_freeze(self, client, auth_headers):
+        habit_id = create_habit(client, auth_headers)
+        set_habit_state(habit_id, current_streak=4)
+        add_log(habit_id, TEST_DAY - timedelta(days=2))
+
+        with SessionLocal() as db:
+            assert rollover_habits(db, [habit_id], TEST_DAY) == (1, 0)
+            db.commit()
+
+        habit = get_habit(habit_id)
+        assert habit.current_streak == 4
+        assert habit.freezes_remaining == 1
+        assert count_frozen_logs(habit_id) == 1
+
+        # The frozen log covers yesterday, so running again changes nothing
+        with SessionLocal() as db:
+            assert rollover_habits(db, [habit_id], TEST_DAY) == (0, 0)
+            db.commit()
+        assert count_frozen_logs(habit_id) == 1
+
+    def test_skipped_yesterday_without_freezes_keeps_streak(self, client, auth_headers):
+        habit_id = create_habit(client, auth_headers)
+        set_habit_state(habit_id, current_streak=4, freezes_remaining=0)
+        add_log(habit_id, TEST_DAY - timedelta(days=2))
+
+        with SessionLocal() as db:
+            assert rollover_habits(db, [habit_id], TEST_DAY) == (0, 0)
+            db.commit()
+
+        assert get_habit(habit_id).current_streak == 4
+
+    def test_three_days_skipped_kills_streak(self, client, auth_headers):
+        habit_id = create_habit(client, auth_headers)
+        set_habit_state(habit_id, current_streak=4)
+        add_log(habit_id, TEST_DAY - timedelta(days=3))
+
+        with SessionLocal() as db:
+            assert rollover_habits(db, [habit_id], TEST_DAY) == (0, 1)
+            db.commit()
+
+        habit = get_habit(habit_id)
+        assert habit.current_streak == 0
+        assert habit.current_streak_started_at is None
+        assert habit.freezes_remaining == 2
+
+    def test_habit_without_completions_is_untouched(self, client, auth_headers):
+        habit_id = create_habit(client, auth_headers)
+
+        with SessionLocal() as db:
+            assert rollover_habits(db, [habit_id], TEST_DAY) == (0, 0)
+
+
+class TestRolloverRuns:
+    """Test chunked, resumable runs."""
+
+    def test_interrupted_run_resumes_after_last_habit(self, client, auth_headers):
+        habit_ids = [create_habit(client, auth_headers, f"Chunk {i}") for i in range(3)]
+        for habit_id in habit_ids:
+            set_habit_state(habit_id, current_streak=2)
+            add_log(habit_id, TEST_DAY - timedelta(days=2))
+
+        with SessionLocal() as db:
+            db.query(models.RolloverRun).filter(models.RolloverRun.day == TEST_DAY).delete()
+            # Simulate a run that was interrupted right after the first habit
+            db.add(models.RolloverRun(
+                day=TEST_DAY, last_habit_id=habit_ids[0], habits_frozen=0, streaks_reset=0
+            ))
+            db.commit()
+
+            run = run_rollover(db, TEST_DAY, chunk_size=1)
+            assert run.finished_at is not None
+            assert run.last_habit_id >= habit_ids[-1]
+            assert run.habits_frozen >= 2
+
+        assert count_frozen_logs(habit_ids[0]) == 0
+        assert count_frozen_logs(habit_ids[1]) == 1
+        assert count_frozen_logs(habit_ids[2]) == 1
+
+        # A finished day is not processed again
+        with SessionLocal() as db:
+            run_rollover(db, TEST_DAY)
+        assert count_frozen_logs(habit_ids[1]) == 1
@@ -0,0 +1,118 @@
+"""Tests for single-flight coalescing of stats/status computations."""
+import asyncio
+import time
+import httpx
+import pytest
+from app import crud, metrics
+from app.singleflight import SingleFlight
+from main import app
+
+
+def counted(result=None, delay: float = 0.05, error: Exception | None = None):
+    """An async compute() that records how often it ran."""
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return result
+
+    return compute, calls
+
+
+def test_concurrent_callers_share_one_computation():
+    flights = SingleFlight()
+    compute, calls = counted({"streak": 3})
+    coalesced = metrics.SINGLE_FLIGHT_COALESCED.series.get(("stats",), 0)
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do(("stats", 1, '"t"'), compute) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [{"streak": 3}] * 5
+    assert len(calls) == 1
+    assert metrics.SINGLE_FLIGHT_COALESCED.series[("stats",)] == coalesced + 4
+    assert flights.calls == {}
+
+
+def test_different_keys_and_later_calls_compute_again():
+    flights = SingleFlight()
+    compute, calls = counted("x")
+
+    async def scenario():
+        await asyncio.gather(flights.do(("stats", 1, '"a"'), compute), flights.do(("stats", 1, '"b"'), compute))
+        await flights.do(("stats", 1, '"a"'), compute)
+
+    asyncio.run(scenario())
+    assert len(calls) == 3
+
+
+def test_errors_are_shared():
+    flights = SingleFlight()
+    compute, calls = counted(error=ValueError("db down"))
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do(("status", 1, '"t"'), compute) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(calls) == 1
+
+
+def test_waiters_time_out_and_compute_their_own():
+    flights = SingleFlight(timeout=0.01)
+    slow, slow_calls = counted("slow", delay=0.2)
+    fast, fast_calls = counted("fast", delay=0)
+    timeouts = metrics.SINGLE_FLIGHT_TIMEOUTS.series.get(("stats",), 0)
+
+    async def scenario():
+        leader = asyncio.create_task(flights.do(("stats", 1, '"t"'), slow))
+        await asyncio.sleep(0)
+        assert await flights.do(("stats", 1, '"t"'), fast) == "fast"
+        assert await leader == "slow"
+
+    asyncio.run(scenario())
+    assert len(slow_calls) == len(fast_calls) == 1
+    assert metrics.SINGLE_FLIGHT_TIMEOUTS.series[("stats",)] == timeouts + 1
+
+
+def test_waiters_recompute_when_the_leader_is_cancelled():
+    flights = SingleFlight()
+    compute, calls = counted("x", delay=0.05)
+
+    async def scenario():
+        leader = asyncio.create_task(flights.do(("stats", 1, '"t"'), compute))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.do(("stats", 1, '"t"'), compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await waiter
+
+    assert asyncio.run(scenario()) == "x"
+    assert len(calls) == 2
+
+
+def test_burst_of_stats_requests_computes_once(client, auth_headers, test_habit, monkeypatch):
+    compute = crud.get_cached_habit_stats
+    calls = []
+
+    def slow_compute(*args):
+        calls.append(1)
+        time.sleep(0.2)
+        return compute(*args)
+
+    monkeypatch.setattr(crud, "get_cached_habit_stats", slow_compute)
+    path = f"/habits/{test_habit['id']}/stats"
+
+    async def burst():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as http:
+            return await asyncio.gather(*(http.get(path, headers=auth_headers) for _ in range(4)))
+
+    responses = asyncio.run(burst())
+    assert [response.status_code for response in responses] == [200] * 4
+    assert len({response.content for response in responses}) == 1
+    assert len(calls) == 1
@@ -0,0 +1,182 @@
+"""Tests for the write-time habit_stats counters and their reconciliation."""
+from datetime import date, datetime, timezone, timedelta
+from sqlalchemy.orm import load_only
+from app import crud, models
+from app.database import SessionLocal
+from app.stats_counters import get_counters, median_from_histogram, completion_runs, reconcile
+
+
+def add_log(habit_id: int, start_time: datetime, duration_min: int, status: str = "completed") -> int:
+    with SessionLocal() as db:
+        log = models.HabitLog(
+            habit_id=habit_id,
+            start_time=start_time,
+            end_time=start_time + timedelta(minutes=duration_min),
+            duration_min=duration_min,
+            is_manual=True,
+            status=status
+        )
+        db.add(log)
+        db.commit()
+        return log.id
+
+
+def assert_no_drift(habit_id: int):
+    with SessionLocal() as db:
+        assert reconcile(db, [habit_id]) == []
+
+
+class TestCounterHelpers:
+    """Test the pure helpers behind the counters."""
+
+    def test_median_from_histogram(self):
+        assert median_from_histogram({}) == 0.0
+        assert median_from_histogram({"10": 1, "20": 1, "30": 1}) == 20.0
+        assert median_from_histogram({"10": 2, "40": 2}) == 25.0
+        assert median_from_histogram({"5": 3, "50": 1}) == 5.0
+
+    def test_completion_runs(self):
+        days = [date(2026, 1, 1), date(2026, 1, 2), date(2026, 1, 3), date(2026, 1, 5)]
+        assert completion_runs(days) == (1, 3)
+        assert completion_runs([]) == (0, 0)
+
+
+class TestCountersOnWrite:
+    """Every write path keeps the counters equal to a full rebuild."""
+
+    def test_api_writes_keep_counters_in_sync(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+
+        client.post(f"/habits/{habit_id}/complete", headers=auth_headers)
+        start = client.post(f"/habit_logs/{habit_id}/logs/start", headers=auth_headers)
+        client.patch(f"/habit_logs/{habit_id}/logs/{start.json()['id']}/stop", headers=auth_headers)
+        client.post(f"/habit_logs/{habit_id}/logs", json={"duration_min": 25}, headers=auth_headers)
+
+        with SessionLocal() as db:
+            counters = get_counters(db, habit_id)
+        assert counters["sessions_count"] == 3
+        assert counters["total_minutes"] == 25
+        assert counters["completions_count"] == 3
+        assert_no_drift(habit_id)
+
+    def test_sessions_on_several_days(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        now = datetime.now(timezone.utc)
+        add_log(habit_id, now - timedelta(days=3), 40)
+        add_log(habit_id, now - timedelta(days=2), 10)
+        add_log(habit_id, now - timedelta(days=2, hours=-1), 45)
+        add_log(habit_id, now - timedelta(days=1), 30)
+        add_log(habit_id, now - timedelta(days=5), 0, status="frozen")
+
+        with SessionLocal() as db:
+            counters = get_counters(db, habit_id)
+        assert counters["best_day_minutes"] == 55
+        assert counters["completion_run"] == 3
+        assert counters["best_completion_run"] == 3
+        assert counters["freezes_used"] == 1
+        assert_no_drift(habit_id)
+
+    def test_updating_and_deleting_logs(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        now = datetime.now(timezone.utc)
+        log_id = add_log(habit_id, now - timedelta(days=1), 20)
+        other_id = add_log(habit_id, now - timedelta(days=1), 35)
+
+        with SessionLocal() as db:
+            log = db.query(models.HabitLog).filter(models.HabitLog.id == log_id).one()
+            log.duration_min = 50
+            db.delete(db.query(models.HabitLog).filter(models.HabitLog.id == other_id).one())
+            db.commit()
+
+        with SessionLocal() as db:
+            counters = get_counters(db, habit_id)
+        assert counters["sessions_count"] == 1
+        assert counters["total_minutes"] == 50
+        assert counters["duration_histogram"] == {"50": 1}
+        assert counters["best_day_minutes"] == 50
+        assert_no_drift(habit_id)
+
+    def test_overwriting_values_never_loaded(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        now = datetime.now(timezone.utc)
+        log_id = add_log(habit_id, now - timedelta(days=2), 20)
+        other_id = add_log(habit_id, now - timedelta(days=1), 35)
+
+        with SessionLocal() as db:
+            # Neither the old status nor the old duration is in the session
+            log = db.query(models.HabitLog).options(load_only(models.HabitLog.id)).filter(
+                models.HabitLog.id == log_id
+            ).one()
+            log.status = "missed"
+            log.duration_min = 5
+            other = db.query(models.HabitLog).filter(models.HabitLog.id == other_id).one()
+            db.expire(other)
+            db.delete(other)
+            db.commit()
+
+        with SessionLocal() as db:
+            counters = get_counters(db, habit_id)
+        assert counters["sessions_count"] == 0
+        assert counters["completions_count"] == 0
+        assert counters["total_minutes"] == 0
+        with SessionLocal() as db:
+            # Only the completion runs, which never move back, may lag
+            drifted = {field for _, field, _, _ in reconcile(db, [habit_id])}
+        assert drifted <= {"last_completed_date", "completion_run", "best_completion_run"}
+
+    def test_stats_endpoint_reads_the_counters(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        now = datetime.now(timezone.utc)
+        for days_ago, minutes in [(1, 30), (3, 45), (12, 60), (40, 90)]:
+            add_log(habit_id, now - timedelta(days=days_ago), minutes)
+
+        response = client.get(f"/habits/{habit_id}/stats", headers=auth_headers)
+        assert response.json()["stats"] == {
+            "total_time_minutes": 225,
+            "avg_session_minutes": 56.25,
+            "sessions_count": 4,
+            "best_day_minutes": 90,
+            "this_week_minutes": 75,
+            "this_month_minutes": 135,
+            "median_session_minutes": 52.5,
+        }
+        with SessionLocal() as db:
+            habit = crud.get_habit_by_id(db, habit_id)
+            assert crud.compute_timer_habit_stats(db, habit) == response.json()["stats"]
+        assert_no_drift(habit_id)
+
+
+class TestReconcile:
+    """Test drift detection and repair."""
+
+    def test_reports_and_fixes_drift(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        add_log(habit_id, datetime.now(timezone.utc), 30)
+
+        with SessionLocal() as db:
+            db.execute(
+                models.HabitStats.__table__.update()
+                .where(models.HabitStats.habit_id == habit_id)
+                .values(total_minutes=999)
+            )
+            db.commit()
+
+            assert reconcile(db, [habit_id]) == [(habit_id, "total_minutes", 999, 30)]
+            reconcile(db, [habit_id], fix=True)
+            db.commit()
+
+        assert_no_drift(habit_id)
+
+    def test_creates_missing_rows(self, client, auth_headers, test_habit):
+        habit_id = test_habit["id"]
+        add_log(habit_id, datetime.now(timezone.utc), 30)
+        with SessionLocal() as db:
+            db.query(models.HabitStats).filter(models.HabitStats.habit_id == habit_id).delete()
+            db.commit()
+
+            # Missing rows are computed on read and reported, then written by the fix
+            assert get_counters(db, habit_id)["total_minutes"] == 30
+            assert (habit_id, "total_minutes", None, 30) in reconcile(db, [habit_id])
+            reconcile(db, [habit_id], fix=True)
+            db.commit()
+            assert db.get(models.HabitStats, habit_id) is not None
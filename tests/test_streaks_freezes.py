@@ -108,6 +108,37 @@ class TestStreakTracking:
         assert data["freezes_remaining"] == 2  # Should stay at 2, not 3
 
 
+    def test_first_completion_starts_streak(self, client, auth_headers, test_habit):
+        """The first completion records when the streak started and the best streak."""
+        habit_id = test_habit["id"]
+
+        client.post(f"/habits/{habit_id}/complete", headers=auth_headers)
+
+        with SessionLocal() as db:
+            habit = db.query(models.Habit).filter(models.Habit.id == habit_id).first()
+            assert habit.best_streak == 1
+            assert habit.current_streak_started_at is not None
+
+        stats = client.get(f"/habits/{habit_id}/stats", headers=auth_headers).json()
+        assert stats["streaks"]["best"] == 1
+        assert stats["streak_start_date"] is not None
+
+    def test_best_streak_survives_reset(self, client, auth_headers, test_habit):
+        """A broken streak keeps its best, and the next streak starts fresh."""
+        habit_id = test_habit["id"]
+        set_habit_and_user_state(habit_id, current_streak=0)
+        with SessionLocal() as db:
+            habit = db.query(models.Habit).filter(models.Habit.id == habit_id).first()
+            habit.best_streak = 9
+            db.commit()
+
+        client.post(f"/habits/{habit_id}/complete", headers=auth_headers)
+
+        stats = client.get(f"/habits/{habit_id}/stats", headers=auth_headers).json()
+        assert stats["streaks"]["current"] == 1
+        assert stats["streaks"]["best"] == 9
+
+
 class TestFreezeUsage:
     """Test using streak freezes."""
 
@@ -0,0 +1,128 @@
+"""Tests for per-user timezones: local_date on write, local day lookups, the rollover."""
+import uuid
+from datetime import date, datetime, timezone, timedelta
+from app import crud, models, timezones
+from app.database import SessionLocal
+from app.rollover import rollover_day, rollover_habits, seconds_until_next_run
+
+LOS_ANGELES = timezones.get_zone("America/Los_Angeles")
+
+
+def create_user(client, zone_name: str) -> tuple[int, dict]:
+    email = f"tz-user-{uuid.uuid4()}@example.com"
+    user = client.post("/users/", json={"email": email, "password": "testpass123", "timezone": zone_name}).json()
+    token = client.post("/auth/login", data={"username": email, "password": "testpass123"}).json()["access_token"]
+    return user["id"], {"Authorization": f"Bearer {token}"}
+
+
+def create_habit(client, headers) -> int:
+    return client.post("/habits/", json={"name": "Local Habit"}, headers=headers).json()["id"]
+
+
+def add_log(habit_id: int, start_time: datetime, status: str = "completed") -> int:
+    with SessionLocal() as db:
+        log = models.HabitLog(
+            habit_id=habit_id, start_time=start_time, end_time=start_time, duration_min=10, status=status
+        )
+        db.add(log)
+        db.commit()
+        return log.id
+
+
+def get_log(log_id: int) -> models.HabitLog:
+    with SessionLocal() as db:
+        return db.query(models.HabitLog).filter(models.HabitLog.id == log_id).one()
+
+
+class TestUserTimezone:
+    def test_defaults_to_utc(self, client):
+        email = f"tz-user-{uuid.uuid4()}@example.com"
+        response = client.post("/users/", json={"email": email, "password": "testpass123"})
+        assert response.json()["timezone"] == "UTC"
+
+    def test_unknown_timezone_is_rejected(self, client):
+        email = f"tz-user-{uuid.uuid4()}@example.com"
+        response = client.post("/users/", json={"email": email, "password": "x", "timezone": "Mars/Olympus"})
+        assert response.status_code == 422
+
+    def test_update(self, client):
+        user_id, _ = create_user(client, "UTC")
+        response = client.patch(f"/users/{user_id}", json={"timezone": "Asia/Tokyo"})
+        assert response.json()["timezone"] == "Asia/Tokyo"
+        assert client.patch(f"/users/{user_id}", json={"timezone": "Nowhere"}).status_code == 422
+
+
+class TestLocalDate:
+    def test_set_on_write_in_the_owner_zone(self, client):
+        _, headers = create_user(client, "America/Los_Angeles")
+        habit_id = create_habit(client, headers)
+        # 03:00 UTC on the 2nd is still the evening of the 1st in Los Angeles
+        log_id = add_log(habit_id, datetime(2026, 3, 2, 3, tzinfo=timezone.utc))
+        assert get_log(log_id).local_date == date(2026, 3, 1)
+
+        with SessionLocal() as db:
+            db.query(models.HabitLog).filter(models.HabitLog.id == log_id).one().start_time = datetime(2026, 3, 2, 9, tzinfo=timezone.utc)
+            db.commit()
+        assert get_log(log_id).local_date == date(2026, 3, 2)
+
+    def test_today_follows_the_owner_midnight(self, client):
+        _, headers = create_user(client, "America/Los_Angeles")
+        habit_id = create_habit(client, headers)
+        add_log(habit_id, datetime(2026, 3, 2, 3, tzinfo=timezone.utc))
+
+        with SessionLocal() as db:
+            # Same UTC day, but one is before the local midnight and one after
+            assert crud.has_completed_today(db, habit_id, datetime(2026, 3, 2, 7, tzinfo=timezone.utc))
+            assert not crud.has_completed_today(db, habit_id, datetime(2026, 3, 2, 9, tzinfo=timezone.utc))
+
+    def test_stats_group_by_local_day(self, client):
+        _, headers = create_user(client, "America/Los_Angeles")
+        habit_id = create_habit(client, headers)
+        # One UTC day, two Los Angeles days
+        add_log(habit_id, datetime(2026, 3, 2, 3, tzinfo=timezone.utc))
+        add_log(habit_id, datetime(2026, 3, 2, 20, tzinfo=timezone.utc))
+
+        stats = client.get(f"/habits/{habit_id}/stats", headers=headers).json()["stats"]
+        assert stats["sessions_count"] == 2
+        assert stats["best_day_minutes"] == 10
+
+    def test_timestamps_read_back_as_utc(self, client):
+        _, headers = create_user(client, "Asia/Tokyo")
+        habit_id = create_habit(client, headers)
+        tokyo_morning = datetime(2026, 3, 2, 9, tzinfo=timezones.get_zone("Asia/Tokyo"))
+        log = get_log(add_log(habit_id, tokyo_morning))
+        assert log.start_time == tokyo_morning
+        assert log.start_time.tzinfo == timezone.utc
+
+    def test_day_bounds_follow_dst(self):
+        # Clocks go forward on 2026-03-08 in Los Angeles
+        start, end = timezones.day_bounds(date(2026, 3, 8), LOS_ANGELES)
+        assert start == datetime(2026, 3, 8, 8, tzinfo=timezone.utc)
+        assert end - start == timedelta(hours=23)
+
+
+class TestLocalRollover:
+    def test_skipped_local_day_gets_a_freeze_at_local_midnight(self, client):
+        _, headers = create_user(client, "America/Los_Angeles")
+        habit_id = create_habit(client, headers)
+        day = date(2099, 6, 15)
+        # 23:00 in Los Angeles on the 13th, already the 14th in UTC
+        add_log(habit_id, datetime(2099, 6, 14, 6, tzinfo=timezone.utc))
+        with SessionLocal() as db:
+            db.get(models.Habit, habit_id).current_streak = 3
+            db.commit()
+
+        with SessionLocal() as db:
+            assert rollover_habits(db, [habit_id], day) == (1, 0)
+            db.commit()
+        with SessionLocal() as db:
+            freeze = db.query(models.HabitLog).filter(
+                models.HabitLog.habit_id == habit_id, models.HabitLog.status == "frozen"
+            ).one()
+            assert freeze.local_date == date(2099, 6, 14)
+            assert freeze.start_time == datetime(2099, 6, 14, 7, tzinfo=timezone.utc)
+
+    def test_runs_once_the_day_has_ended_everywhere(self):
+        assert rollover_day(datetime(2026, 3, 2, 11, 59, tzinfo=timezone.utc)) == date(2026, 3, 1)
+        assert rollover_day(datetime(2026, 3, 2, 12, tzinfo=timezone.utc)) == date(2026, 3, 2)
+        assert seconds_until_next_run(datetime(2026, 3, 2, 11, tzinfo=timezone.utc), 60) == 3600 + 60